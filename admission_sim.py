@@ -0,0 +1,436 @@
+"""
+Монте-Карло симуляция проходных баллов
+Синтетические абитуриенты сдают экзамены, подают заявления на программы и
+ранжируются по конкурсному баллу в пределах мест; по многим прогонам
+получается распределение проходного балла каждой программы
+
+Запуск: python admission_sim.py --applicants 100000 --runs 5 --output cutoffs.npz
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Конкурсы внутри программы: 0 - все места программы (total_places),
+# 1-6 - места выборочного экзамена с тем же номером (elective_exam_{i}_places)
+TRACKS = 7
+
+# Распределение баллов синтетических абитуриентов (сырые проценты 0-100):
+# общий уровень абитуриента и предметная составляющая смешиваются с весом ABILITY_WEIGHT
+MEAN_SCORE = 55.0
+SCORE_SD = 18.0
+ABILITY_WEIGHT = 0.7
+
+# Выборочные предметы: относительная популярность (каждый абитуриент сдает 1-3)
+ELECTIVE_POPULARITY = {
+    'მათემატიკა': 0.35,
+    'ისტორია': 0.20,
+    'ბიოლოგია': 0.10,
+    'ფიზიკა': 0.08,
+    'ქიმია': 0.06,
+    'გეოგრაფია': 0.06,
+    'სამოქალაქო განათლება': 0.06,
+    'ლიტერატურა': 0.05,
+    'ხელოვნება': 0.04
+}
+MAX_ELECTIVES = 3
+
+# Доля абитуриентов, сдающих каждый из прочих предметов базы (творческий тур и т.п.)
+OTHER_SUBJECT_SHARE = 0.03
+
+# Предметы, которые сдают все
+COMMON_SUBJECTS = ('ქართული ენა და ლიტერატურა', 'უცხოური ენა')
+
+# Сколько заявлений подает абитуриент и насколько выбор зависит от совместимости:
+# вероятность выбрать программу пропорциональна exp(compatibility / температура)
+APPLICATIONS = 5
+PREFERENCE_TEMPERATURE = 5.0
+
+
+def seat_places(engine) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Места по конкурсам программ
+
+    Программа с местами по выборочным экзаменам конкурирует по ним (конкурс -
+    номер лучшего выборочного экзамена абитуриента), остальные - по total_places.
+
+    Returns:
+        (places - программы × TRACKS, 0 - места не указаны;
+         elective_tracks - маска программ с местами по выборочным экзаменам)
+    """
+    elective_tracks = (engine.elective_places > 0).any(axis=1)
+    places = np.zeros((len(engine.programs), TRACKS), dtype=np.int64)
+    places[:, 0] = np.where(elective_tracks, 0, engine.programs.total_places)
+    places[:, 1:] = engine.elective_places
+    return places, elective_tracks
+
+
+class AdmissionModel:
+    """
+    Формула конкурсного балла всех программ в виде, удобном для симуляции
+
+    Обязательные экзамены сведены в матрицу коэффициентов (предметы × программы):
+    их вклад для блока абитуриентов - одно матричное умножение. Пороги и выборочные
+    экзамены хранятся по слотам только для программ, где слот заполнен. Вклады и
+    баллы округляются тем же _round_like_python(), что в score_matrix().
+
+    Все это строится по формулам балла (engine.formula_rows), а не по программам:
+    программы с одной формулой считаются один раз, и результат раздается им
+    через formula_of.
+    """
+
+    def __init__(self, engine):
+        rows = engine.formula_rows
+        mandatory_ids = engine.mandatory_ids[rows]
+        mandatory_coefs = engine.mandatory_coefs[rows]
+        mandatory_mins = engine.mandatory_mins[rows]
+        elective_ids = engine.elective_ids[rows]
+        elective_coefs = engine.elective_coefs[rows]
+        elective_mins = engine.elective_mins[rows]
+        n_formulas = len(rows)
+        n_subjects = len(engine.subjects) + 1
+        formula_index = np.broadcast_to(np.arange(n_formulas)[:, np.newaxis], mandatory_ids.shape)
+        present = mandatory_ids >= 0
+
+        self.mandatory_weights = np.zeros((n_subjects, n_formulas), dtype=np.float64)
+        np.add.at(self.mandatory_weights,
+                  (mandatory_ids[present], formula_index[present]),
+                  mandatory_coefs[present])
+        self.mandatory_total = np.where(present, mandatory_coefs, 0.0).sum(axis=1)
+
+        self.mandatory_slots = []
+        for j in range(mandatory_ids.shape[1]):
+            formulas = np.flatnonzero(mandatory_ids[:, j] >= 0)
+            self.mandatory_slots.append((formulas, mandatory_ids[formulas, j], mandatory_mins[formulas, j]))
+
+        self.elective_slots = []
+        for j in range(elective_ids.shape[1]):
+            formulas = np.flatnonzero(elective_ids[:, j] >= 0)
+            self.elective_slots.append((formulas, elective_ids[formulas, j],
+                                        elective_coefs[formulas, j], elective_mins[formulas, j]))
+
+        self.formula_of = engine.formula_of
+        # Округление, как в движке (round(), а не банковское np.round)
+        self.round = engine._round_like_python
+        self.formula_requires_elective = (elective_ids >= 0).any(axis=1)
+        self.requires_elective = self.formula_requires_elective[self.formula_of]
+        self.places, self.elective_tracks = seat_places(engine)
+
+        # Популярность предметов для генерации абитуриентов
+        self.common = [engine.subjects.resolve(name) for name in COMMON_SUBJECTS]
+        self.electives = [engine.subjects.resolve(name) for name in ELECTIVE_POPULARITY]
+        self.elective_log_weights = np.log(np.array(list(ELECTIVE_POPULARITY.values())))
+        self.others = [subject_id for subject_id in range(len(engine.subjects))
+                       if subject_id not in self.common and subject_id not in self.electives]
+        self.n_subjects = n_subjects
+        self.data_version = engine.data_version
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def sample_applicants(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        Баллы n синтетических абитуриентов (абитуриенты × subject id, как subjects.score_vector())
+
+        Несданный предмет - 0, последний столбец - заглушка пустых слотов.
+        """
+        ability = rng.standard_normal((n, 1))
+        noise = rng.standard_normal((n, self.n_subjects))
+        raw = MEAN_SCORE + SCORE_SD * (ABILITY_WEIGHT * ability + np.sqrt(1 - ABILITY_WEIGHT ** 2) * noise)
+        raw = np.clip(np.round(raw), 0.0, 100.0)
+
+        taken = np.zeros((n, self.n_subjects), dtype=bool)
+        taken[:, self.common] = True
+
+        # 1-MAX_ELECTIVES выборочных без повторов: топ по log(вес) + шум Гумбеля
+        keys = self.elective_log_weights + rng.gumbel(size=(n, len(self.electives)))
+        rank = np.argsort(np.argsort(-keys, axis=1), axis=1)
+        count = rng.integers(1, MAX_ELECTIVES + 1, size=(n, 1))
+        taken[:, self.electives] = rank < count
+        taken[:, self.others] = rng.random((n, len(self.others))) < OTHER_SUBJECT_SHARE
+
+        return np.where(taken, raw, 0.0)
+
+    def score(self, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Конкурсные баллы блока абитуриентов по всем программам
+
+        Считается в раскладке формулы × абитуриенты: выборка слота по
+        формулам - это выборка целых строк, а не столбцов. В конце строки
+        формул раздаются программам.
+
+        Returns:
+            (competitive_score, compatibility, eligible, best_elective) - матрицы
+            программы × абитуриенты; eligible - пройдены все минимумы и есть
+            подходящий выборочный экзамен, если программа их требует
+        """
+        scores = np.ascontiguousarray(scores.T)
+        scaled = np.clip(scores, 0.0, 100.0) + 100.0
+        competitive_score = self.mandatory_weights.T @ scaled
+
+        eligible = np.ones(competitive_score.shape, dtype=bool)
+        for formulas, ids, mins in self.mandatory_slots:
+            eligible[formulas] &= scores[ids] >= mins[:, np.newaxis]
+
+        best = np.full(competitive_score.shape, -np.inf)
+        best_coef = np.zeros(competitive_score.shape)
+        best_elective = np.full(competitive_score.shape, -1, dtype=np.int8)
+        for j, (formulas, ids, coefs, mins) in enumerate(self.elective_slots):
+            coefs = coefs[:, np.newaxis]
+            contrib = scaled[ids] * coefs
+            contrib = self.round(contrib.ravel(), 2).reshape(contrib.shape)
+            contrib = np.where(scores[ids] >= mins[:, np.newaxis], contrib, -np.inf)
+            current = best[formulas]
+            better = contrib > current
+            best[formulas] = np.where(better, contrib, current)
+            best_coef[formulas] = np.where(better, coefs, best_coef[formulas])
+            best_elective[formulas] = np.where(better, j, best_elective[formulas])
+
+        has_elective = best_elective >= 0
+        eligible &= has_elective | ~self.formula_requires_elective[:, np.newaxis]
+        competitive_score += np.where(has_elective, best, 0.0)
+        total = self.mandatory_total[:, np.newaxis] + best_coef
+        with np.errstate(divide='ignore', invalid='ignore'):
+            compatibility = np.where(total > 0, competitive_score / (2.0 * total), 0.0)
+        competitive_score = self.round(competitive_score.ravel(), 2).reshape(competitive_score.shape)
+        return (competitive_score[self.formula_of], compatibility[self.formula_of],
+                eligible[self.formula_of], best_elective[self.formula_of])
+
+    def _choose(self, compatibility: np.ndarray, eligible: np.ndarray, rng: np.random.Generator,
+                applications: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Выбор программ: до applications программ, где абитуриент проходит минимумы,
+        с вероятностью, пропорциональной exp(compatibility / PREFERENCE_TEMPERATURE)
+
+        Выборка без повторов - applications наименьших log(E) - compatibility / T
+        при E ~ Exp(1) (тот же прием, что с шумом Гумбеля, но дешевле); порядок
+        ключей - порядок предпочтений.
+
+        Returns:
+            (chosen, valid) - программы × абитуриенты по строкам предпочтений
+            и маска действительных выборов
+        """
+        applications = min(applications, len(self))
+        keys = np.log(rng.standard_exponential(size=eligible.shape)) - compatibility / PREFERENCE_TEMPERATURE
+        keys[~eligible] = np.inf
+        chosen = np.argpartition(keys, applications - 1, axis=0)[:applications]
+        chosen_keys = np.take_along_axis(keys, chosen, axis=0)
+        order = np.argsort(chosen_keys, axis=0)
+        chosen = np.take_along_axis(chosen, order, axis=0)
+        valid = np.isfinite(np.take_along_axis(chosen_keys, order, axis=0))
+        return chosen, valid
+
+    def apply(self, scores: np.ndarray, rng: np.random.Generator,
+              applications: int = APPLICATIONS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Заявления блока абитуриентов (каждое программа независимо ранжирует по баллу)
+
+        Returns:
+            (program, track, competitive_score) - плоские массивы по заявлениям
+        """
+        competitive_score, compatibility, eligible, best_elective = self.score(scores)
+        chosen, valid = self._choose(compatibility, eligible, rng, applications)
+        applicant = np.broadcast_to(np.arange(len(scores)), chosen.shape)
+
+        program, applicant = chosen[valid], applicant[valid]
+        track = np.where(self.elective_tracks[program], best_elective[program, applicant] + 1, 0)
+        return program.astype(np.int32), track.astype(np.int8), competitive_score[program, applicant]
+
+    def preferences(self, scores: np.ndarray, rng: np.random.Generator,
+                    applications: int = APPLICATIONS) -> np.ndarray:
+        """
+        Списки предпочтений блока абитуриентов для распределения мест (allocation.py)
+
+        Returns:
+            Матрица абитуриенты × applications строк программ по убыванию
+            предпочтения, -1 - выбор не заполнен
+        """
+        _, compatibility, eligible, _ = self.score(scores)
+        chosen, valid = self._choose(compatibility, eligible, rng, applications)
+        return np.where(valid, chosen, -1).T.astype(np.int32)
+
+    def cutoffs(self, program: np.ndarray, track: np.ndarray, score: np.ndarray) -> np.ndarray:
+        """
+        Проходные баллы одного прогона (программы × TRACKS)
+
+        Проходной балл - балл последнего зачисленного (places-й по величине);
+        -inf - мест больше, чем заявлений (проходят все, кто прошел минимумы);
+        NaN - число мест не указано.
+        """
+        places = self.places.ravel()
+        key = program.astype(np.int64) * TRACKS + track
+        order = np.lexsort((-score, key))
+        starts = np.searchsorted(key[order], np.arange(len(places)))
+        counts = np.bincount(key, minlength=len(places))
+
+        cutoffs = np.where(places > 0, -np.inf, np.nan)
+        full = (places > 0) & (counts >= places)
+        cutoffs[full] = score[order][starts[full] + places[full] - 1]
+        return cutoffs.reshape(self.places.shape)
+
+
+class AdmissionCutoffs:
+    """
+    Проходные баллы по прогонам симуляции для оценки шанса поступления
+
+    samples - массив прогоны × программы × TRACKS; строки программ совпадают
+    со строками движка той же версии данных (data_version).
+    """
+
+    def __init__(self, samples: np.ndarray, data_version: str,
+                 elective_tracks: np.ndarray, requires_elective: np.ndarray):
+        self.samples = samples
+        self.data_version = data_version
+        self.elective_tracks = elective_tracks
+        self.requires_elective = requires_elective
+
+    def save(self, path: str):
+        """Сохраняет проходные баллы в .npz"""
+        np.savez_compressed(path, samples=self.samples, data_version=self.data_version,
+                            elective_tracks=self.elective_tracks, requires_elective=self.requires_elective)
+
+    @classmethod
+    def load(cls, path: str) -> 'AdmissionCutoffs':
+        """Читает проходные баллы, сохраненные save()"""
+        with np.load(path) as data:
+            return cls(data['samples'], str(data['data_version']),
+                       data['elective_tracks'], data['requires_elective'])
+
+    def estimate(self,
+                 row: int,
+                 best_elective: int,
+                 competitive_score: float,
+                 failed: bool) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Оценка поступления на программу по результатам симуляции
+
+        Args:
+            row: Строка программы
+            best_elective: Слот лучшего выборочного экзамена (-1 - нет подходящего)
+            competitive_score: Конкурсный балл абитуриента
+            failed: Не пройден минимум обязательного экзамена
+
+        Returns:
+            (доля прогонов, в которых балл не ниже проходного; медианный проходной балл).
+            Доля - None, если места программы не указаны; проходной балл - None,
+            если в большинстве прогонов конкурса не было.
+        """
+        track = best_elective + 1 if self.elective_tracks[row] else 0
+        cutoffs = self.samples[:, row, track]
+        if np.isnan(cutoffs).all():
+            return None, None
+
+        median = float(np.median(cutoffs))
+        estimated_cutoff = round(median, 2) if np.isfinite(median) else None
+        if failed or (best_elective < 0 and self.requires_elective[row]):
+            return 0.0, estimated_cutoff
+        return round(float(np.mean(competitive_score >= cutoffs)), 2), estimated_cutoff
+
+
+# Модель симуляции в процессе-воркере (передается инициализатором пула)
+_worker_model: Optional[AdmissionModel] = None
+
+
+def _init_worker(model: AdmissionModel):
+    global _worker_model
+    _worker_model = model
+
+
+def _simulate_chunk(task: Tuple[int, int, int, int, int]):
+    """Заявления блока абитуриентов одного прогона; зерно зависит только от (seed, прогон, блок)"""
+    seed, run, chunk, size, applications = task
+    rng = np.random.default_rng([seed, run, chunk])
+    scores = _worker_model.sample_applicants(size, rng)
+    return run, _worker_model.apply(scores, rng, applications)
+
+
+def simulate(engine,
+             applicants: int = 40000,
+             runs: int = 5,
+             applications: int = APPLICATIONS,
+             seed: int = 0,
+             processes: int = None,
+             chunk_size: int = 2048) -> AdmissionCutoffs:
+    """
+    Проходные баллы по runs независимым популяциям абитуриентов
+
+    Блоки абитуриентов считаются пулом процессов. Модель передается воркерам
+    один раз при старте: при fork (Linux) ее массивы не копируются, а делятся
+    со страницами родителя, как и массивы снимка, открытые через mmap.
+    Результат не зависит от числа процессов.
+
+    Args:
+        engine: UniversityRecommendationSystem
+        applicants: Абитуриентов в одном прогоне
+        runs: Число прогонов
+        applications: Заявлений на абитуриента
+        seed: Зерно генератора
+        processes: Число процессов (по умолчанию - все ядра; 1 - без пула)
+        chunk_size: Абитуриентов в блоке (память воркера ~ chunk_size × программы)
+    """
+    model = AdmissionModel(engine)
+    tasks = [
+        (seed, run, chunk, min(chunk_size, applicants - start), applications)
+        for run in range(runs)
+        for chunk, start in enumerate(range(0, applicants, chunk_size))
+    ]
+    processes = processes or os.cpu_count() or 1
+
+    parts: Dict[int, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {run: [] for run in range(runs)}
+    if processes == 1:
+        _init_worker(model)
+        for task in tasks:
+            run, part = _simulate_chunk(task)
+            parts[run].append(part)
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with context.Pool(processes, initializer=_init_worker, initargs=(model,)) as pool:
+            for run, part in pool.imap_unordered(_simulate_chunk, tasks):
+                parts[run].append(part)
+
+    samples = np.empty((runs, len(model), TRACKS), dtype=np.float64)
+    for run in range(runs):
+        program, track, score = (np.concatenate(column) for column in zip(*parts[run]))
+        samples[run] = model.cutoffs(program, track, score)
+    return AdmissionCutoffs(samples, model.data_version, model.elective_tracks, model.requires_elective)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Монте-Карло симуляция проходных баллов')
+    parser.add_argument('--database', default='programs_database.csv', help='CSV база программ')
+    parser.add_argument('--applicants', type=int, default=40000, help='абитуриентов в прогоне')
+    parser.add_argument('--runs', type=int, default=5, help='число прогонов')
+    parser.add_argument('--applications', type=int, default=APPLICATIONS, help='заявлений на абитуриента')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='процессов (по умолчанию все ядра)')
+    parser.add_argument('--output', default='cutoffs.npz', help='файл проходных баллов для CUTOFFS_PATH')
+    parser.add_argument('--category-rules', default=os.environ.get('CATEGORY_RULES', ''),
+                        help='JSON-файл правил категорий, как CATEGORY_RULES приложения (правила входят в версию данных)')
+    args = parser.parse_args()
+
+    from categories import CategoryMatcher
+    from recommendation_system import UniversityRecommendationSystem
+    categorizer = CategoryMatcher.from_file(args.category_rules) if args.category_rules else CategoryMatcher()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = UniversityRecommendationSystem(args.database, categorizer=categorizer)
+
+    started = time.perf_counter()
+    cutoffs = simulate(engine, args.applicants, args.runs, args.applications, args.seed, args.processes)
+    elapsed = time.perf_counter() - started
+    cutoffs.save(args.output)
+
+    contested = np.isfinite(cutoffs.samples).any(axis=(0, 2)).sum()
+    print(f"✓ {args.runs} × {args.applicants} абитуриентов × {len(engine.programs)} программ "
+          f"за {elapsed:.2f} с, процессов: {args.processes or os.cpu_count()}")
+    print(f"✓ Программ с конкурсом: {contested}, версия данных {cutoffs.data_version} → {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+Национальное распределение мест: алгоритм отложенного согласия (deferred acceptance)
+Абитуриенты предлагают себя программам в порядке предпочтений, программы удерживают
+лучших в пределах мест; при равном конкурсном балле сравниваются баллы экзаменов
+в порядке их приоритета (mandatory_exam_{i}_priority, elective_exam_{i}_priority)
+
+Запуск: python allocation.py --applicants 100000 --output allocation.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from admission_sim import APPLICATIONS, TRACKS, AdmissionModel, seat_places
+from program_table import MAX_PRIORITY
+
+
+class Allocation(NamedTuple):
+    """Результат распределения"""
+    program: np.ndarray   # строка программы, куда зачислен абитуриент (-1 - не зачислен)
+    track: np.ndarray     # конкурс внутри программы (см. admission_sim.TRACKS)
+    choice: np.ndarray    # номер исполненного предпочтения (0 - первое; -1 - не зачислен)
+    score: np.ndarray     # конкурсный балл на программе зачисления (NaN - не зачислен)
+    admitted: np.ndarray  # зачислено: программы × TRACKS
+    cutoffs: np.ndarray   # балл последнего зачисленного, если места заполнены; -inf - не
+                          # заполнены; NaN - число мест не указано (программы × TRACKS)
+    rounds: int           # число раундов предложений
+
+
+def _add_tiebreak(tiebreak: np.ndarray, priority: np.ndarray, raw: np.ndarray):
+    """Записывает балл слота в столбец его приоритета (0 - без приоритета, пропускается)"""
+    rows = np.flatnonzero(priority > 0)
+    levels = priority[rows].astype(np.int64) - 1
+    tiebreak[rows, levels] = np.maximum(tiebreak[rows, levels], raw[rows])
+
+
+def score_applications(engine,
+                       scores: np.ndarray,
+                       applicant: np.ndarray,
+                       program: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Конкурсные баллы для пар (абитуриент, программа)
+
+    Та же формула, что в score_matrix(), но только для поданных заявлений, а не
+    для всех программ каждого абитуриента.
+
+    Args:
+        engine: UniversityRecommendationSystem
+        scores: Матрица баллов (абитуриенты × subject id), строки из subjects.score_vector()
+        applicant, program: Абитуриент и строка программы каждого заявления
+
+    Returns:
+        (competitive_score, eligible, best_elective, tiebreak): eligible - пройдены
+        минимумы и есть подходящий выборочный экзамен, если программа их требует;
+        tiebreak - баллы экзаменов с приоритетом 1..MAX_PRIORITY (заявления × MAX_PRIORITY)
+    """
+    n = len(applicant)
+    tiebreak = np.zeros((n, MAX_PRIORITY), dtype=np.float64)
+
+    mandatory_ids = engine.mandatory_ids[program]
+    mandatory_coefs = engine.mandatory_coefs[program]
+    mandatory_priorities = engine.mandatory_priorities[program]
+    mandatory_present = mandatory_ids >= 0
+    mandatory_raw = scores[applicant[:, np.newaxis], mandatory_ids]
+
+    # Суммируем по слотам в том же порядке, что и calculate_score()
+    competitive_score = np.zeros(n, dtype=np.float64)
+    for j in range(mandatory_ids.shape[1]):
+        contrib = (np.clip(mandatory_raw[:, j], 0.0, 100.0) + 100.0) * mandatory_coefs[:, j]
+        competitive_score += np.where(mandatory_present[:, j], contrib, 0.0)
+        _add_tiebreak(tiebreak, mandatory_priorities[:, j], mandatory_raw[:, j])
+    failed = (mandatory_present & (mandatory_raw < engine.mandatory_mins[program])).any(axis=1)
+
+    # Выборочные: лучший по округленному вкладу среди прошедших минимум
+    elective_ids = engine.elective_ids[program]
+    elective_raw = scores[applicant[:, np.newaxis], elective_ids]
+    eligible_slots = (elective_ids >= 0) & (elective_raw >= engine.elective_mins[program])
+    elective_contrib = engine._round_like_python(
+        ((np.clip(elective_raw, 0.0, 100.0) + 100.0) * engine.elective_coefs[program]).ravel(), 2
+    ).reshape(elective_raw.shape)
+    elective_contrib = np.where(eligible_slots, elective_contrib, -np.inf)
+    best_elective = np.argmax(elective_contrib, axis=1)
+    has_elective = eligible_slots.any(axis=1)
+    picked = np.arange(n), best_elective
+    competitive_score += np.where(has_elective, elective_contrib[picked], 0.0)
+
+    elective_priority = np.where(has_elective, engine.elective_priorities[program][picked], 0)
+    _add_tiebreak(tiebreak, elective_priority, elective_raw[picked])
+
+    requires_elective = (elective_ids >= 0).any(axis=1)
+    eligible = ~failed & (has_elective | ~requires_elective)
+    competitive_score = engine._round_like_python(competitive_score, 2)
+    return competitive_score, eligible, np.where(has_elective, best_elective, -1), tiebreak
+
+
+def allocate(engine, scores: np.ndarray, preferences: np.ndarray) -> Allocation:
+    """
+    Распределение мест алгоритмом отложенного согласия с предложениями абитуриентов
+
+    Заявления, не проходящие минимумы программы, и заявления в конкурсы без
+    указанного числа мест отбрасываются. Каждый раунд все свободные абитуриенты
+    предлагают себя следующей программе своего списка; у каждого конкурса остаются
+    лучшие в пределах мест (ограниченная очередь), остальные освобождаются.
+
+    Очереди хранятся в массивах: удерживаемые заявления отсортированы по рангу,
+    а ранг заранее упорядочивает заявления по (конкурс, балл, баллы по приоритетам,
+    номер абитуриента). Раунд - слияние новых предложений с удерживаемыми и отсечение
+    по местам, без циклов Python по заявлениям.
+
+    Args:
+        engine: UniversityRecommendationSystem
+        scores: Матрица баллов (абитуриенты × subject id), строки из subjects.score_vector()
+        preferences: Строки программ по убыванию предпочтения (абитуриенты × выборы, -1 - пусто)
+    """
+    n_applicants, n_choices = preferences.shape
+    places, elective_tracks = seat_places(engine)
+
+    # Заявления в порядке (абитуриент, предпочтение)
+    applicant = np.repeat(np.arange(n_applicants), n_choices)
+    choice = np.tile(np.arange(n_choices), n_applicants)
+    program = preferences.ravel().astype(np.int64)
+    listed = program >= 0
+    applicant, choice, program = applicant[listed], choice[listed], program[listed]
+
+    competitive_score, eligible, best_elective, tiebreak = score_applications(engine, scores, applicant, program)
+    capacity = places.ravel()
+    pool = program * TRACKS + np.where(elective_tracks[program], best_elective + 1, 0)
+    kept = eligible & (capacity[pool] > 0)
+    applicant, choice, program, pool = applicant[kept], choice[kept], program[kept], pool[kept]
+    competitive_score, tiebreak = competitive_score[kept], tiebreak[kept]
+    track = pool % TRACKS
+
+    # Ранг заявления: конкурс, затем балл и баллы по приоритетам по убыванию, затем номер абитуриента
+    keys = [applicant] + [-tiebreak[:, level] for level in reversed(range(MAX_PRIORITY))] + [-competitive_score, pool]
+    rank = np.empty(len(applicant), dtype=np.int64)
+    rank[np.lexsort(keys)] = np.arange(len(applicant))
+
+    start = np.searchsorted(applicant, np.arange(n_applicants))
+    count = np.bincount(applicant, minlength=n_applicants)
+    next_choice = np.zeros(n_applicants, dtype=np.int64)
+    held = np.empty(0, dtype=np.int64)
+    free = np.flatnonzero(count > 0)
+    rounds = 0
+
+    while len(free):
+        rounds += 1
+        proposals = start[free] + next_choice[free]
+        next_choice[free] += 1
+        proposals = proposals[np.argsort(rank[proposals])]
+        candidates = np.insert(held, np.searchsorted(rank[held], rank[proposals]), proposals)
+
+        pools = pool[candidates]
+        position = np.arange(len(candidates)) - np.searchsorted(pools, pools)
+        kept = position < capacity[pools]
+        held = candidates[kept]
+
+        rejected = applicant[candidates[~kept]]
+        free = rejected[next_choice[rejected] < count[rejected]]
+
+    result_program = np.full(n_applicants, -1, dtype=np.int32)
+    result_track = np.zeros(n_applicants, dtype=np.int8)
+    result_choice = np.full(n_applicants, -1, dtype=np.int32)
+    result_score = np.full(n_applicants, np.nan)
+    admitted_applicants = applicant[held]
+    result_program[admitted_applicants] = program[held]
+    result_track[admitted_applicants] = track[held]
+    result_choice[admitted_applicants] = choice[held]
+    result_score[admitted_applicants] = competitive_score[held]
+
+    admitted = np.bincount(pool[held], minlength=len(capacity))
+    cutoffs = np.where(capacity > 0, -np.inf, np.nan)
+    full = np.flatnonzero((capacity > 0) & (admitted >= capacity))
+    last = np.searchsorted(pool[held], full, side='right') - 1
+    cutoffs[full] = competitive_score[held[last]]
+
+    return Allocation(result_program, result_track, result_choice, result_score,
+                      admitted.reshape(places.shape), cutoffs.reshape(places.shape), rounds)
+
+
+def synthetic_preferences(engine, n_applicants: int, applications: int = APPLICATIONS,
+                          seed: int = 0, chunk_size: int = 2048) -> Tuple[np.ndarray, np.ndarray]:
+    """Синтетические абитуриенты admission_sim.py: (баллы, списки предпочтений)"""
+    model = AdmissionModel(engine)
+    rng = np.random.default_rng(seed)
+    scores, preferences = [], []
+    for start in range(0, n_applicants, chunk_size):
+        chunk = model.sample_applicants(min(chunk_size, n_applicants - start), rng)
+        scores.append(chunk)
+        preferences.append(model.preferences(chunk, rng, applications))
+    return np.concatenate(scores), np.concatenate(preferences)
+
+
+def program_report(engine, allocation: Allocation) -> List[Dict]:
+    """Итог по программам: места, зачисленные и проходной балл каждого конкурса"""
+    places, _ = seat_places(engine)
+    report = []
+    for row in range(len(engine.programs)):
+        tracks = []
+        for track in np.flatnonzero(places[row] > 0):
+            cutoff = allocation.cutoffs[row, track]
+            tracks.append({
+                'track': int(track),
+                'places': int(places[row, track]),
+                'admitted': int(allocation.admitted[row, track]),
+                'cutoff': float(cutoff) if np.isfinite(cutoff) else None
+            })
+        if tracks:
+            report.append({'program_code': int(engine.programs.program_code[row]), 'tracks': tracks})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Распределение мест алгоритмом отложенного согласия')
+    parser.add_argument('--database', default='programs_database.csv', help='CSV база программ')
+    parser.add_argument('--applicants', type=int, default=40000, help='синтетических абитуриентов')
+    parser.add_argument('--applications', type=int, default=APPLICATIONS, help='программ в списке абитуриента')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='', help='JSON с итогом по программам')
+    args = parser.parse_args()
+
+    from recommendation_system import UniversityRecommendationSystem
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = UniversityRecommendationSystem(args.database)
+
+    scores, preferences = synthetic_preferences(engine, args.applicants, args.applications, args.seed)
+    started = time.perf_counter()
+    allocation = allocate(engine, scores, preferences)
+    elapsed = time.perf_counter() - started
+
+    assigned = allocation.program >= 0
+    print(f"✓ {args.applicants} абитуриентов × {len(engine.programs)} программ: "
+          f"{elapsed:.2f} с, раундов: {allocation.rounds}")
+    print(f"✓ Зачислено: {assigned.sum()} ({assigned.mean():.1%}), "
+          f"по первому выбору: {(allocation.choice == 0).sum()}")
+    print(f"✓ Конкурсов с заполненными местами: {np.isfinite(allocation.cutoffs).sum()}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(program_report(engine, allocation), f, ensure_ascii=False, indent=2)
+        print(f"✓ Итог по программам: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,27 @@ Flask веб-приложение для системы рекомендаций
 Интерфейс на грузинском языке
 """
 
-from flask import Flask, render_template, request, jsonify
-from recommendation_system import UniversityRecommendationSystem
+import hmac
+import io
+import itertools
+import json
+import math
 import os
+import time
+from typing import NamedTuple
+
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from recommendation_system import UniversityRecommendationSystem
+from admission_sim import AdmissionCutoffs
+from catalogs import CatalogRegistry, CatalogUnavailable, UnknownCatalog, parse_catalogs
+from categories import DEFAULT_CATEGORY, CategoryMatcher
+from concurrency import AdmissionControl, Overloaded, SingleFlight
+from exam_subjects import FOREIGN_LANGUAGE
+from http_cache import CachedBody, cached_response
+from metrics import REGISTRY, finish_request, server_timing_header, start_request
+from result_cache import ResultCache, SharedResultStore
 
 app = Flask(__name__)
 
@@ -19,8 +37,6 @@ if not os.path.exists(DB_PATH):
     if not os.path.exists(DB_PATH):
         raise FileNotFoundError("База данных programs_database.csv не найдена!")
 
-system = UniversityRecommendationSystem(DB_PATH)
-
 # Константы для интерфейса
 CITIES = {
     'ყველა': 'ყველა ქალაქი',
@@ -61,9 +77,9 @@ CATEGORIES = {
 
 LANGUAGES = {
     'ყველა': 'ყველა ენა',
-    'ქართული': 'ქართული ენა',
-    'ინგლისური': 'ინგლისური ენა',
-    'რუსული': 'რუსული ენა'
+    'ქართული ენა': 'ქართული ენა',
+    'ინგლისური ენა': 'ინგლისური ენა',
+    'რუსული ენა': 'რუსული ენა'
 }
 
 FOREIGN_LANGUAGES = {
@@ -88,143 +104,882 @@ ALL_EXAMS = [
 ]
 
 
+def build_exam_catalog_responses(engine):
+    """
+    Готовые JSON-ответы /get_required_exams для всех комбинаций фильтров интерфейса
+    
+    Ключ - фильтры в виде parse_filters() ('ყველა' → None), значение - CachedBody
+    с ETag от версии данных.
+    """
+    dimensions = [
+        [None if value == 'ყველა' else value for value in options]
+        for options in (CITIES, UNI_TYPES, CATEGORIES, LANGUAGES)
+    ]
+    return {
+        key: CachedBody(exam_catalog_body(exams), 'application/json', engine.data_version)
+        for key, exams in engine.build_exam_catalog(*dimensions).items()
+    }
+
+
+def render_index(version):
+    """Главная страница: шаблон рендерится один раз на версию данных и сжимается заранее"""
+    with app.app_context():
+        html = render_template('index.html',
+                               cities=CITIES,
+                               uni_types=UNI_TYPES,
+                               categories=CATEGORIES,
+                               languages=LANGUAGES,
+                               foreign_languages=FOREIGN_LANGUAGES,
+                               all_exams=ALL_EXAMS)
+    return CachedBody(html.encode(), 'text/html', version, precompress=True)
+
+
+def exam_catalog_body(exams):
+    """JSON-тело ответа /get_required_exams для результата get_required_exams()"""
+    if exams['programs_found'] == 0:
+        payload = {
+            'success': False,
+            'message': 'არცერთი პროგრამა არ მოიძებნა შერჩეული ფილტრებით'
+        }
+    else:
+        payload = {
+            'success': True,
+            'programs_found': exams['programs_found'],
+            'mandatory_exams': exams['mandatory'],
+            'elective_exams': exams['elective'][:15]  # Ограничиваем количество
+        }
+    return app.json.dumps(payload, separators=(',', ':')).encode()
+
+
+# Правила категорий: встроенные, дополненные из JSON-файла CATEGORY_RULES (если задан).
+# Скомпилированы один раз и используются при каждой перезагрузке базы
+CATEGORY_RULES = os.environ.get('CATEGORY_RULES', '')
+category_matcher = CategoryMatcher.from_file(CATEGORY_RULES) if CATEGORY_RULES else CategoryMatcher()
+
+# Категории из файла правил тоже попадают в интерфейс ('სხვა' остается последней)
+for category in category_matcher.categories:
+    if category not in CATEGORIES:
+        CATEGORIES[category] = category
+CATEGORIES[DEFAULT_CATEGORY] = CATEGORIES.pop(DEFAULT_CATEGORY)
+
+# Каталог бинарных снимков подготовленной базы (пустая строка отключает снимки)
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), '.snapshots'))
+
+# Период проверки CSV на изменения в секундах (0 отключает горячую перезагрузку)
+RELOAD_INTERVAL = float(os.environ.get('RELOAD_INTERVAL', 30))
+
+# Проходные баллы симуляции (python admission_sim.py --output cutoffs.npz);
+# если заданы и посчитаны для текущей версии базы, в выдаче появляется вероятность поступления
+CUTOFFS_PATH = os.environ.get('CUTOFFS_PATH', '')
+
+# Токен для /admin/reload (если не задан, эндпоинт отключен)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Сколько секунд браузеры и прокси могут отдавать главную страницу и каталог
+# экзаменов (GET) без перепроверки; после этого - условный запрос с ETag (304)
+HTTP_MAX_AGE = int(os.environ.get('HTTP_MAX_AGE', 60))
+
+# Дополнительные каталоги программ (например, прошлых лет), выбираются параметром
+# запроса catalog: "2024=/data/2024.csv,2023=/data/2023.csv". Основной каталог -
+# DB_PATH под именем DEFAULT_CATALOG, он же отвечает на запросы без параметра
+DEFAULT_CATALOG = os.environ.get('DEFAULT_CATALOG', 'main')
+CATALOGS = {DEFAULT_CATALOG: DB_PATH, **parse_catalogs(os.environ.get('CATALOGS', ''))}
+
+# Бюджет памяти загруженных каталогов в МБ (0 - без ограничения): при превышении
+# вытесняются давно не использованные каталоги, кроме основного
+CATALOG_MEMORY_MB = float(os.environ.get('CATALOG_MEMORY_MB', 0))
+
+# Сколько секунд запрос ждет загрузки холодного каталога, прежде чем получить 503
+CATALOG_LOAD_WAIT = float(os.environ.get('CATALOG_LOAD_WAIT', 2))
+
+# Ограничение нагрузки на воркер (потоки gthread, см. Procfile): сколько вычислений
+# рекомендаций, справочника экзаменов, сравнений и т.п. идут одновременно (0 - без
+# ограничения), сколько запросов ждут в очереди и сколько секунд. Остальные сразу
+# получают 503 "сервер занят" с Retry-After; ответы из кэша ограничение не затрагивает
+MAX_ACTIVE_REQUESTS = int(os.environ.get('MAX_ACTIVE_REQUESTS', 2))
+MAX_QUEUED_REQUESTS = int(os.environ.get('MAX_QUEUED_REQUESTS', 12))
+QUEUE_TIMEOUT = float(os.environ.get('QUEUE_TIMEOUT', 1))
+
+# Сколько секунд одинаковый запрос ждет уже идущего вычисления, прежде чем получить 503
+COALESCE_TIMEOUT = float(os.environ.get('COALESCE_TIMEOUT', 10))
+
+# Через сколько секунд повторить запрос после отказа (и сколько кэшировать отказ)
+BUSY_RETRY_AFTER = 2
+
+# Наибольший размер тела запроса в МБ (больше - 413 еще до разбора JSON) и
+# отдельно для /recommendations/batch (десятки тысяч абитуриентов)
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('MAX_REQUEST_MB', 4)) * 1024 * 1024)
+MAX_BATCH_MB = float(os.environ.get('MAX_BATCH_MB', 64))
+
+# Сколько абитуриентов пакета считается за одно место в ограничении нагрузки
+BATCH_CHUNK_SIZE = 256
+
+
+class ServingState(NamedTuple):
+    """Неизменяемая версия данных: движок и все, что из него предрасчитано"""
+    engine: UniversityRecommendationSystem
+    exam_catalog: dict
+    version: str
+    index_page: CachedBody
+
+
+def load_state(catalog, path):
+    """Готовит движок и предрасчитанные ответы для файла базы каталога catalog"""
+    # Снимки дополнительных каталогов - в своих папках: у файлов разных лет может
+    # совпадать имя, а снимки прежних версий удаляются по имени файла
+    snapshot_dir = SNAPSHOT_DIR if catalog == DEFAULT_CATALOG or not SNAPSHOT_DIR else os.path.join(SNAPSHOT_DIR, catalog)
+    engine = UniversityRecommendationSystem(path, snapshot_dir=snapshot_dir or None, categorizer=category_matcher)
+    if catalog == DEFAULT_CATALOG and CUTOFFS_PATH and os.path.exists(CUTOFFS_PATH):
+        try:
+            engine.set_cutoffs(AdmissionCutoffs.load(CUTOFFS_PATH))
+        except (OSError, KeyError, ValueError) as e:
+            # Чаще всего - другая версия данных: симуляцию нужно запустить заново
+            # на этой базе с теми же CATEGORY_RULES
+            print(f"⚠ Проходные баллы {CUTOFFS_PATH} не подключены, вероятности поступления не будет: {e}")
+    return ServingState(engine, build_exam_catalog_responses(engine), engine.data_version,
+                        render_index(engine.data_version))
+
+
+# Кэш готовых ответов /get_recommendations: в памяти воркера и, если задан
+# RESULT_CACHE_SHARED (путь к файлу SQLite, лучше в /dev/shm), общий для всех воркеров
+RESULT_CACHE_SHARED = os.environ.get('RESULT_CACHE_SHARED', '')
+recommendation_cache = ResultCache(
+    max_entries=int(os.environ.get('RESULT_CACHE_ENTRIES', 10000)),
+    max_bytes=int(os.environ.get('RESULT_CACHE_MB', 64)) * 1024 * 1024,
+    shared=SharedResultStore(RESULT_CACHE_SHARED) if RESULT_CACHE_SHARED else None
+)
+
+
+def state_size(state):
+    """Оценка памяти состояния каталога: подготовленные данные движка и готовые ответы"""
+    return state.engine.memory_bytes() + len(state.index_page.body) + sum(
+        len(body.body) for body in state.exam_catalog.values()
+    )
+
+
+catalogs = CatalogRegistry(
+    CATALOGS, DEFAULT_CATALOG, load_state, interval=RELOAD_INTERVAL,
+    memory_budget=int(CATALOG_MEMORY_MB * 1024 * 1024), load_wait=CATALOG_LOAD_WAIT, size_of=state_size,
+    on_publish=lambda previous, state: recommendation_cache.add_version(state.version, replaces=previous),
+    on_evict=lambda state: recommendation_cache.drop_version(state.version)
+)
+
+
+# Одновременные одинаковые запросы (те же нормализованные параметры и версия данных)
+# считаются один раз; вычисления идут через ограничение нагрузки
+coalescer = SingleFlight(COALESCE_TIMEOUT)
+admission = AdmissionControl(MAX_ACTIVE_REQUESTS, MAX_QUEUED_REQUESTS, QUEUE_TIMEOUT)
+
+# Готовое тело отказа при перегрузке
+BUSY_MESSAGE = 'სერვერი გადატვირთულია, სცადეთ რამდენიმე წამში'
+BUSY_BODY = json.dumps({
+    'success': False,
+    'message': BUSY_MESSAGE
+}, ensure_ascii=False).encode()
+
+
+def requested_catalog():
+    """Имя каталога из параметра catalog (строка запроса или поле JSON-объекта тела); None - основной"""
+    name = request.args.get('catalog')
+    if name is None and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            name = data.get('catalog')
+    return name if isinstance(name, str) and name else None
+
+
+def current_state():
+    """Версия данных выбранного каталога для текущего запроса (читается один раз за запрос)"""
+    state = catalogs.get(requested_catalog())
+    g.data_version = state.version
+    return state
+
+
+@app.errorhandler(UnknownCatalog)
+def unknown_catalog(error):
+    return jsonify({'success': False, 'message': 'კატალოგი ვერ მოიძებნა'}), 404
+
+
+@app.errorhandler(CatalogUnavailable)
+def catalog_unavailable(error):
+    """Холодный каталог еще загружается: клиент повторит запрос через Retry-After секунд"""
+    response = jsonify({'success': False, 'message': 'კატალოგი იტვირთება, სცადეთ რამდენიმე წამში'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+class InvalidRequest(ValueError):
+    """Тело или поле запроса неверного типа - ответ 400 вместо ошибки при расчете"""
+
+
+@app.errorhandler(InvalidRequest)
+def invalid_request(error):
+    return jsonify({'success': False, 'message': 'არასწორი მოთხოვნა'}), 400
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    return jsonify({'success': False, 'message': 'მოთხოვნა ძალიან დიდია'}), 413
+
+
+@app.errorhandler(Overloaded)
+def overloaded(error):
+    """Очередь вычислений заполнена: быстрый отказ, который прокси могут отдавать из кэша"""
+    response = Response(BUSY_BODY, status=503, mimetype='application/json')
+    response.headers['Retry-After'] = str(BUSY_RETRY_AFTER)
+    response.headers['Cache-Control'] = f'public, max-age={BUSY_RETRY_AFTER}'
+    return response
+
+
+@app.before_request
+def start_timing():
+    """Начинаем замер этапов запроса"""
+    g.request_started = time.perf_counter()
+    start_request()
+
+
+@app.after_request
+def add_data_version(response):
+    """Сообщаем версию данных, чтобы кэши могли учитывать ее в ключе"""
+    data_version = g.get('data_version')
+    if data_version:
+        response.headers['X-Data-Version'] = data_version
+    return response
+
+
+@app.after_request
+def add_server_timing(response):
+    """Длительность этапов запроса в Server-Timing и общая длительность в гистограмму view"""
+    timings = finish_request()
+    started = g.get('request_started')
+    if started is not None and REGISTRY.enabled:
+        total = time.perf_counter() - started
+        REGISTRY.observe(f'view_{request.endpoint}', total)
+        response.headers['Server-Timing'] = server_timing_header(timings + [('total', total)])
+    return response
+
+# Максимальный размер страницы рекомендаций
+MAX_TOP_N = 100
+
+# Наибольшее число подсказок автодополнения
+MAX_SUGGESTIONS = 20
+
+
+def request_object():
+    """
+    JSON-тело запроса, которое должно быть объектом
+    
+    Raises:
+        InvalidRequest: тело - не JSON-объект (null, массив, число...)
+    """
+    data = request.json
+    if not isinstance(data, dict):
+        raise InvalidRequest(type(data).__name__)
+    return data
+
+
+def parse_filters(data):
+    """
+    Извлекает фильтры из запроса: 'ყველა' или пустое значение означает без фильтра,
+    список значений - любое из них
+    
+    Raises:
+        InvalidRequest: запрос не объект или значение фильтра не строка и не список строк
+    """
+    if not isinstance(data, dict):
+        raise InvalidRequest(type(data).__name__)
+    filters = {}
+    for key in ('city', 'uni_type', 'category', 'teaching_language'):
+        value = data.get(key, 'ყველა')
+        if not (value is None or isinstance(value, str)
+                or isinstance(value, list) and all(isinstance(item, str) for item in value)):
+            raise InvalidRequest(key)
+        if isinstance(value, list):
+            value = None if 'ყველა' in value else value
+        elif value == 'ყველა':
+            value = None
+        filters[key] = value or None
+    
+    # Языки в каталоге - "ქართული ენა"; прежние значения фильтра ("ქართული") тоже принимаем
+    language = filters['teaching_language']
+    if isinstance(language, str):
+        filters['teaching_language'] = language_name(language)
+    elif language:
+        filters['teaching_language'] = [language_name(value) for value in language]
+    return filters
+
+
+def language_name(value):
+    return value if not isinstance(value, str) or value.endswith(' ენა') else f'{value} ენა'
+
+
+def parse_codes(values):
+    """
+    Коды программ или университетов из запроса: список целых чисел или строк
+    с числами (нет значения - пустой список)
+    
+    Raises:
+        ValueError: не список, элемент не целое число и не строка с числом или
+            код вне диапазона int64
+    """
+    if values is None:
+        return []
+    if not isinstance(values, list):
+        raise ValueError(values)
+    if any(isinstance(code, bool) or not isinstance(code, (int, str)) for code in values):
+        raise ValueError(values)
+    codes = [int(code) for code in values]
+    if any(not -2 ** 63 <= code < 2 ** 63 for code in codes):
+        raise ValueError(codes)
+    return codes
+
+
+def parse_top_n(data):
+    """
+    Размер страницы из запроса (по умолчанию 20), приведенный к 1..MAX_TOP_N
+    
+    Raises:
+        InvalidRequest: top_n не число
+    """
+    try:
+        return min(max(int(data.get('top_n', 20)), 1), MAX_TOP_N)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise InvalidRequest('top_n') from e
+
+
+def prepare_exam_scores(data):
+    """
+    Проверяет баллы абитуриента и приводит иностранный язык к "უცხოური ენა"
+    
+    Returns:
+        (exam_scores, None) или (None, сообщение об ошибке)
+    
+    Raises:
+        InvalidRequest: exam_scores не объект, балл не конечное число или
+            foreign_language не строка
+    """
+    foreign_language = data.get('foreign_language')
+    
+    # Получаем баллы по экзаменам
+    exam_scores_raw = data.get('exam_scores', {})
+    if not isinstance(exam_scores_raw, dict) or not all(map(is_score, exam_scores_raw.values())):
+        raise InvalidRequest('exam_scores')
+    if foreign_language is not None and not isinstance(foreign_language, str):
+        raise InvalidRequest('foreign_language')
+    
+    # Проверяем обязательные экзамены
+    if 'ქართული ენა და ლიტერატურა' not in exam_scores_raw:
+        return None, 'გთხოვთ შეიყვანოთ ქულა ქართულ ენაში'
+    
+    if not foreign_language or foreign_language not in exam_scores_raw:
+        return None, 'გთხოვთ აირჩიოთ უცხოური ენა და შეიყვანოთ ქულა'
+    
+    # Проверяем что есть хотя бы один дополнительный предмет
+    other_exams = {k: v for k, v in exam_scores_raw.items() 
+                   if k not in ['ქართული ენა და ლიტერატურა', foreign_language]}
+    
+    if len(other_exams) == 0:
+        return None, 'გთხოვთ აირჩიოთ მინიმუმ ერთი დამატებითი საგანი'
+    
+    # Подготавливаем баллы: заменяем конкретный иностранный язык на "უცხოური ენა",
+    # все варианты написания в базе сводятся к нему реестром предметов
+    exam_scores = exam_scores_raw.copy()
+    exam_scores[FOREIGN_LANGUAGE] = exam_scores.pop(foreign_language, 0)
+    
+    return exam_scores, None
+
+
+def is_score(value):
+    """Балл - конечное число (не bool, не строка, не null и не NaN)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        return False
+
+
 @app.route('/')
 def index():
-    """Главная страница"""
-    return render_template('index.html',
-                         cities=CITIES,
-                         uni_types=UNI_TYPES,
-                         categories=CATEGORIES,
-                         languages=LANGUAGES,
-                         foreign_languages=FOREIGN_LANGUAGES,
-                         all_exams=ALL_EXAMS)
+    """Главная страница (готовая, с ETag и сжатыми вариантами)"""
+    return cached_response(request, current_state().index_page, f'public, max-age={HTTP_MAX_AGE}')
 
 
-@app.route('/get_required_exams', methods=['POST'])
+@app.route('/get_required_exams', methods=['GET', 'POST'])
 def get_required_exams():
     """
     API endpoint для получения списка необходимых экзаменов
     на основе выбранных фильтров
+    
+    Фильтры - в JSON-теле POST или в параметрах GET (?city=...&category=...;
+    повторенный параметр - список значений). Ответ на GET кэшируется браузерами
+    и прокси и поддерживает условные запросы (ETag от версии данных).
     """
-    data = request.json
+    if request.method == 'GET':
+        data = {key: values if len(values) > 1 else values[0] for key, values in request.args.lists()}
+    else:
+        data = request_object()
+    filters = parse_filters(data)
     
-    city = data.get('city', 'ყველა')
-    uni_type = data.get('uni_type', 'ყველა')
-    category = data.get('category', 'ყველა')
-    teaching_language = data.get('teaching_language', 'ყველა')
-    
-    # Фильтруем программы
-    filtered = system.filter_programs(
-        city=city if city != 'ყველა' else None,
-        uni_type=uni_type if uni_type != 'ყველა' else None,
-        category=category if category != 'ყველა' else None,
-        teaching_language=teaching_language if teaching_language != 'ყველა' else None
-    )
+    # Все комбинации фильтров интерфейса рассчитаны заранее, остальные (списки значений) считаем на лету
+    key = tuple(filters.values())
+    state = current_state()
+    body = state.exam_catalog.get(key) if not any(isinstance(value, list) for value in key) else None
+    if body is None:
+        body, _ = coalescer.do(('exams', state.version, canonical_filters(filters)),
+                               lambda: exam_catalog_response(state, filters))
+    else:
+        REGISTRY.inc('exam_catalog_hits')
+    
+    if request.method == 'GET':
+        return cached_response(request, body, f'public, max-age={HTTP_MAX_AGE}')
+    return Response(body.body, mimetype=body.mimetype)
+
+
+def exam_catalog_response(state, filters):
+    """Тело /get_required_exams для фильтров, которых нет среди рассчитанных заранее"""
+    with admission.slot(), REGISTRY.stage('exams'):
+        return CachedBody(exam_catalog_body(state.engine.get_required_exams(**filters)),
+                          'application/json', state.version)
+
+
+@app.route('/get_recommendations', methods=['POST'])
+def get_recommendations():
+    """
+    API endpoint для получения рекомендаций программ
+    """
+    data = request_object()
     
-    if len(filtered) == 0:
+    # Получаем параметры фильтров
+    filters = parse_filters(data)
+    exam_scores, error = prepare_exam_scores(data)
+    if error:
         return jsonify({
             'success': False,
-            'message': 'არცერთი პროგრამა არ მოიძებნა შერჩეული ფილტრებით'
+            'message': error
         })
     
-    # Получаем необходимые экзамены
-    exams = system.get_required_exams(
-        city=city if city != 'ყველა' else None,
-        uni_type=uni_type if uni_type != 'ყველა' else None,
-        category=category if category != 'ყველა' else None,
-        teaching_language=teaching_language if teaching_language != 'ყველა' else None
+    # Поиск по названию программы/университета ограничивает выдачу подходящими программами
+    query = data.get('query')
+    query = query.strip() if isinstance(query, str) else None
+    
+    # Получаем рекомендации (размер страницы и курсор для "შემდეგი 20")
+    state = current_state()
+    try:
+        top_n = parse_top_n(data)
+        cursor = data.get('cursor') or None
+        if cursor is not None and not isinstance(cursor, str):
+            raise InvalidRequest('cursor')
+        with REGISTRY.stage('cache'):
+            key = recommendation_cache_key(state.engine, filters, exam_scores, top_n, cursor, query)
+            body = recommendation_cache.get(state.version, key)
+        if body is None:
+            # Одновременные одинаковые запросы ждут первый и получают его ответ
+            body, _ = coalescer.do((state.version, key), lambda: compute_recommendations(
+                state, key, filters, exam_scores, top_n, cursor, query
+            ))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'არასწორი მოთხოვნა'
+        }), 400
+    
+    return Response(body, mimetype='application/json')
+
+
+def compute_recommendations(state, key, filters, exam_scores, top_n, cursor, query):
+    """Считает страницу рекомендаций (в пределах ограничения нагрузки) и кладет тело в кэш"""
+    with admission.slot():
+        page = state.engine.recommend_page(
+            **filters,
+            exam_scores=exam_scores,
+            top_n=top_n,
+            cursor=cursor,
+            as_json=True,
+            query=query or None
+        )
+        with REGISTRY.stage('serialize'):
+            body = recommendations_body(page)
+    recommendation_cache.put(state.version, key, body)
+    return body
+
+
+def canonical_filters(filters):
+    """Фильтры в виде ключа: списки значений упорядочены и без повторов"""
+    return tuple(
+        tuple(sorted(set(value))) if isinstance(value, list) else value
+        for value in filters.values()
     )
+
+
+def recommendation_cache_key(engine, filters, exam_scores, top_n, cursor, query=None):
+    """
+    Нормализованный ключ запроса рекомендаций
     
-    # Фильтруем выборочные экзамены (исключаем мусорные данные)
-    elective_clean = []
-    for exam in exams['elective']:
-        exam_str = str(exam).strip()
-        # Исключаем числа и процентые обозначения
-        if exam_str and not exam_str.replace('%', '').replace('-', '').replace('ზე', '').replace('მეტი', '').strip().isdigit():
-            if exam_str not in ['25%', '30%', '40%', '50%']:
-                elective_clean.append(exam_str)
+    Списки фильтров упорядочиваются, баллы сводятся к subject id реестра,
+    неизвестные предметы отбрасываются.
+    """
+    canonical_scores = tuple(sorted(
+        (subject_id, repr(raw_score))
+        for subject_id, raw_score in engine.subjects.resolve_scores(exam_scores).items()
+    ))
+    return canonical_filters(filters), canonical_scores, top_n, cursor, query or None
+
+
+def recommendations_body(page):
+    """
+    JSON-тело ответа /get_recommendations для страницы recommend_page(as_json=True)
     
-    return jsonify({
+    Рекомендации уже сериализованы движком из готовых фрагментов программ и
+    вставляются в ответ как есть.
+    """
+    if page['total_found'] == 0:
+        payload = {
+            'success': False,
+            'message': 'არცერთი შესაბამისი პროგრამა არ მოიძებნა'
+        }
+        return app.json.dumps(payload, separators=(',', ':')).encode()
+    
+    payload = {
         'success': True,
-        'programs_found': len(filtered),
-        'mandatory_exams': exams['mandatory'],
-        'elective_exams': elective_clean[:15]  # Ограничиваем количество
-    })
+        'total_found': page['total_found'],
+        'next_cursor': page['next_cursor']
+    }
+    return embed_json(payload, 'recommendations', page['recommendations'])
 
 
-@app.route('/get_recommendations', methods=['POST'])
-def get_recommendations():
+def embed_json(payload, key, raw):
+    """JSON-объект payload с дополнительным полем key, значение которого - готовый JSON (bytes)"""
+    head = app.json.dumps(payload, separators=(',', ':'))[:-1].encode()
+    return head + b',' + app.json.dumps(key).encode() + b':' + raw + b'}'
+
+
+@app.route('/recommendations/batch', methods=['POST'])
+def recommendations_batch():
     """
-    API endpoint для получения рекомендаций программ
+    Пакетные рекомендации для многих абитуриентов (класс, школа, центр)
+    
+    Принимает JSON-массив абитуриентов или NDJSON (по одному на строку) с теми же
+    полями, что и /get_recommendations, плюс необязательный 'id'. Результаты
+    отдаются потоком NDJSON, по строке на абитуриента в порядке входных данных;
+    каждая строка содержит 'index' - позицию абитуриента во входных данных.
+    Ошибка в данных абитуриента дает строку с 'success': false только для него.
+    
+    Пакет считается блоками по BATCH_CHUNK_SIZE абитуриентов (NDJSON и разбирается
+    по блокам), каждый блок - за отдельное место в ограничении нагрузки, и отдается
+    сразу: память не растет с размером пакета, а медленный клиент не держит место
+    вычислений. Первый блок считается до ответа, поэтому при заполненной очереди
+    запрос получает 503; если очередь заполнилась позже, абитуриенты блока получают
+    строки с отказом. Тело больше MAX_BATCH_MB отклоняется (413) до разбора.
     """
-    data = request.json
+    request.max_content_length = int(MAX_BATCH_MB * 1024 * 1024)
+    body = request.get_data()
     
-    # Получаем параметры фильтров
-    city = data.get('city', 'ყველა')
-    uni_type = data.get('uni_type', 'ყველა')
-    category = data.get('category', 'ყველა')
-    teaching_language = data.get('teaching_language', 'ყველა')
-    foreign_language = data.get('foreign_language')
+    if body.lstrip().startswith(b'['):
+        try:
+            students = json.loads(body)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'არასწორი JSON ფორმატი'
+            }), 400
+    else:
+        students = parse_ndjson(body)
     
-    # Получаем баллы по экзаменам
-    exam_scores_raw = data.get('exam_scores', {})
+    top_n = min(max(request.args.get('top_n', 20, type=int), 1), MAX_TOP_N)
+    engine = current_state().engine
     
-    # Проверяем обязательные экзамены
-    if 'ქართული ენა და ლიტერატურა' not in exam_scores_raw:
+    students = enumerate(students)
+    chunk = list(itertools.islice(students, BATCH_CHUNK_SIZE))
+    with admission.slot():
+        first_lines = batch_lines(engine, chunk, top_n)
+    
+    def generate():
+        yield from first_lines
+        while chunk := list(itertools.islice(students, BATCH_CHUNK_SIZE)):
+            try:
+                with admission.slot():
+                    lines = batch_lines(engine, chunk, top_n)
+            except Overloaded:
+                lines = [batch_error(index, student, BUSY_MESSAGE) for index, student in chunk]
+            yield from lines
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def parse_ndjson(body):
+    """Абитуриенты из NDJSON по одному по мере чтения; строка с неверным JSON - None"""
+    for line in io.BytesIO(body):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def batch_lines(engine, chunk, top_n):
+    """
+    Строки ответа /recommendations/batch для блока пар (index, абитуриент)
+    
+    Абитуриенты блока группируются по одинаковым фильтрам (эквивалентные наборы -
+    в одну группу), чтобы фильтровать программы один раз на группу.
+    """
+    lines = {}
+    groups = {}
+    for index, student in chunk:
+        try:
+            filters = parse_filters(student)
+            exam_scores, error = prepare_exam_scores(student)
+        except InvalidRequest:
+            error = 'არასწორი მოთხოვნა'
+        if error:
+            lines[index] = batch_error(index, student, error)
+            continue
+        group = groups.setdefault(canonical_filters(filters), (filters, [], []))
+        group[1].append((index, student.get('id')))
+        group[2].append(exam_scores)
+    
+    for filters, students_meta, exam_scores_list in groups.values():
+        results = engine.recommend_programs_batch(
+            **filters,
+            exam_scores_list=exam_scores_list,
+            top_n=top_n,
+            as_json=True
+        )
+        for (index, student_id), (recommendations, total_found) in zip(students_meta, results):
+            if total_found == 0:
+                line = {
+                    'index': index,
+                    'id': student_id,
+                    'success': False,
+                    'message': 'არცერთი შესაბამისი პროგრამა არ მოიძებნა'
+                }
+                lines[index] = app.json.dumps(line).encode() + b'\n'
+            else:
+                line = {
+                    'index': index,
+                    'id': student_id,
+                    'success': True,
+                    'total_found': total_found
+                }
+                lines[index] = embed_json(line, 'recommendations', recommendations) + b'\n'
+    
+    return [lines[index] for index in sorted(lines)]
+
+
+def batch_error(index, student, message):
+    """Строка ответа /recommendations/batch с ошибкой для одного абитуриента"""
+    return app.json.dumps({
+        'index': index,
+        'id': student.get('id') if isinstance(student, dict) else None,
+        'success': False,
+        'message': message
+    }).encode() + b'\n'
+
+
+@app.route('/what_do_i_need', methods=['POST'])
+def what_do_i_need():
+    """
+    Какие баллы нужны абитуриенту, чтобы пройти на программы
+    
+    Принимает те же поля, что и /get_recommendations, плюс необязательные
+    'program_codes' (список кодов программ; без него берутся top_n лучших по
+    фильтрам) и цель: 'target' (chance_level, по умолчанию 'high') или
+    'target_compatibility' (процент). Для каждой программы возвращает
+    непройденные пороги и минимальный балл по каждому предмету, которого
+    достаточно для цели, - вместо многократных запросов с подобранными баллами.
+    """
+    data = request_object()
+    
+    filters = parse_filters(data)
+    exam_scores, error = prepare_exam_scores(data)
+    if error:
         return jsonify({
             'success': False,
-            'message': 'გთხოვთ შეიყვანოთ ქულა ქართულ ენაში'
+            'message': error
         })
     
-    if not foreign_language or foreign_language not in exam_scores_raw:
+    state = current_state()
+    engine = state.engine
+    try:
+        if data.get('target_compatibility') is not None:
+            target_compatibility = float(data['target_compatibility'])
+        else:
+            target_compatibility = engine.CHANCE_THRESHOLDS[data.get('target', 'high')]
+        program_codes = parse_codes(data.get('program_codes'))
+        top_n = parse_top_n(data)
+        if not 0 <= target_compatibility <= 100 or len(program_codes) > MAX_TOP_N:
+            raise ValueError(target_compatibility)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'არასწორი მოთხოვნა'
+        }), 400
+    
+    with admission.slot():
+        programs = engine.what_do_i_need(
+            **filters,
+            exam_scores=exam_scores,
+            target_compatibility=target_compatibility,
+            program_codes=program_codes,
+            top_n=top_n
+        )
+    
+    if len(programs) == 0:
         return jsonify({
             'success': False,
-            'message': 'გთხოვთ აირჩიოთ უცხოური ენა და შეიყვანოთ ქულა'
+            'message': 'არცერთი შესაბამისი პროგრამა არ მოიძებნა'
         })
     
-    # Проверяем что есть хотя бы один дополнительный предмет
-    other_exams = {k: v for k, v in exam_scores_raw.items() 
-                   if k not in ['ქართული ენა და ლიტერატურა', foreign_language]}
+    return jsonify({
+        'success': True,
+        'target_compatibility': target_compatibility,
+        'programs': programs
+    })
+
+
+@app.route('/compare', methods=['POST'])
+def compare():
+    """
+    Сравнение выбранных программ бок о бок
     
-    if len(other_exams) == 0:
+    Принимает баллы, как /get_recommendations, и 'program_codes' (список кодов
+    программ) и/или 'university_codes' (все программы университетов). Считаются
+    только эти программы, без фильтров и top_n: ответ содержит поля выдачи
+    рекомендаций и разбор балла по экзаменам 'scored_exams' для каждой программы
+    в порядке запроса, а также 'not_found' - коды, которых нет в каталоге.
+    """
+    data = request_object()
+    
+    exam_scores, error = prepare_exam_scores(data)
+    if error:
         return jsonify({
             'success': False,
-            'message': 'გთხოვთ აირჩიოთ მინიმუმ ერთი დამატებითი საგანი'
+            'message': error
         })
     
-    # Подготавливаем баллы: заменяем конкретный иностранный язык на "უცხოური ენა"
-    exam_scores = exam_scores_raw.copy()
-    if foreign_language:
-        foreign_score = exam_scores.pop(foreign_language, 0)
-        # Добавляем под всеми возможными вариантами написания "უცხოური ენა"
-        exam_scores['უცხოური ენა'] = foreign_score
-        exam_scores['უცხოური ენა (ინგ.)'] = foreign_score
-        exam_scores['უცხოური ენა (გერ.; ინგ.; რუს.; ფრან.)'] = foreign_score
-        exam_scores['უცხოური ენა (ინგ.; რუს.; გერ.; ფრან.)'] = foreign_score
-        exam_scores['უცხოური ენა (გერ.)'] = foreign_score
-        exam_scores['უცხოური ენა (რუს.)'] = foreign_score
-        exam_scores['უცხოური ენა (ფრან.)'] = foreign_score
-    
-    # Получаем рекомендации
-    recommendations = system.recommend_programs(
-        city=city if city != 'ყველა' else None,
-        uni_type=uni_type if uni_type != 'ყველა' else None,
-        category=category if category != 'ყველა' else None,
-        teaching_language=teaching_language if teaching_language != 'ყველა' else None,
-        exam_scores=exam_scores,
-        top_n=20
-    )
+    try:
+        program_codes = parse_codes(data.get('program_codes'))
+        university_codes = parse_codes(data.get('university_codes'))
+        if not program_codes and not university_codes or len(program_codes) + len(university_codes) > MAX_TOP_N:
+            raise ValueError(program_codes)
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'არასწორი მოთხოვნა'
+        }), 400
     
-    if len(recommendations) == 0:
+    # Программы университетов раскрываются до расчета: больше MAX_TOP_N - отказ без расчета
+    try:
+        with admission.slot():
+            comparison = current_state().engine.compare_programs(exam_scores, program_codes, university_codes,
+                                                                 max_programs=MAX_TOP_N)
+    except ValueError:
         return jsonify({
             'success': False,
-            'message': 'არცერთი შესაბამისი პროგრამა არ მოიძებნა'
+            'message': 'არასწორი მოთხოვნა'
+        }), 400
+    if len(comparison['programs']) == 0:
+        return jsonify({
+            'success': False,
+            'message': 'არცერთი შესაბამისი პროგრამა არ მოიძებნა',
+            'not_found': comparison['not_found']
         })
     
     return jsonify({
         'success': True,
-        'recommendations': recommendations,
-        'total_found': len(recommendations)
+        **comparison
+    })
+
+
+@app.route('/autocomplete')
+def autocomplete():
+    """
+    Подсказки для поиска по названию программы или университета
+    
+    GET /autocomplete?q=ბიზნეს&limit=10: названия программ и университеты, в словах
+    которых есть все слова запроса (с учетом грузинских окончаний и частей сложных
+    слов), и число подходящих программ. Выбранную подсказку интерфейс передает
+    в /get_recommendations как 'query'.
+    """
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_SUGGESTIONS)
+    result = current_state().engine.autocomplete(query, limit)
+    return jsonify({
+        'success': True,
+        'query': query,
+        'suggestions': result['suggestions'],
+        'programs_found': result['programs_found']
+    })
+
+
+@app.route('/metrics')
+def metrics():
+    """
+    Метрики воркера в текстовом формате Prometheus
+    
+    Гистограммы длительности этапов (filter, search, score, select, build, serialize,
+    view_*, queue - ожидание в очереди), счетчики программ и попаданий в кэши,
+    состояние кэша ответов, загруженных каталогов и ограничения нагрузки
+    (очередь, отказы, объединенные запросы). Счетчики программ - каталога из
+    параметра catalog.
+    """
+    state = current_state()
+    cache_stats = recommendation_cache.stats()
+    catalog_stats = catalogs.stats()
+    admission_stats = admission.stats()
+    coalescer_stats = coalescer.stats()
+    scored_cache_stats = state.engine._scored_cache.stats()
+    counters = {
+        'result_cache_hits': cache_stats['hits'],
+        'result_cache_shared_hits': cache_stats['shared_hits'],
+        'result_cache_misses': cache_stats['misses'],
+        'result_cache_evictions': cache_stats['evictions'],
+        'scored_cache_evictions': scored_cache_stats['evictions'],
+        'data_reloads': catalog_stats['reloads'],
+        'catalog_loads': catalog_stats['loads'],
+        'catalog_evictions': catalog_stats['evictions'],
+        'requests_admitted': admission_stats['admitted'],
+        'requests_shed': admission_stats['shed'],
+        'requests_coalesced': coalescer_stats['coalesced'],
+        'requests_coalesce_timeouts': coalescer_stats['timeouts']
+    }
+    gauges = {
+        'result_cache_entries': cache_stats['entries'],
+        'result_cache_bytes': cache_stats['bytes'],
+        'scored_cache_entries': scored_cache_stats['entries'],
+        'scored_cache_bytes': scored_cache_stats['bytes'],
+        'programs': len(state.engine.programs),
+        'programs_quarantined': len(state.engine.ingestion_report['quarantined']),
+        'catalogs_loaded': catalog_stats['loaded'],
+        'catalogs_loading': catalog_stats['loading'],
+        'catalogs_memory_bytes': catalog_stats['memory_bytes'],
+        'requests_active': admission_stats['active'],
+        'requests_queued': admission_stats['queued'],
+        'requests_in_flight': coalescer_stats['in_flight']
+    }
+    return Response(REGISTRY.render(counters, gauges), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Принудительная проверка и перезагрузка базы (заголовок X-Admin-Token)
+    
+    Перезагружает каталог из параметра catalog (по умолчанию основной) в воркере,
+    получившем запрос; остальные воркеры подхватывают изменения файла сами в
+    течение RELOAD_INTERVAL.
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    
+    reloaded = catalogs.reload(requested_catalog(), force=request.args.get('force') == '1')
+    return jsonify({
+        'success': True,
+        'reloaded': reloaded,
+        'data_version': current_state().version
     })
 
 
@@ -0,0 +1,336 @@
+"""
+Микробенчмарки системы рекомендаций
+
+Строит синтетические каталоги из programs_database.csv (копии строк с
+возмущенными коэффициентами и порогами) и синтетических абитуриентов, замеряет
+задержку и пропускную способность фильтрации, расчета баллов, выбора top-N,
+полной рекомендации и сериализации JSON. Результаты пишутся в JSON, чтобы
+сравнивать коммиты между собой:
+
+    python benchmark.py --programs 638,10000,100000 --output bench_output.json
+    python benchmark.py --compare bench_old.json bench_output.json
+
+Отдельно замеряется распределение мест (allocation.py) на исходной базе в
+зависимости от числа абитуриентов (--applicants). Для исходной базы и каждого
+каталога записывается, сколько программ приходится на одну формулу балла
+(formulas.duplication_ratio): во столько раз меньше работы у score_matrix().
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from allocation import allocate, synthetic_preferences
+from metrics import REGISTRY
+from recommendation_system import UniversityRecommendationSystem
+from universities_info import EXAM_SUBJECTS
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'programs_database.csv')
+
+# Значения фильтров как в интерфейсе (None - "ყველა")
+FILTER_CHOICES = {
+    'city': [None, None, 'თბილისი', 'ბათუმი', 'ქუთაისი'],
+    'uni_type': [None, 'სახელმწიფო', 'კერძო'],
+    'category': [None, None, None, 'ბიზნესი და ეკონომიკა', 'მედიცინა და ფარმაცია', 'ინჟინერია'],
+    'teaching_language': [None, None, None, 'ინგლისური ენა']
+}
+
+# Запросы поиска, набираемые по буквам (каждый префикс - отдельный запрос автодополнения)
+SEARCH_QUERIES = ['ბიზნესის ადმინისტრირება', 'სამართალი', 'მცოდნეობა', 'tsu', 'თბილისის სახელმწიფო']
+
+
+def synthetic_catalog(database_path: str, n_programs: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Каталог из n_programs программ: строки исходного CSV по кругу с возмущением
+
+    Коэффициенты умножаются на случайный множитель 0.8-1.2, пороги сдвигаются на
+    ±10 п.п., коды программ делаются уникальными.
+    """
+    source = pd.read_csv(database_path)
+    rng = np.random.default_rng(seed)
+    df = source.iloc[np.arange(n_programs) % len(source)].reset_index(drop=True)
+    if n_programs <= len(source):
+        return df
+
+    df['program_code'] = np.arange(n_programs) + 10_000_000
+    for prefix, count in (('mandatory_exam', 4), ('elective_exam', 6)):
+        for i in range(1, count + 1):
+            coef_col = f'{prefix}_{i}_coef'
+            coef = pd.to_numeric(df[coef_col], errors='coerce')
+            perturbed = (coef * rng.uniform(0.8, 1.2, n_programs)).round(1)
+            df[coef_col] = df[coef_col].where(coef.isna(), perturbed)
+
+            min_col = f'{prefix}_{i}_min'
+            minimum = df[min_col].astype(str).str.extract(r'(\d+)%-ზე მეტი')[0].astype(float)
+            shifted = (minimum + rng.integers(-10, 11, n_programs)).clip(0, 90)
+            df[min_col] = df[min_col].where(minimum.isna(), shifted.map(lambda x: f'{x:.0f}%-ზე მეტი'))
+    return df
+
+
+def synthetic_students(n_students: int, seed: int = 0) -> List[Dict[str, float]]:
+    """Абитуриенты: грузинский, иностранный и 1-3 предмета по выбору, баллы ~ N(60, 20)"""
+    rng = np.random.default_rng(seed)
+    electives = [name for name in EXAM_SUBJECTS if name not in ('ქართული ენა და ლიტერატურა', 'უცხოური ენა')]
+    students = []
+    for _ in range(n_students):
+        scores = {
+            'ქართული ენა და ლიტერატურა': float(np.clip(rng.normal(60, 20), 0, 100).round(1)),
+            'უცხოური ენა': float(np.clip(rng.normal(60, 20), 0, 100).round(1))
+        }
+        for name in rng.choice(electives, size=rng.integers(1, 4), replace=False):
+            scores[str(name)] = float(np.clip(rng.normal(60, 20), 0, 100).round(1))
+        students.append(scores)
+    return students
+
+
+def random_filters(rng: np.random.Generator) -> Dict:
+    return {key: values[rng.integers(len(values))] for key, values in FILTER_CHOICES.items()}
+
+
+def measure(func: Callable[[int], object], min_calls: int = 20, min_seconds: float = 0.5,
+            max_calls: int = 100000) -> Dict[str, float]:
+    """
+    Вызывает func(i) пока не наберется min_calls вызовов и min_seconds времени
+
+    Returns:
+        Статистика задержки в микросекундах и число операций в секунду
+    """
+    durations = []
+    started = time.perf_counter()
+    i = 0
+    while i < max_calls and (i < min_calls or time.perf_counter() - started < min_seconds):
+        t0 = time.perf_counter_ns()
+        func(i)
+        durations.append(time.perf_counter_ns() - t0)
+        i += 1
+
+    us = np.array(durations, dtype=np.float64) / 1000.0
+    return {
+        'calls': len(us),
+        'mean_us': round(float(us.mean()), 2),
+        'p50_us': round(float(np.percentile(us, 50)), 2),
+        'p95_us': round(float(np.percentile(us, 95)), 2),
+        'p99_us': round(float(np.percentile(us, 99)), 2),
+        'ops_per_s': round(float(1e6 / us.mean()), 1)
+    }
+
+
+def load_engine(df: pd.DataFrame, workdir: str) -> Tuple[UniversityRecommendationSystem, float]:
+    """Пишет каталог в CSV и загружает движок без снимка, возвращает время загрузки"""
+    path = os.path.join(workdir, f'catalog_{len(df)}.csv')
+    df.to_csv(path, index=False)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = UniversityRecommendationSystem(path)
+    return engine, time.perf_counter() - started
+
+
+def formula_stats(engine: UniversityRecommendationSystem) -> Dict[str, float]:
+    """Число программ и различных формул балла в каталоге"""
+    n_programs, n_formulas = len(engine.programs), len(engine.formula_rows)
+    return {
+        'programs': n_programs,
+        'formulas': n_formulas,
+        'duplication_ratio': round(n_programs / n_formulas, 4) if n_formulas else 0.0
+    }
+
+
+def bench_catalog(engine: UniversityRecommendationSystem,
+                  students: List[Dict[str, float]],
+                  seconds: float) -> Dict[str, Dict[str, float]]:
+    """Набор замеров для одного каталога"""
+    rng = np.random.default_rng(1)
+    filters = [random_filters(rng) for _ in range(256)]
+    all_rows = engine.filter_rows()
+    vectors = [engine.subjects.score_vector(scores) for scores in students]
+    scored = [engine.score_programs(all_rows, scores) for scores in students[:16]]
+    recommendations = engine.recommend_programs(None, None, None, None, students[0])
+    results = {}
+
+    results['filter_rows'] = measure(
+        lambda i: engine.filter_rows(**filters[i % len(filters)]), min_seconds=seconds)
+    results['filter_programs'] = measure(
+        lambda i: engine.filter_programs(**filters[i % len(filters)]), min_seconds=seconds)
+    # Автодополнение и фильтр по запросу на каждую "нажатую клавишу"
+    queries = [prefix[:length] for prefix in SEARCH_QUERIES for length in range(1, len(prefix) + 1)]
+    results['autocomplete'] = measure(
+        lambda i: engine.autocomplete(queries[i % len(queries)]), min_seconds=seconds)
+    results['filter_rows_query'] = measure(
+        lambda i: engine.filter_rows(query=queries[i % len(queries)]), min_seconds=seconds)
+    results['score_all_programs'] = measure(
+        lambda i: engine.score_programs(all_rows, students[i % len(students)]), min_seconds=seconds)
+    results['select_top_20'] = measure(
+        lambda i: engine._select_top(all_rows, scored[i % len(scored)]['competitive_score'], 20),
+        min_seconds=seconds)
+    results['build_top_20_results'] = measure(
+        lambda i: engine._build_results(all_rows, scored[i % len(scored)], students[i % len(students)],
+                                        np.arange(min(20, len(all_rows)))),
+        min_seconds=seconds)
+    # Уникальные баллы на каждый вызов, чтобы не попадать в кэш страниц
+    results['recommend_programs'] = measure(
+        lambda i: engine.recommend_programs(
+            **filters[i % len(filters)],
+            exam_scores={**students[i % len(students)], 'ისტორია': 50 + (i % 1000) / 100}),
+        min_seconds=seconds)
+    results['serialize_top_20_json'] = measure(
+        lambda i: json.dumps({'success': True, 'recommendations': recommendations}, separators=(',', ':')),
+        min_seconds=seconds)
+    # Выдача JSON из готовых фрагментов программ (путь /get_recommendations)
+    results['render_top_20_json'] = measure(
+        lambda i: engine._render_results(all_rows, scored[i % len(scored)], students[i % len(students)],
+                                         np.arange(min(20, len(all_rows)))),
+        min_seconds=seconds)
+
+    # Накладные расходы метрик: та же полная рекомендация с выключенным сбором
+    REGISTRY.enabled = False
+    try:
+        disabled = measure(
+            lambda i: engine.recommend_programs(
+                **filters[i % len(filters)],
+                exam_scores={**students[i % len(students)], 'ისტორია': 60 + (i % 1000) / 100}),
+            min_seconds=seconds)
+    finally:
+        REGISTRY.enabled = True
+    results['recommend_programs_no_metrics'] = disabled
+    results['metrics_overhead'] = {
+        'p50_ratio': round(results['recommend_programs']['p50_us'] / disabled['p50_us'], 4),
+        'mean_delta_us': round(results['recommend_programs']['mean_us'] - disabled['mean_us'], 2)
+    }
+
+    def timed_noop(i):
+        with REGISTRY.stage('benchmark_noop'):
+            pass
+    results['stage_timer'] = measure(timed_noop, min_seconds=seconds)
+
+    batch = np.stack(vectors[:256])
+    batch_stats = measure(lambda i: engine.score_matrix(all_rows, batch), min_calls=3, min_seconds=seconds)
+    batch_stats['students_per_s'] = round(batch_stats['ops_per_s'] * len(batch), 1)
+    results['score_matrix_256_students'] = batch_stats
+    return results
+
+
+def bench_allocation(database_path: str, sizes: List[int], seconds: float) -> Dict[str, Dict[str, float]]:
+    """Время распределения мест на исходной базе в зависимости от числа абитуриентов"""
+    if not sizes:
+        return {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = UniversityRecommendationSystem(database_path)
+    scores, preferences = synthetic_preferences(engine, max(sizes))
+
+    results = {}
+    for size in sizes:
+        allocation = allocate(engine, scores[:size], preferences[:size])
+        stats = measure(lambda i: allocate(engine, scores[:size], preferences[:size]),
+                        min_calls=3, min_seconds=seconds)
+        stats['applicants_per_s'] = round(size * 1e6 / stats['mean_us'], 1)
+        stats['rounds'] = allocation.rounds
+        stats['assigned_share'] = round(float((allocation.program >= 0).mean()), 4)
+        results[str(size)] = stats
+        print(f"• Распределение {size} абитуриентов: p50 {stats['p50_us'] / 1e6:.3f} с, "
+              f"раундов {allocation.rounds}", file=sys.stderr)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+def run(database_path: str, sizes: List[int], n_students: int, seconds: float,
+        applicant_sizes: List[int] = ()) -> Dict:
+    students = synthetic_students(n_students)
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'catalogs': {}
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            engine, load_seconds = load_engine(synthetic_catalog(database_path, size), workdir)
+            print(f"• Каталог {size} программ: загрузка {load_seconds:.2f} с", file=sys.stderr)
+            results = bench_catalog(engine, students, seconds)
+            results['load'] = {'seconds': round(load_seconds, 4)}
+            results['formulas'] = formula_stats(engine)
+            report['catalogs'][str(size)] = results
+            print(f"  формул балла {results['formulas']['formulas']}, "
+                  f"программ на формулу {results['formulas']['duplication_ratio']:.2f}", file=sys.stderr)
+            for name, stats in results.items():
+                if 'p50_us' in stats:
+                    print(f"  {name:30s} p50 {stats['p50_us']:>11.1f} µs   p99 {stats['p99_us']:>11.1f} µs",
+                          file=sys.stderr)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        source = UniversityRecommendationSystem(database_path)
+    report['formulas'] = formula_stats(source)
+    print(f"• Исходная база: {report['formulas']['programs']} программ, {report['formulas']['formulas']} "
+          f"формул балла, программ на формулу {report['formulas']['duplication_ratio']:.2f}", file=sys.stderr)
+
+    report['allocation'] = bench_allocation(database_path, applicant_sizes, seconds)
+    return report
+
+
+def compare(old_path: str, new_path: str):
+    """Печатает отношение p50 нового прогона к старому (меньше 1 - быстрее)"""
+    old = json.load(open(old_path, encoding='utf-8'))
+    new = json.load(open(new_path, encoding='utf-8'))
+    print(f"{old.get('commit')} → {new.get('commit')}")
+    for size, results in new['catalogs'].items():
+        for name, stats in results.items():
+            before = old['catalogs'].get(size, {}).get(name, {})
+            if 'p50_us' in stats and before.get('p50_us'):
+                ratio = stats['p50_us'] / before['p50_us']
+                print(f"{size:>8s} {name:30s} {before['p50_us']:>11.1f} → {stats['p50_us']:>11.1f} µs  ×{ratio:.2f}")
+    for size, stats in new.get('allocation', {}).items():
+        before = old.get('allocation', {}).get(size, {})
+        if before.get('p50_us'):
+            ratio = stats['p50_us'] / before['p50_us']
+            print(f"{size:>8s} {'allocation':30s} {before['p50_us']:>11.1f} → {stats['p50_us']:>11.1f} µs  ×{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default=os.environ.get('DATABASE_PATH', DEFAULT_DB_PATH))
+    parser.add_argument('--programs', default='638,10000,100000',
+                        help='Размеры синтетических каталогов через запятую')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--applicants', default='10000,100000',
+                        help='Числа абитуриентов для замера распределения мест через запятую')
+    parser.add_argument('--seconds', type=float, default=0.5, help='Минимальное время на замер')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = [int(size) for size in args.programs.split(',') if size]
+    applicant_sizes = [int(size) for size in args.applicants.split(',') if size]
+    report = run(args.database, sizes, args.students, args.seconds, applicant_sizes)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✓ Результаты: {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
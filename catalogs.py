@@ -0,0 +1,255 @@
+"""
+Несколько каталогов программ в одном процессе (например, по годам приема)
+Основной каталог загружается при старте, остальные - при первом запросе в
+фоновом потоке; давно не использованные каталоги вытесняются, когда их
+суммарный объем превышает бюджет памяти
+"""
+
+import functools
+import os
+import threading
+import time
+from typing import Callable, Dict, Generic, List, Optional
+
+from hot_reload import DataReloader, State
+
+# Через сколько секунд повторять загрузку каталога после ошибки
+FAILED_RETRY_INTERVAL = 30
+
+
+def parse_catalogs(spec: str) -> Dict[str, str]:
+    """
+    Разбирает список каталогов вида "2025=/data/2025.csv,2024=/data/2024.csv"
+
+    Raises:
+        ValueError: если элемент списка не имеет вида имя=путь
+    """
+    catalogs = {}
+    for item in filter(None, (item.strip() for item in spec.split(','))):
+        name, separator, path = item.partition('=')
+        if not separator or not name.strip() or not path.strip():
+            raise ValueError(f"Каталог должен быть задан как имя=путь: {item!r}")
+        catalogs[name.strip()] = path.strip()
+    return catalogs
+
+
+class UnknownCatalog(KeyError):
+    """Каталог с таким именем не настроен"""
+
+
+class CatalogUnavailable(Exception):
+    """Каталог еще загружается (или загрузка не удалась): запрос стоит повторить позже"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(name)
+        self.name = name
+        self.retry_after = retry_after
+
+
+class _Catalog:
+    """Настроенный каталог и его загрузчик (None, пока каталог не загружен)"""
+
+    __slots__ = ('name', 'path', 'reloader', 'loading', 'failed_at', 'version', 'size', 'last_used')
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.reloader: Optional[DataReloader] = None
+        self.loading: Optional[threading.Event] = None
+        self.failed_at: Optional[float] = None
+        self.version: Optional[str] = None
+        self.size = 0
+        self.last_used = 0.0
+
+
+class CatalogRegistry(Generic[State]):
+    """
+    Именованные каталоги, у каждого свое неизменяемое состояние и DataReloader
+
+    Чтение состояния загруженного каталога не берет блокировок: запросы к
+    горячему каталогу не ждут, пока другой каталог загружается или
+    вытесняется. Холодный каталог строится в отдельном потоке; запрос к нему
+    ждет не дольше load_wait секунд и иначе получает CatalogUnavailable.
+
+    Бюджет памяти сравнивается с суммой оценок size_of по загруженным каталогам;
+    после каждой загрузки и перезагрузки вытесняются давно не использованные
+    каталоги, кроме основного и только что загруженного. Вытесненный каталог
+    загрузится заново при следующем запросе, а запросы в работе дорабатывают
+    на его состоянии.
+    """
+
+    def __init__(self,
+                 paths: Dict[str, str],
+                 default: str,
+                 loader: Callable[[str, str], State],
+                 interval: float = 0,
+                 memory_budget: int = 0,
+                 load_wait: float = 0,
+                 size_of: Callable[[State], int] = None,
+                 on_publish: Callable[[Optional[str], State], None] = None,
+                 on_evict: Callable[[State], None] = None):
+        """
+        Args:
+            paths: Имя каталога → путь к файлу данных (основной каталог тоже)
+            default: Имя основного каталога: загружается сразу и не вытесняется
+            loader: Строит состояние каталога из (имя, путь)
+            interval: Период проверки файлов на изменения (как в DataReloader)
+            memory_budget: Бюджет памяти каталогов в байтах (0 - без ограничения)
+            load_wait: Сколько секунд запрос ждет загрузки холодного каталога
+            size_of: Оценка объема состояния в байтах
+            on_publish: Вызывается с (прежняя версия или None, новое состояние) при загрузке и перезагрузке
+            on_evict: Вызывается с состоянием вытесненного каталога
+        """
+        if default not in paths:
+            raise ValueError(f"Основной каталог {default!r} не задан")
+        self.default = default
+        self._catalogs = {name: _Catalog(name, path) for name, path in paths.items()}
+        self._loader = loader
+        self._interval = interval
+        self.memory_budget = memory_budget
+        self.load_wait = load_wait
+        self._size_of = size_of or (lambda state: 0)
+        self._on_publish = on_publish
+        self._on_evict = on_evict
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.reloads = 0
+
+        default_catalog = self._catalogs[default]
+        reloader = self._create_reloader(default_catalog)
+        self._published(default_catalog, reloader.current, None)
+        default_catalog.reloader = reloader
+
+        # Потоки загрузки не переносятся в воркеры после fork
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        for catalog in self._catalogs.values():
+            catalog.loading = None
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._catalogs)
+
+    def get(self, name: Optional[str] = None) -> State:
+        """
+        Текущее состояние каталога name (None - основной)
+
+        Raises:
+            UnknownCatalog: каталог не настроен
+            CatalogUnavailable: каталог загружается дольше load_wait или не загрузился
+        """
+        catalog = self._catalogs.get(name or self.default)
+        if catalog is None:
+            raise UnknownCatalog(name)
+        reloader = catalog.reloader
+        if reloader is None:
+            reloader = self._wait_for_load(catalog)
+        catalog.last_used = time.monotonic()
+        return reloader.current
+
+    def reload(self, name: Optional[str] = None, force: bool = False) -> bool:
+        """Перезагружает каталог, если его файл изменился (или force); см. DataReloader.reload"""
+        self.get(name)
+        reloader = self._catalogs[name or self.default].reloader
+        return reloader.reload(force=force) if reloader is not None else False
+
+    def _wait_for_load(self, catalog: _Catalog) -> DataReloader:
+        """Запускает фоновую загрузку каталога (если она еще не идет) и ждет ее не дольше load_wait"""
+        with self._lock:
+            if catalog.reloader is None and catalog.loading is None:
+                if catalog.failed_at is not None and time.monotonic() - catalog.failed_at < FAILED_RETRY_INTERVAL:
+                    raise CatalogUnavailable(catalog.name, FAILED_RETRY_INTERVAL)
+                catalog.loading = threading.Event()
+                threading.Thread(target=self._load, args=(catalog, catalog.loading), daemon=True,
+                                 name=f'catalog-{catalog.name}').start()
+            loading = catalog.loading
+
+        if loading is not None and self.load_wait > 0:
+            loading.wait(self.load_wait)
+        reloader = catalog.reloader
+        if reloader is None:
+            raise CatalogUnavailable(catalog.name, max(1, round(self.load_wait)))
+        return reloader
+
+    def _create_reloader(self, catalog: _Catalog) -> DataReloader:
+        return DataReloader(
+            catalog.path, functools.partial(self._loader, catalog.name), interval=self._interval,
+            on_reload=lambda state: self._published(catalog, state, catalog.version)
+        )
+
+    def _load(self, catalog: _Catalog, loading: threading.Event):
+        """Загрузка холодного каталога (в отдельном потоке)"""
+        try:
+            reloader = self._create_reloader(catalog)
+        except Exception as e:
+            print(f"⚠ Не удалось загрузить каталог {catalog.name} ({catalog.path}): {e}")
+            with self._lock:
+                catalog.failed_at = time.monotonic()
+                catalog.loading = None
+            loading.set()
+            return
+
+        self._published(catalog, reloader.current, None)
+        with self._lock:
+            catalog.reloader = reloader
+            catalog.loading = None
+            catalog.failed_at = None
+            catalog.last_used = time.monotonic()
+            self.loads += 1
+        print(f"✓ Каталог {catalog.name} загружен: версия {reloader.current.version}, "
+              f"{catalog.size / 1024 / 1024:.1f} МБ")
+        self._enforce_budget(catalog)
+        loading.set()
+
+    def _published(self, catalog: _Catalog, state: State, previous_version: Optional[str]):
+        """Учет новой версии каталога: previous_version - версия, которую она заменила (None при загрузке)"""
+        if previous_version is not None and catalog.reloader is None:
+            # Перезагрузка успела завершиться после вытеснения каталога
+            return
+        catalog.version = state.version
+        catalog.size = self._size_of(state)
+        if self._on_publish is not None:
+            self._on_publish(previous_version, state)
+        if previous_version is not None:
+            self.reloads += 1
+            self._enforce_budget(catalog)
+
+    def _enforce_budget(self, keep: _Catalog):
+        """Вытесняет давно не использованные каталоги, пока их объем больше бюджета"""
+        if not self.memory_budget:
+            return
+        evicted = []
+        with self._lock:
+            loaded = [catalog for catalog in self._catalogs.values() if catalog.reloader is not None]
+            total = sum(catalog.size for catalog in loaded)
+            for catalog in sorted(loaded, key=lambda catalog: catalog.last_used):
+                if total <= self.memory_budget:
+                    break
+                if catalog.name == self.default or catalog is keep:
+                    continue
+                total -= catalog.size
+                reloader, catalog.reloader, catalog.size = catalog.reloader, None, 0
+                reloader.stop()
+                evicted.append((catalog.name, reloader.current))
+                self.evictions += 1
+
+        for name, state in evicted:
+            print(f"✓ Каталог {name} вытеснен из памяти")
+            if self._on_evict is not None:
+                self._on_evict(state)
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики каталогов"""
+        with self._lock:
+            loaded = [catalog for catalog in self._catalogs.values() if catalog.reloader is not None]
+            return {
+                'loaded': len(loaded),
+                'loading': sum(catalog.loading is not None for catalog in self._catalogs.values()),
+                'memory_bytes': sum(catalog.size for catalog in loaded),
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'reloads': self.reloads
+            }
@@ -0,0 +1,132 @@
+"""
+Категории программ по ключевым словам в названии
+Правила компилируются один раз в регулярные выражения и применяются ко всей колонке названий
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, List, Sequence
+
+# Категория, если ни одно ключевое слово не подошло
+DEFAULT_CATEGORY = 'სხვა'
+
+# Университеты, все программы которых относятся к одной категории
+UNIVERSITY_CATEGORIES = {
+    uni_code: 'საღვთისმეტყველო'
+    for uni_code in (4, 88, 173, 174, 175, 177, 184, 194)
+}
+
+# Ключевые слова категорий; порядок категорий - приоритет (побеждает первая подходящая)
+CATEGORY_KEYWORDS = {
+    'საღვთისმეტყველო': ['თეოლოგ', 'ღვთისმეტყველ', 'საღმრთო', 'საეკლესიო', 'სასულიერო', 'ქრისტიანული ხელოვნებ'],
+    'მედიცინა და ფარმაცია': ['მედიცინა', 'სტომატოლოგ', 'ფარმაცია', 'ექთანი', 'სამეანო', 'რეაბილიტაცი'],
+    'IT და კომპიუტერული მეცნიერებები': ['კომპიუტერ', 'ინფორმაცი'],
+    'ბიზნესი და ეკონომიკა': ['ბიზნეს', 'ეკონომიკ', 'მენეჯმენტ', 'ფინანს', 'ტურიზმ', 'მარკეტინგ'],
+    'სამართალი': ['სამართალ', 'იურისპრუდენცი'],
+    'ხელოვნება და დიზაინი': ['ხელოვნება', 'დიზაინ', 'არქიტექტურ', 'ხატვა', 'გრაფიკ', 'რესტავრაცი'],
+    'მუსიკა და თეატრი': ['მუსიკ', 'თეატრ', 'კინო', 'მსახიობ', 'ბალეტ', 'ქორეოგრაფი'],
+    'ინჟინერია': ['ინჟინერ', 'მშენებლობ', 'ენერგეტიკ', 'ტრანსპორტ'],
+    'ენები და ფილოლოგია': ['ფილოლოგ', 'ქართული ენა', 'ინგლისური', 'გერმანული'],
+    'საბუნებისმეტყველო მეცნიერებები': ['მათემატიკ', 'ფიზიკ', 'ქიმი', 'ბიოლოგ', 'გეოგრაფ', 'ეკოლოგ'],
+    'სოციალური მეცნიერებები': ['ფსიქოლოგ', 'პოლიტიკ', 'სოციოლოგ', 'ისტორი', 'ფილოსოფი', 'ანთროპოლოგ'],
+    'სასოფლო-სამეურნეო': ['აგრონომ', 'ვეტერინარ', 'სატყეო', 'ლანდშაფტ'],
+    'განათლება': ['მასწავლებელ', 'განათლება', 'პედაგოგ']
+}
+
+
+class CategoryMatcher:
+    """
+    Скомпилированные правила категоризации
+
+    Ключевые слова собираются в регулярные выражения-альтернативы: для каждого
+    приоритета p - выражение из слов всех категорий с приоритетом выше p.
+    Поиск по всем словам дает какую-то подходящую категорию; дальше ищутся только
+    слова более приоритетных категорий, пока они находятся. Обычно хватает
+    одного-двух проходов по названию, а результат тот же, что у прежнего перебора
+    "побеждает первая подходящая категория". Каждое уникальное название
+    проверяется один раз.
+    """
+
+    def __init__(self,
+                 keywords: Dict[str, List[str]] = None,
+                 university_categories: Dict[int, str] = None):
+        """
+        Args:
+            keywords: {категория: [ключевые слова]} в порядке приоритета
+            university_categories: {код университета: категория} - важнее ключевых слов
+        """
+        keywords = CATEGORY_KEYWORDS if keywords is None else keywords
+        self.keywords: Dict[str, List[str]] = {category: list(words) for category, words in keywords.items()}
+        self.university_categories: Dict[int, str] = dict(
+            UNIVERSITY_CATEGORIES if university_categories is None else university_categories
+        )
+        self._compile()
+
+    def _compile(self):
+        self.categories: List[str] = list(self.keywords) + [DEFAULT_CATEGORY]
+        self._priority: Dict[str, int] = {}
+        for priority, words in enumerate(self.keywords.values()):
+            for word in words:
+                self._priority.setdefault(word.lower(), priority)
+
+        # _patterns[p] - слова категорий с приоритетом меньше p (None, если таких нет)
+        self._patterns = []
+        for priority in range(len(self.keywords) + 1):
+            words = [word for word, word_priority in self._priority.items() if word_priority < priority]
+            self._patterns.append(re.compile('|'.join(map(re.escape, words))) if words else None)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'CategoryMatcher':
+        """
+        Правила по умолчанию, дополненные из JSON-файла
+
+        Формат: {"keywords": {"категория": ["слово", ...]},
+                 "universities": {"код": "категория"}}
+        Слова известных категорий добавляются в конец их списка, новые
+        категории - после существующих (с меньшим приоритетом).
+        """
+        with open(path, encoding='utf-8') as f:
+            rules = json.load(f)
+
+        matcher = cls()
+        for category, words in rules.get('keywords', {}).items():
+            matcher.add_keywords(category, words)
+        for uni_code, category in rules.get('universities', {}).items():
+            matcher.university_categories[int(uni_code)] = category
+        return matcher
+
+    def add_keywords(self, category: str, words: List[str]):
+        """Добавляет ключевые слова категории и перекомпилирует выражение"""
+        existing = self.keywords.setdefault(category, [])
+        existing.extend(word for word in words if word not in existing)
+        self._compile()
+
+    def fingerprint(self) -> str:
+        """Хэш правил: меняется при любом изменении ключевых слов или университетов"""
+        rules = json.dumps([self.keywords, sorted(self.university_categories.items())], ensure_ascii=False)
+        return hashlib.sha256(rules.encode()).hexdigest()
+
+    def match(self, name: str) -> str:
+        """Категория одного названия по ключевым словам"""
+        name = str(name).lower()
+        priority = len(self.keywords)
+        while self._patterns[priority] is not None:
+            found = self._patterns[priority].search(name)
+            if found is None:
+                break
+            priority = self._priority[found.group()]
+        return self.categories[priority]
+
+    def categorize(self, names: Sequence[str], university_codes: Sequence[int]) -> List[str]:
+        """Категории для колонок названий программ и кодов университетов"""
+        by_name: Dict[str, str] = {}
+        categories = []
+        for name, uni_code in zip(names, university_codes):
+            category = self.university_categories.get(uni_code)
+            if category is None:
+                category = by_name.get(name)
+                if category is None:
+                    category = by_name[name] = self.match(name)
+            categories.append(category)
+        return categories
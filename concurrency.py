@@ -0,0 +1,170 @@
+"""
+Защита воркера от всплесков одинаковых запросов
+Одновременные одинаковые запросы делят одно вычисление (single-flight), а число
+одновременных вычислений и очередь к ним ограничены: лишние запросы сразу
+получают отказ, а не ждут, пока задержка вырастет для всех
+"""
+
+import contextlib
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+from metrics import REGISTRY
+
+
+class Overloaded(Exception):
+    """Очередь вычислений заполнена или ожидание в ней истекло"""
+
+
+class _Call:
+    """Вычисление в работе: результат или исключение для всех ожидающих"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Объединение одновременных вычислений с одинаковым ключом
+
+    Первый запрос с ключом (ведущий) считает, остальные, пришедшие до конца
+    его вычисления, ждут и получают тот же результат или то же исключение.
+    Ключ должен включать версию данных. Результат не хранится: повторные
+    запросы после завершения обслуживает кэш ответов.
+
+    Ожидающие ждут не дольше timeout секунд: зависшее вычисление не занимает
+    потоки воркера всех, кто пришел за тем же ответом.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Args:
+            timeout: Сколько секунд ожидающий ждет ведущего (None - без ограничения)
+        """
+        self.timeout = timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, compute: Callable[[], object]) -> Tuple[object, bool]:
+        """
+        Returns:
+            (результат, True - если он получен из вычисления другого запроса)
+
+        Raises:
+            Overloaded: ведущий не закончил вычисление за timeout секунд
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise Overloaded()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = compute()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'in_flight': len(self._calls), 'leaders': self.leaders, 'coalesced': self.coalesced,
+                    'timeouts': self.timeouts}
+
+
+class AdmissionControl:
+    """
+    Ограничение одновременных вычислений с ограниченной очередью
+
+    Не больше max_active вычислений идут одновременно, не больше max_queued
+    запросов ждут своей очереди, и ждут не дольше queue_timeout секунд.
+    Запрос сверх этого получает Overloaded сразу. Время ожидания в очереди
+    пишется в гистограмму этапа 'queue'.
+    """
+
+    def __init__(self, max_active: int, max_queued: int = 0, queue_timeout: float = 1.0):
+        """
+        Args:
+            max_active: Число одновременных вычислений (0 - без ограничения)
+            max_queued: Наибольшая длина очереди
+            queue_timeout: Наибольшее время ожидания в очереди в секундах
+        """
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def acquire(self):
+        """
+        Занимает место для вычисления
+
+        Raises:
+            Overloaded: очередь заполнена или место не освободилось за queue_timeout
+        """
+        with self._condition:
+            if not self.max_active or self.active < self.max_active:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.queued >= self.max_queued:
+                self.shed += 1
+                raise Overloaded()
+
+            started = time.perf_counter()
+            self.queued += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.max_active, self.queue_timeout)
+            finally:
+                self.queued -= 1
+            if not admitted:
+                self.shed += 1
+                raise Overloaded()
+            self.active += 1
+            self.admitted += 1
+        REGISTRY.observe('queue', time.perf_counter() - started)
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        """Контекстный менеджер: acquire() на входе, release() на выходе"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {'active': self.active, 'queued': self.queued, 'admitted': self.admitted, 'shed': self.shed}
@@ -0,0 +1,81 @@
+"""
+Реестр предметов экзаменов
+Канонические предметы с целочисленными id и все варианты их написания
+"""
+
+import numpy as np
+from typing import Dict, List, Optional
+
+from universities_info import EXAM_SUBJECTS
+
+# Канонический предмет для всех вариантов "უცხოური ენა (გერ.; ინგ.; ...)"
+FOREIGN_LANGUAGE = 'უცხოური ენა'
+
+
+class ExamSubjectRegistry:
+    """
+    Реестр предметов: название или его вариант → целочисленный subject id
+
+    Базовые предметы берутся из EXAM_SUBJECTS, остальные регистрируются при
+    загрузке базы. Все варианты иностранного языка (с перечнем языков в скобках
+    и отдельные языки из EXAM_SUBJECTS) сводятся к одному id FOREIGN_LANGUAGE.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.aliases: Dict[str, int] = {}
+        self.foreign_language_id: Optional[int] = None
+
+        for subject, translation in EXAM_SUBJECTS.items():
+            subject_id = self.register(subject)
+            if isinstance(translation, dict):
+                for language in translation:
+                    self.aliases[language] = subject_id
+
+        self.foreign_language_id = self.aliases[FOREIGN_LANGUAGE]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def normalize(name) -> str:
+        """Убирает лишние пробелы в названии"""
+        return ' '.join(str(name).split())
+
+    def resolve(self, name) -> Optional[int]:
+        """Возвращает subject id для названия или его варианта (None, если неизвестно)"""
+        key = self.normalize(name)
+        subject_id = self.aliases.get(key)
+        if subject_id is None and self.foreign_language_id is not None and key.startswith(FOREIGN_LANGUAGE):
+            subject_id = self.foreign_language_id
+        return subject_id
+
+    def register(self, name) -> int:
+        """Возвращает subject id, при необходимости добавляя новый предмет"""
+        subject_id = self.resolve(name)
+        if subject_id is None:
+            key = self.normalize(name)
+            subject_id = len(self.names)
+            self.names.append(key)
+            self.aliases[key] = subject_id
+        return subject_id
+
+    def resolve_scores(self, exam_scores: Dict[str, float]) -> Dict[int, float]:
+        """Переводит баллы {название: балл} в {subject id: балл}, неизвестные предметы пропускаются"""
+        resolved = {}
+        for exam_name, raw_score in exam_scores.items():
+            subject_id = self.resolve(exam_name)
+            if subject_id is not None:
+                resolved[subject_id] = raw_score
+        return resolved
+
+    def score_vector(self, exam_scores: Dict[str, float]) -> np.ndarray:
+        """
+        Вектор баллов по subject id
+
+        Последний элемент - заглушка (0.0) для пустых слотов с id = -1.
+        """
+        scores = np.zeros(len(self.names) + 1, dtype=np.float64)
+        for subject_id, raw_score in self.resolve_scores(exam_scores).items():
+            scores[subject_id] = raw_score
+        return scores
@@ -0,0 +1,118 @@
+"""
+Горячая перезагрузка базы программ без перезапуска воркеров
+"""
+
+import os
+import threading
+import weakref
+from typing import Callable, Generic, TypeVar
+
+State = TypeVar('State')
+
+
+class DataReloader(Generic[State]):
+    """
+    Держит текущее неизменяемое состояние, построенное из файла, и подменяет его при изменении файла
+
+    Новое состояние строится в фоновом потоке (или по вызову reload()) и
+    публикуется одним присваиванием ссылки current. Запросы читают current
+    один раз в начале и до конца работают со своей версией, поэтому на горячем
+    пути нет блокировок, а запросы в работе спокойно дорабатывают на старой.
+    """
+
+    def __init__(self,
+                 path: str,
+                 loader: Callable[[str], State],
+                 interval: float = 0,
+                 on_reload: Callable[[State], None] = None):
+        """
+        Args:
+            path: Путь к файлу данных
+            loader: Строит состояние из файла; у состояния должен быть атрибут version
+            interval: Период проверки файла в секундах (0 - без фоновой проверки)
+            on_reload: Вызывается с новым состоянием сразу после публикации
+        """
+        self.path = path
+        self._loader = loader
+        self._on_reload = on_reload
+        self._reload_lock = threading.Lock()
+        self._file_stat = self._stat()
+        self.current: State = loader(path)
+        self.reloads = 0
+        self._interval = interval
+        self._stopped = threading.Event()
+
+        if interval > 0:
+            self._start_watcher()
+            # При gunicorn --preload воркеры - копии мастера после fork, потоки
+            # в них не переносятся: запускаем проверку файла в каждом заново.
+            # Обработчик держит слабую ссылку, чтобы остановленный загрузчик
+            # (вытесненный каталог) освобождал свое состояние
+            reference = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: DataReloader._after_fork_of(reference))
+
+    def _start_watcher(self):
+        watcher = threading.Thread(target=self._watch, args=(self._interval,), daemon=True,
+                                   name='data-reloader')
+        watcher.start()
+
+    @staticmethod
+    def _after_fork_of(reference: 'weakref.ref'):
+        reloader = reference()
+        if reloader is not None and not reloader._stopped.is_set():
+            reloader._after_fork()
+
+    def _after_fork(self):
+        self._reload_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._start_watcher()
+
+    def stop(self):
+        """Останавливает фоновую проверку файла (текущее состояние остается доступным)"""
+        self._stopped.set()
+
+    def _stat(self):
+        """Дешевый признак изменения файла: время изменения и размер"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _watch(self, interval: float):
+        """Фоновая проверка файла"""
+        while not self._stopped.wait(interval):
+            if self._stat() != self._file_stat:
+                self.reload()
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Перестраивает состояние, если файл изменился (или force), и атомарно публикует его
+
+        Ошибка загрузки не трогает текущее состояние.
+
+        Returns:
+            True, если опубликована новая версия
+        """
+        with self._reload_lock:
+            file_stat = self._stat()
+            if not force and file_stat == self._file_stat:
+                return False
+
+            try:
+                state = self._loader(self.path)
+            except Exception as e:
+                print(f"⚠ Не удалось перезагрузить {self.path}, остается версия "
+                      f"{self.current.version}: {e}")
+                return False
+
+            self._file_stat = file_stat
+            if state.version == self.current.version:
+                return False
+
+            self.current = state
+            self.reloads += 1
+            print(f"✓ Данные перезагружены: версия {state.version}")
+            if self._on_reload is not None:
+                self._on_reload(state)
+            return True
@@ -0,0 +1,114 @@
+"""
+HTTP-кэширование неизменных в пределах версии данных ответов
+Тело сжимается один раз (br и gzip), ответ отдается со строгим ETag,
+и повторный запрос с If-None-Match получает 304
+"""
+
+import gzip
+import hashlib
+from typing import Dict, Optional
+
+import brotli
+from flask import Request, Response
+
+# Меньшие тела не сжимаем: заголовки и кадр gzip съедают выигрыш
+MIN_COMPRESS_SIZE = 512
+
+# Кодировки в порядке предпочтения сервера
+ENCODINGS = ('br', 'gzip')
+
+# Качество brotli: наилучшее при сжатии заранее, быстрое при сжатии во время запроса
+# (11 на теле в несколько КБ - миллисекунды, 5 - десятые доли)
+BROTLI_QUALITY = 11
+BROTLI_QUALITY_ON_REQUEST = 5
+
+
+def _compress(body: bytes, encoding: str, quality: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=quality)
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+class CachedBody:
+    """
+    Готовое тело ответа со строгим ETag и сжатыми вариантами
+
+    ETag - версия данных и хэш тела: меняется с каждой версией данных и не
+    совпадает у разных тел. Сжатые варианты считаются при первом запросе с
+    подходящим Accept-Encoding (или сразу, precompress=True) и дальше отдаются
+    готовыми. У каждого варианта свой ETag: базовый с суффиксом кодировки, как у
+    разных представлений ресурса.
+    """
+
+    __slots__ = ('body', 'mimetype', 'etag', '_encoded')
+
+    def __init__(self, body: bytes, mimetype: str, version: str = '', precompress: bool = False):
+        """
+        Args:
+            body: Тело ответа
+            mimetype: Тип содержимого без charset (Response добавляет его сам для text/* и JSON)
+            version: Версия данных, из которой получено тело
+            precompress: Сжать все варианты сразу
+        """
+        self.body = body
+        self.mimetype = mimetype
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        self.etag = f"{version}-{digest}" if version else digest
+        self._encoded: Dict[str, bytes] = {}
+        if precompress:
+            for encoding in ENCODINGS:
+                self._encoded[encoding] = _compress(body, encoding, BROTLI_QUALITY)
+
+    def encoded(self, encoding: str) -> bytes:
+        """Тело в кодировке encoding (сжимается один раз)"""
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = _compress(self.body, encoding, BROTLI_QUALITY_ON_REQUEST)
+        return data
+
+
+def choose_encoding(request: Request, size: int) -> Optional[str]:
+    """Лучшая кодировка из Accept-Encoding запроса (None - без сжатия)"""
+    if size < MIN_COMPRESS_SIZE:
+        return None
+    for encoding in ENCODINGS:
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Совпадает ли If-None-Match с каким-либо вариантом ресурса"""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    return if_none_match.star_tag or any(
+        if_none_match.contains_weak(variant_etag(etag, encoding)) for encoding in (None,) + ENCODINGS
+    )
+
+
+def cached_response(request: Request, body: CachedBody, cache_control: str) -> Response:
+    """
+    Ответ на GET/HEAD: 304 при совпадении If-None-Match, иначе тело в лучшей
+    кодировке из Accept-Encoding
+
+    Args:
+        body: Готовое тело
+        cache_control: Значение Cache-Control
+    """
+    encoding = choose_encoding(request, len(body.body))
+    if not_modified(request, body.etag):
+        response = Response(status=304, mimetype=body.mimetype)
+    else:
+        response = Response(body.encoded(encoding) if encoding else body.body, mimetype=body.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(variant_etag(body.etag, encoding))
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
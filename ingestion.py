@@ -0,0 +1,580 @@
+"""
+Разбор CSV базы программ в подготовленные данные движка
+Единственное место, где нужен pandas: воркер, стартующий со снимка, его не импортирует
+
+CSV проходит этапы: чтение в коды общего словаря строк (Vocabulary) →
+выравнивание сдвинутых строк → приведение к типам схемы с отбрасыванием
+мусорных значений → перенос устаревших колонок в основную схему → отбраковка
+строк без обязательных полей. Все исправления и отложенные строки попадают в
+отчет (IngestionReport).
+"""
+
+import io
+import re
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from categories import CategoryMatcher
+from exam_subjects import ExamSubjectRegistry
+from program_table import MAX_PRIORITY, TEXT_COLUMNS, ProgramTable, SlotNames
+from search_index import SearchIndex
+from universities_info import UNIVERSITIES
+
+# Стоимость обучения государственных программ (в 2026 бесплатно)
+STATE_TUITION = 2250.0
+
+# Город университета по коду (по умолчанию - Тбилиси)
+CITY_BY_UNIVERSITY = {
+    # Тбилиси
+    1: 'თბილისი', 2: 'თბილისი', 3: 'თბილისი', 4: 'თბილისი',
+    5: 'თბილისი', 6: 'თბილისი', 10: 'თბილისი', 12: 'თბილისი',
+    33: 'თბილისი', 36: 'თბილისი', 40: 'თბილისი', 52: 'თბილისი',
+    64: 'თბილისი', 85: 'თბილისი', 88: 'თბილისი', 98: 'თბილისი',
+    115: 'თბილისი', 120: 'თბილისი', 121: 'თბილისი', 122: 'თბილისი',
+    129: 'თბილისი', 131: 'თბილისი', 143: 'თბილისი', 145: 'თბილისი',
+    152: 'თბილისი', 153: 'თბილისი', 154: 'თბილისი', 171: 'თბილისი',
+    172: 'თბილისი', 175: 'თბილისი', 177: 'თბილისი',
+    181: 'თბილისი', 183: 'თბილისი', 186: 'თბილისი', 195: 'თბილისი',
+    198: 'თბილისი', 199: 'თბილისი', 201: 'თბილისი', 202: 'თბილისი',
+    203: 'თბილისი', 204: 'თბილისი', 206: 'თბილისი',
+    # Кутаиси
+    9: 'ქუთაისი', 19: 'ქუთაისი', 174: 'ქუთაისი', 197: 'ქუთაისი',
+    # Телави
+    71: 'თელავი',
+    # Зугдиди
+    97: 'ზუგდიდი',
+    # Батуми
+    53: 'ბათუმი', 114: 'ბათუმი', 130: 'ბათუმი', 140: 'ბათუმი',
+    184: 'ბათუმი', 192: 'ბათუმი', 205: 'ბათუმი',
+    # Гори
+    133: 'გორი', 155: 'გორი',
+    # Ахалцихе
+    14: 'ახალციხე', 194: 'ახალციხე',
+    # სოფ. ხიჭაური
+    142: 'სოფ. ხიჭაური',
+    # სოფ. გრემი (Греми)
+    173: 'სოფ. გრემი'
+}
+
+# Слоты экзаменов: (колонки названий, коэффициентов, порогов)
+MANDATORY_SLOTS = (
+    [f'mandatory_exam_{i}' for i in range(1, 5)],
+    [f'mandatory_exam_{i}_coef' for i in range(1, 5)],
+    [f'mandatory_exam_{i}_min' for i in range(1, 5)]
+)
+ELECTIVE_SLOTS = (
+    [f'elective_exam_{i}_name' for i in range(1, 7)],
+    [f'elective_exam_{i}_coef' for i in range(1, 7)],
+    [f'elective_exam_{i}_min' for i in range(1, 7)]
+)
+ELECTIVE_PLACES = [f'elective_exam_{i}_places' for i in range(1, 7)]
+
+# Приоритеты экзаменов (1-4) - порядок сравнения баллов при равном конкурсном балле
+MANDATORY_PRIORITIES = [f'mandatory_exam_{i}_priority' for i in range(1, 5)]
+ELECTIVE_PRIORITIES = [f'elective_exam_{i}_priority' for i in range(1, 7)]
+
+# Колонки каждого слота: название, коэффициент, порог, приоритет (и места у выборочных)
+MANDATORY_COLUMNS = [list(columns) for columns in zip(*MANDATORY_SLOTS, MANDATORY_PRIORITIES)]
+ELECTIVE_COLUMNS = [list(columns) for columns in zip(*ELECTIVE_SLOTS, ELECTIVE_PRIORITIES, ELECTIVE_PLACES)]
+SLOT_TYPES = ('text', 'number', 'percent', 'number', 'number')
+
+# Схема CSV: колонка → тип ('text', 'number', 'percent' - порог вида "40%-ზე მეტი").
+# Остальные колонки при разборе отбрасываются
+SCHEMA = {
+    'program_code': 'number', 'university_code': 'number', 'program_name': 'text',
+    'qualification': 'text', 'accreditation_status': 'text', 'teaching_language': 'text',
+    'credits': 'number', 'annual_tuition': 'number', 'total_places': 'number', 'special_note': 'text',
+    **{column: kind
+       for columns in MANDATORY_COLUMNS + ELECTIVE_COLUMNS
+       for column, kind in zip(columns, SLOT_TYPES)}
+}
+
+# Строка без этих полей в выдачу не попадает
+REQUIRED_COLUMNS = ('program_code', 'university_code', 'program_name')
+
+# Устаревшая схема: часть программ описана только в колонках accreditation,
+# language, tuition, places, notes и exam1..exam5 (без деления на обязательные и
+# выборочные: выборочные - экзамены с местами)
+LEGACY_FIELDS = {
+    'accreditation_status': 'accreditation', 'teaching_language': 'language',
+    'annual_tuition': 'tuition', 'total_places': 'places', 'special_note': 'notes'
+}
+LEGACY_EXAMS = [[f'exam{i}_{field}' for field in ('name', 'coef', 'min', 'priority', 'places')]
+                for i in range(1, 6)]
+LEGACY_SCHEMA = {
+    'accreditation': 'text', 'language': 'text', 'tuition': 'number', 'places': 'number',
+    **{column: kind for columns in LEGACY_EXAMS for column, kind in zip(columns, SLOT_TYPES)},
+    'notes': 'text'
+}
+
+# Сдвиги колонок в экспорте CSV: (первая и последняя колонки блока, сдвиг). Строка
+# сдвинута, если в числовой колонке, куда попало начало блока, - текст
+SHIFTED_BLOCKS = (
+    # Блок устаревших колонок на 12 колонок левее - с elective_exam_4_places
+    ('accreditation', 'notes', -12),
+    # Выборочные экзамены на колонку правее: название в колонке коэффициента,
+    # а в колонке названия - число мест без экзамена (отбрасывается)
+    ('elective_exam_1_name', 'elective_exam_6_priority', 1),
+    # Примечание на колонку левее - в elective_exam_6_places
+    ('special_note', 'special_note', -1)
+)
+
+# Язык обучения в каталоге - "<язык> ენა"; сокращенное "ქართული" приводится к "ქართული ენა"
+LANGUAGE = re.compile(r'\w+ ენა')
+
+# Пороги и числа, попавшие в текстовые колонки: "25%", "160", "40%-ზე მეტი"
+JUNK_TEXT = re.compile(r'[\d.,%\s-]*(?:ზე\s*მეტი)?')
+PERCENT = re.compile(r'(\d+(?:\.\d+)?)')
+
+# Строк CSV в одной части чтения (read_catalog)
+READ_CHUNK_ROWS = 5000
+
+
+def get_city(uni_code: int) -> str:
+    """Определяет город университета по коду"""
+    return CITY_BY_UNIVERSITY.get(uni_code, 'თბილისი')
+
+
+class IngestionReport:
+    """
+    Отчет о разборе CSV: сколько значений исправлено или отброшено и какие строки
+    отложены (в выдачу не попали)
+    """
+
+    def __init__(self):
+        self.rows_read = 0
+        self.fixes: Dict[str, int] = {}
+        self.quarantined: List[Dict] = []
+
+    def fix(self, kind: str, count) -> None:
+        """Учитывает count исправлений вида kind"""
+        count = int(count)
+        if count:
+            self.fixes[kind] = self.fixes.get(kind, 0) + count
+
+    def quarantine(self, rows: np.ndarray, program_codes: np.ndarray, reason: str) -> None:
+        """Откладывает строки rows (line - номер строки в CSV с учетом заголовка)"""
+        for row, code in zip(rows.tolist(), program_codes.tolist()):
+            self.quarantined.append({
+                'line': row + 2,
+                'program_code': int(code) if code == code else None,
+                'reason': reason
+            })
+
+    def as_dict(self) -> Dict:
+        """Отчет простыми типами: хранится в снимке, которому не нужен этот модуль"""
+        return {'rows_read': self.rows_read, 'fixes': dict(self.fixes), 'quarantined': list(self.quarantined)}
+
+
+class Vocabulary:
+    """
+    Общий словарь строк CSV: матрица каталога и текстовые колонки хранят коды
+    слов (int32, -1 - пустое значение), а не объекты str
+
+    Один словарь на все колонки: перенос значения между колонками (сдвинутые
+    строки, устаревшая схема, язык → примечание) - копирование кодов.
+    """
+
+    def __init__(self):
+        self.words: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def add(self, word: Optional[str]) -> int:
+        """Код слова (новое слово добавляется в конец словаря; None - пустое значение, -1)"""
+        if word is None:
+            return -1
+        code = self.index.get(word)
+        if code is None:
+            code = self.index[word] = len(self.words)
+            self.words.append(word)
+        return code
+
+    def table(self, columns: List[np.ndarray], convert: Callable[[str], object], dtype, empty) -> np.ndarray:
+        """
+        Таблица convert(слово) по кодам: table[codes] - преобразованная колонка
+
+        Преобразуются только слова, встречающиеся в columns: значения каталога
+        сильно повторяются, и даже в большом файле это сотни строк, а не сотни
+        тысяч. Последний элемент (код -1) - empty.
+        """
+        used = np.zeros(len(self.words) + 1, dtype=bool)
+        for codes in columns:
+            used[codes] = True
+        codes = np.flatnonzero(used[:-1])
+        table = np.full(len(self.words) + 1, empty, dtype=dtype)
+        table[codes] = [convert(self.words[code]) for code in codes.tolist()]
+        return table
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Колонка строк (object, пустые - NaN)"""
+        return np.array(self.words + [np.nan], dtype=object)[codes]
+
+
+def isna(values: np.ndarray) -> np.ndarray:
+    """Пустые значения колонки: код -1 у текста, NaN у чисел"""
+    return values < 0 if values.dtype.kind == 'i' else np.isnan(values)
+
+
+def clear(values: np.ndarray, mask: np.ndarray) -> None:
+    """Очищает значения колонки по маске"""
+    values[mask] = -1 if values.dtype.kind == 'i' else np.nan
+
+
+def read_catalog(raw: bytes) -> Tuple[List[str], np.ndarray, Vocabulary]:
+    """
+    Читает CSV без угадывания типов (все значения - строки) и проверяет, что
+    все колонки схемы есть
+
+    CSV читается частями по READ_CHUNK_ROWS строк, и каждая часть сразу
+    сводится к кодам словаря: строки pandas живут только в пределах части.
+
+    Returns:
+        (заголовок, матрица кодов строки × колонки (int32, -1 - пусто), словарь)
+
+    Raises:
+        ValueError: если в CSV нет колонок схемы
+    """
+    vocabulary = Vocabulary()
+    header: List[str] = []
+    parts = []
+    for chunk in pd.read_csv(io.BytesIO(raw), dtype=object, chunksize=READ_CHUNK_ROWS):
+        if not parts:
+            header = list(chunk.columns)
+            missing = [column for column in SCHEMA if column not in header]
+            if missing:
+                raise ValueError(f"В CSV нет колонок: {', '.join(missing)}")
+        values = chunk.to_numpy(dtype=object)
+        codes, words = pd.factorize(values.ravel())
+        table = np.array([vocabulary.add(word) for word in words] + [-1], dtype=np.int32)
+        parts.append(table[codes].reshape(values.shape))
+    return header, np.concatenate(parts), vocabulary
+
+
+def matches(values: np.ndarray, vocabulary: Vocabulary, pattern: re.Pattern) -> np.ndarray:
+    """Маска значений, целиком совпадающих с pattern (пустые не совпадают)"""
+    return vocabulary.table([values], lambda word: bool(pattern.fullmatch(word)), bool, False)[values]
+
+
+def to_number(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def to_percent(text: str) -> float:
+    """Порог из строки ("40%-ზე მეტი" → 40.0); NaN, если числа нет или оно больше 100"""
+    match = PERCENT.search(text)
+    value = float(match.group(1)) if match else np.nan
+    return value if value <= 100 else np.nan
+
+
+def to_text(text: str):
+    return text.strip() or None
+
+
+def realign_shifted_rows(header: List[str], grid: np.ndarray, vocabulary: Vocabulary, report: IngestionReport) -> None:
+    """Возвращает на место блоки SHIFTED_BLOCKS в строках, где они сдвинуты"""
+    for first, last, shift in SHIFTED_BLOCKS:
+        if first not in header or last not in header:
+            continue
+        start, end = header.index(first), header.index(last) + 1
+        if start + shift < 0 or end + shift > len(header):
+            continue
+
+        marker = grid[:, start + shift]
+        shifted = np.isnan(vocabulary.table([marker], to_number, np.float64, np.nan)[marker]) & (marker >= 0)
+        if not shifted.any():
+            continue
+
+        rows = np.flatnonzero(shifted)[:, None]
+        values = grid[rows, np.arange(start + shift, end + shift)]
+        vacated = [i for i in range(start + shift, end + shift) if not start <= i < end]
+        grid[rows, vacated] = -1
+        grid[rows, np.arange(start, end)] = values
+        report.fix(f'сдвинутые колонки {first}' + (f'..{last}' if last != first else ''), shifted.sum())
+
+
+def apply_schema(header: List[str], grid: np.ndarray, vocabulary: Vocabulary,
+                 report: IngestionReport) -> Dict[str, np.ndarray]:
+    """
+    Оставляет колонки схемы (и устаревшей схемы) и приводит их к типам
+
+    Значения, не приводимые к типу, и пороги вне 0-100 становятся пустыми.
+    Мусор вместо названий экзаменов и примечаний отбрасывается; у экзамена с
+    таким названием очищается весь слот. Язык обучения приводится к виду
+    "<язык> ენა", другой текст в колонке языка переносится в пустое примечание.
+    Язык таких строк берется из устаревшей колонки language; строки, где его
+    нет, отмечаются в колонке language_unresolved и откладываются
+    (reject_invalid_rows), а не попадают в выдачу без языка.
+
+    Returns:
+        Колонки: текст - коды словаря (int32, -1 - пусто), числа и пороги -
+        float64, language_unresolved - bool
+    """
+    legacy = all(column in header for column in LEGACY_SCHEMA)
+    schema = {**SCHEMA, **LEGACY_SCHEMA} if legacy else SCHEMA
+
+    # Каждое слово преобразуется один раз на тип, сколько бы колонок его ни содержали
+    def kind_table(kind: str, convert: Callable[[str], object], dtype, empty) -> np.ndarray:
+        used = [grid[:, header.index(column)] for column, column_kind in schema.items() if column_kind == kind]
+        return vocabulary.table(used, convert, dtype, empty)
+
+    tables = {
+        'text': kind_table('text', lambda word: vocabulary.add(to_text(word)), np.int32, -1),
+        'number': kind_table('number', to_number, np.float64, np.nan),
+        'percent': kind_table('percent', to_percent, np.float64, np.nan)
+    }
+
+    columns = {}
+    for column, kind in schema.items():
+        values = grid[:, header.index(column)]
+        columns[column] = tables[kind][values]
+        if kind != 'text':
+            report.fix('нечисловые значения', ((values >= 0) & np.isnan(columns[column])).sum())
+
+    slots = MANDATORY_COLUMNS + ELECTIVE_COLUMNS + (LEGACY_EXAMS if legacy else [])
+    for names in [slot[:1] + slot for slot in slots] + [['special_note'] * 2] + ([['notes'] * 2] if legacy else []):
+        junk = matches(columns[names[0]], vocabulary, JUNK_TEXT)
+        for column in names[1:]:
+            clear(columns[column], junk)
+        report.fix('мусор вместо названия экзамена' if len(names) > 2 else 'мусор вместо примечания', junk.sum())
+
+    language_columns = ('teaching_language', 'language') if legacy else ('teaching_language',)
+    known = {vocabulary.words[code] for column in language_columns for code in np.unique(columns[column]) if code >= 0}
+    misplaced = {}
+    for column in language_columns:
+        full_name = vocabulary.table(
+            [columns[column]], lambda word: vocabulary.add(word + ' ენა' if word + ' ენა' in known else word),
+            np.int32, -1
+        )
+        language = full_name[columns[column]]
+        report.fix('сокращенное название языка', (language != columns[column]).sum())
+
+        text = (language >= 0) & ~matches(language, vocabulary, LANGUAGE)
+        note = columns['special_note']
+        free = text & (note < 0)
+        note[free] = language[free]
+        language[text] = -1
+        columns[column] = language
+        misplaced[column] = text
+        report.fix('текст вместо языка обучения', text.sum())
+        report.fix('текст вместо языка обучения отброшен: примечание заполнено', (text & ~free).sum())
+
+    unresolved = misplaced['teaching_language']
+    if legacy:
+        mapped = unresolved & (columns['language'] >= 0)
+        columns['teaching_language'][mapped] = columns['language'][mapped]
+        report.fix('язык обучения из language вместо текста', mapped.sum())
+        unresolved = unresolved & ~mapped
+    columns['language_unresolved'] = unresolved
+    return columns
+
+
+def reconcile_legacy(columns: Dict[str, np.ndarray], report: IngestionReport) -> Dict[str, np.ndarray]:
+    """
+    Переносит данные устаревших колонок в основную схему
+
+    Поля переносятся, только если основная колонка пуста. Экзамены exam1..exam5
+    переносятся в строки без экзаменов в основных слотах: экзамен с местами -
+    выборочный, без мест - обязательный, в порядке устаревших слотов.
+
+    Returns:
+        Колонки SCHEMA и language_unresolved
+    """
+    if all(column in columns for column in LEGACY_SCHEMA):
+        for column, legacy_column in LEGACY_FIELDS.items():
+            fill = isna(columns[column]) & ~isna(columns[legacy_column])
+            columns[column][fill] = columns[legacy_column][fill]
+            report.fix(f'{column} из {legacy_column}', fill.sum())
+
+        empty = np.all([isna(columns[slot[0]]) for slot in MANDATORY_COLUMNS + ELECTIVE_COLUMNS], axis=0)
+        present = np.column_stack([~isna(columns[slot[0]]) for slot in LEGACY_EXAMS]) & empty[:, None]
+        with_places = np.column_stack([~isna(columns[slot[-1]]) for slot in LEGACY_EXAMS])
+
+        # k-й обязательный (выборочный) экзамен строки идет в k-й обязательный (выборочный) слот
+        for group, targets in ((present & ~with_places, MANDATORY_COLUMNS), (present & with_places, ELECTIVE_COLUMNS)):
+            rank = np.cumsum(group, axis=1) - 1
+            for j, source in enumerate(LEGACY_EXAMS):
+                for k, target in enumerate(targets):
+                    rows = group[:, j] & (rank[:, j] == k)
+                    for target_column, source_column in zip(target, source):
+                        columns[target_column][rows] = columns[source_column][rows]
+                report.fix('экзамен exam1..exam5 без свободного слота', (group[:, j] & (rank[:, j] >= len(targets))).sum())
+        report.fix('экзамены из exam1..exam5', present.any(axis=1).sum())
+
+    return {column: columns[column] for column in (*SCHEMA, 'language_unresolved')}
+
+
+def reject_invalid_rows(columns: Dict[str, np.ndarray], report: IngestionReport) -> Dict[str, np.ndarray]:
+    """
+    Откладывает строки без обязательных полей, повторы кода программы (остается
+    первая) и строки с текстом вместо языка обучения, язык которых не нашелся
+
+    Returns:
+        Колонки SCHEMA оставшихся строк; коды программ и университетов - int64
+    """
+    program_code = columns['program_code']
+    duplicated = np.ones(len(program_code), dtype=bool)
+    duplicated[np.unique(program_code, return_index=True)[1]] = False
+
+    reasons = [(isna(columns[column]), f'нет {column}') for column in REQUIRED_COLUMNS]
+    reasons.append((duplicated & ~np.isnan(program_code), 'повтор program_code'))
+    reasons.append((columns.pop('language_unresolved'), 'текст вместо языка обучения'))
+
+    rejected = np.zeros(len(program_code), dtype=bool)
+    for mask, reason in reasons:
+        mask = mask & ~rejected
+        report.quarantine(np.flatnonzero(mask), program_code[mask], reason)
+        rejected |= mask
+
+    kept = {column: values[~rejected] for column, values in columns.items()}
+    for column in ('program_code', 'university_code'):
+        kept[column] = kept[column].astype(np.int64)
+    return kept
+
+
+def first_appearance(codes: np.ndarray) -> np.ndarray:
+    """Непустые коды колонки без повторов, в порядке первого появления"""
+    keys, first = np.unique(codes, return_index=True)
+    present = keys >= 0
+    return keys[present][np.argsort(first[present])]
+
+
+def group_codes(values: List[str], groups: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+    """
+    Колонка для ProgramTable в виде (коды, строки) по группам строк: values[i] -
+    значение группы i, groups - группа каждой строки
+    """
+    index: Dict[str, int] = {}
+    codes = np.array([index.setdefault(value, len(index)) for value in values], dtype=np.int32)
+    return codes[groups], list(index)
+
+
+def compile_priorities(columns: Dict[str, np.ndarray], priority_cols: List[str], ids: np.ndarray) -> np.ndarray:
+    """Приоритеты слотов (программы × слоты, int8); 0 - приоритет не указан или слот пуст"""
+    priorities = np.column_stack([columns[column] for column in priority_cols])
+    valid = (ids >= 0) & np.isin(priorities, np.arange(1, MAX_PRIORITY + 1))
+    return np.where(valid, priorities, 0).astype(np.int8)
+
+
+def compile_slots(columns: Dict[str, np.ndarray],
+                  vocabulary: Vocabulary,
+                  subjects: ExamSubjectRegistry,
+                  name_cols: List[str],
+                  coef_cols: List[str],
+                  min_cols: List[str]):
+    """
+    Компилирует слоты экзаменов в плотные матрицы (программы × слоты)
+
+    Названия экзаменов сводятся к subject id реестра, отсутствующий экзамен
+    обозначается id = -1. Исходные названия слотов сохраняются для текстов о
+    непройденных минимумах (SlotNames - коды в таблицу уникальных названий).
+    Матрицы остаются int32/float64: в снимке они открываются через mmap и
+    делятся между воркерами, а более узкие типы замедляют расчет (и для
+    коэффициентов меняют баллы).
+
+    Returns:
+        (ids, slot_names, coefs, minimums)
+    """
+    n = len(columns['program_code'])
+    ids = np.full((n, len(name_cols)), -1, dtype=np.int32)
+    name_codes = np.full((n, len(name_cols)), -1, dtype=np.int32)
+    coefs = np.zeros((n, len(name_cols)), dtype=np.float64)
+    minimums = np.zeros((n, len(name_cols)), dtype=np.float64)
+    lookup: Dict[str, int] = {}
+
+    for j, (name_col, coef_col, min_col) in enumerate(zip(name_cols, coef_cols, min_cols)):
+        # Названия регистрируются по одному разу, в порядке первого появления в колонке
+        codes = columns[name_col]
+        names = [vocabulary.words[code] for code in first_appearance(codes).tolist()]
+        subject_ids = np.full(len(vocabulary) + 1, -1, dtype=np.int32)
+        slot_codes = np.full(len(vocabulary) + 1, -1, dtype=np.int32)
+        for name in names:
+            subject_ids[vocabulary.index[name]] = subjects.register(name)
+            slot_codes[vocabulary.index[name]] = lookup.setdefault(sys.intern(name), len(lookup))
+        ids[:, j] = subject_ids[codes]
+        name_codes[:, j] = slot_codes[codes]
+
+        # Экзамен без коэффициента считаем с коэффициентом 1.0, без порога - с порогом 0
+        present = codes >= 0
+        coef = columns[coef_col]
+        coefs[:, j] = np.where(present, np.where(np.isnan(coef), 1.0, coef), 0.0)
+        minimum = columns[min_col]
+        minimums[:, j] = np.where(present & ~np.isnan(minimum), minimum, 0.0)
+
+    return ids, SlotNames(name_codes, list(lookup)), coefs, minimums
+
+
+def prepare_catalog(raw: bytes, categorizer: CategoryMatcher) -> Dict[str, object]:
+    """
+    Разбирает CSV и готовит данные для обслуживания запросов
+
+    Args:
+        raw: Содержимое programs_database.csv
+        categorizer: Правила категоризации программ
+
+    Returns:
+        dict атрибутов движка: programs (ProgramTable), subjects, матрицы слотов
+        mandatory_*/elective_* (ids, names, coefs, mins, priorities), elective_places,
+        search_index (поиск по названиям программ, квалификаций и университетов) и
+        ingestion_report (IngestionReport.as_dict())
+    """
+    report = IngestionReport()
+    header, grid, vocabulary = read_catalog(raw)
+    report.rows_read = len(grid)
+    realign_shifted_rows(header, grid, vocabulary, report)
+    columns = apply_schema(header, grid, vocabulary, report)
+    del grid
+    columns = reject_invalid_rows(reconcile_legacy(columns, report), report)
+
+    program_names = vocabulary.decode(columns['program_name']).tolist()
+    university_codes = columns['university_code'].tolist()
+
+    # Тип университета (государственный/частный), город и категория - по группам
+    # строк с одинаковыми исходными значениями; все строковые колонки передаются кодами
+    table_columns = {column: columns[column] for column in
+                     ('program_code', 'university_code', 'annual_tuition', 'total_places', 'credits')}
+    state = (columns['annual_tuition'] == STATE_TUITION).astype(np.int32)
+    table_columns['uni_type'] = group_codes(['კერძო', 'სახელმწიფო'], state)
+    universities, university_groups = np.unique(columns['university_code'], return_inverse=True)
+    table_columns['city'] = group_codes([get_city(code) for code in universities.tolist()], university_groups)
+    pairs, pair_groups = np.unique(np.column_stack([columns['program_name'], columns['university_code']]),
+                                   axis=0, return_inverse=True)
+    categories = categorizer.categorize([vocabulary.words[code] for code in pairs[:, 0].tolist()], pairs[:, 1].tolist())
+    table_columns['category'] = group_codes(categories, pair_groups.ravel())
+    for column in ('teaching_language', *TEXT_COLUMNS):
+        table_columns[column] = (columns[column], vocabulary.words)
+    programs = ProgramTable(table_columns)
+
+    # Экзамены, коэффициенты и пороги - в матрицы для векторного расчета
+    subjects = ExamSubjectRegistry()
+    prepared = {'programs': programs, 'subjects': subjects}
+    slot_groups = (('mandatory', MANDATORY_SLOTS, MANDATORY_PRIORITIES),
+                   ('elective', ELECTIVE_SLOTS, ELECTIVE_PRIORITIES))
+    for prefix, slots, priority_cols in slot_groups:
+        ids, names, coefs, mins = compile_slots(columns, vocabulary, subjects, *slots)
+        prepared.update({
+            f'{prefix}_ids': ids,
+            f'{prefix}_names': names,
+            f'{prefix}_coefs': coefs,
+            f'{prefix}_mins': mins,
+            f'{prefix}_priorities': compile_priorities(columns, priority_cols, ids)
+        })
+
+    # Места по выборочным экзаменам (0 - не указаны)
+    places = np.column_stack([columns[column] for column in ELECTIVE_PLACES])
+    places = np.where((prepared['elective_ids'] >= 0) & ~np.isnan(places), places, 0)
+    prepared['elective_places'] = places.astype(np.int32)
+
+    prepared['search_index'] = SearchIndex(
+        program_names, vocabulary.decode(columns['qualification']).tolist(), university_codes, UNIVERSITIES
+    )
+    prepared['ingestion_report'] = report.as_dict()
+    return prepared
@@ -0,0 +1,155 @@
+"""
+Метрики горячего пути: длительность этапов и счетчики
+Гистограммы с фиксированными корзинами, выдача в текстовом формате Prometheus
+и заголовок Server-Timing для текущего запроса
+"""
+
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# Границы корзин гистограмм в секундах (от 10 мкс до 10 с)
+BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0
+)
+
+# Этапы текущего запроса для Server-Timing: список (этап, секунды) или None вне запроса
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = \
+    contextvars.ContextVar('request_timings', default=None)
+
+
+class Histogram:
+    """Гистограмма длительностей с кумулятивной выдачей корзин как в Prometheus"""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса
+
+    Каждый воркер считает свои метрики; наблюдение - это bisect по корзинам
+    и несколько сложений под общей блокировкой, поэтому инструментирование
+    можно держать включенным в продакшене (накладные расходы - в benchmark.py).
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._stages: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        """Записывает длительность этапа в гистограмму и в Server-Timing текущего запроса"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+
+    def inc(self, name: str, value: float = 1):
+        """Увеличивает счетчик"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def stage(self, name: str) -> 'StageTimer':
+        """Контекстный менеджер, замеряющий длительность этапа"""
+        return StageTimer(self, name)
+
+    def render(self, counters: Dict[str, float] = None, gauges: Dict[str, float] = None) -> str:
+        """
+        Метрики в текстовом формате Prometheus
+
+        Args:
+            counters: Счетчики, которые ведутся вне реестра (например, кэшем) {имя: значение}
+            gauges: Мгновенные значения {имя: значение}
+        """
+        with self._lock:
+            stages = {name: (list(h.counts), h.sum, h.count) for name, h in self._stages.items()}
+            counters = {**self._counters, **(counters or {})}
+
+        lines = [
+            '# HELP recommender_stage_seconds Duration of request processing stages',
+            '# TYPE recommender_stage_seconds histogram'
+        ]
+        for name, (counts, total, count) in sorted(stages.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'recommender_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'recommender_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'recommender_stage_seconds_sum{{stage="{name}"}} {total!r}')
+            lines.append(f'recommender_stage_seconds_count{{stage="{name}"}} {count}')
+
+        for name, value in sorted(counters.items()):
+            lines.append(f'# TYPE recommender_{name}_total counter')
+            lines.append(f'recommender_{name}_total {value:g}')
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f'# TYPE recommender_{name} gauge')
+            lines.append(f'recommender_{name} {value:g}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Замер одного этапа: with REGISTRY.stage('score'): ..."""
+
+    __slots__ = ('registry', 'name', 'started')
+
+    def __init__(self, registry: MetricsRegistry, name: str):
+        self.registry = registry
+        self.name = name
+        self.started = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.started)
+
+
+def start_request():
+    """Начинает сбор этапов для Server-Timing текущего запроса"""
+    _request_timings.set([])
+
+
+def finish_request() -> List[Tuple[str, float]]:
+    """Заканчивает сбор и возвращает этапы текущего запроса"""
+    timings = _request_timings.get() or []
+    _request_timings.set(None)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Значение заголовка Server-Timing; повторяющиеся этапы суммируются"""
+    totals: Dict[str, float] = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ', '.join(f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in totals.items())
+
+
+# Метрики процесса; METRICS_ENABLED=0 отключает сбор
+REGISTRY = MetricsRegistry(enabled=os.environ.get('METRICS_ENABLED', '1') != '0')
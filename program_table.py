@@ -0,0 +1,205 @@
+"""
+Компактная таблица программ для обслуживания запросов
+Типизированные массивы вместо DataFrame: воркеру не нужен pandas, а снимок
+(snapshot.py) отдает массивы всем воркерам из одного файла через mmap
+"""
+
+import itertools
+import sys
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# Колонки с небольшим числом значений: хранятся кодами (-1 - пустое значение)
+CODED_COLUMNS = ('city', 'uni_type', 'category', 'teaching_language')
+
+# Текстовые колонки: коды int32 в таблицу уникальных строк (пустое значение - float('nan'), как в CSV)
+TEXT_COLUMNS = ('program_name', 'accreditation_status', 'special_note')
+
+# Число уровней приоритета экзаменов (значения колонок *_priority: 1-4); по ним
+# ingestion.py проверяет данные, а allocation.py сравнивает баллы при равенстве
+MAX_PRIORITY = 4
+
+
+class Program:
+    """Одна программа - запись, собираемая из колонок таблицы по запросу"""
+
+    __slots__ = ('row', 'program_code', 'university_code', 'program_name', 'city', 'uni_type',
+                 'category', 'teaching_language', 'annual_tuition', 'total_places', 'credits',
+                 'accreditation_status', 'special_note')
+
+    def __init__(self, table: 'ProgramTable', row: int):
+        self.row = row
+        self.program_code = int(table.program_code[row])
+        self.university_code = int(table.university_code[row])
+        self.annual_tuition = float(table.annual_tuition[row])
+        self.total_places = int(table.total_places[row])
+        self.credits = int(table.credits[row])
+        for column in CODED_COLUMNS + TEXT_COLUMNS:
+            setattr(self, column, table.value(column, row))
+
+
+class ProgramTable:
+    """
+    Каталог программ в колонках
+
+    Числа - массивы NumPy минимальной разрядности, строки - коды (int16 для
+    города/типа/категории/языка, int32 для текстов) со справочником уникальных
+    значений. Вся таблица, кроме справочников, - массивы: в снимке они общие
+    для воркеров. Пустые места и кредиты заменяются значениями по умолчанию
+    выдачи (0 и 240) еще при построении таблицы.
+
+    Поиск по program_code и university_code идет по отсортированным ключам
+    (searchsorted): O(log n) на код и тоже массивы снимка, в отличие от dict,
+    который каждый воркер держал бы своей копией.
+    """
+
+    def __init__(self, columns: Dict[str, Sequence]):
+        """
+        Args:
+            columns: Колонки одинаковой длины - program_code, university_code,
+                annual_tuition, total_places, credits, а также CODED_COLUMNS и
+                TEXT_COLUMNS (пустые значения - NaN). Строковая колонка может
+                быть уже закодирована: (коды, список строк), -1 - пустое значение
+        """
+        self.program_code = np.asarray(columns['program_code'], dtype=np.int64)
+        self.university_code = np.asarray(columns['university_code'], dtype=np.int32)
+        self.annual_tuition = np.asarray(columns['annual_tuition'], dtype=np.float64)
+        self.total_places = self._int_column(columns['total_places'], default=0)
+        self.credits = self._int_column(columns['credits'], default=240)
+
+        self.codes: Dict[str, np.ndarray] = {}
+        self.values: Dict[str, List[str]] = {}
+        for column in CODED_COLUMNS:
+            self.codes[column], self.values[column] = self._encode(columns[column], np.int16)
+        for column in TEXT_COLUMNS:
+            self.codes[column], self.values[column] = self._encode(columns[column], np.int32)
+
+        # Коды программ по возрастанию и их строки
+        self.code_rows = np.argsort(self.program_code, kind='stable').astype(np.int32)
+        self.sorted_codes = self.program_code[self.code_rows]
+
+        # Строки программ каждого университета подряд: university_rows[offsets[i]:offsets[i + 1]]
+        self.university_rows = np.argsort(self.university_code, kind='stable').astype(np.int32)
+        self.university_keys, starts = np.unique(self.university_code[self.university_rows], return_index=True)
+        self.university_offsets = np.append(starts, len(self.university_rows)).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.program_code)
+
+    def __getitem__(self, row: int) -> Program:
+        return Program(self, int(row))
+
+    @staticmethod
+    def _int_column(values: Sequence, default: int) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        return np.where(np.isnan(values), default, values).astype(np.int32)
+
+    @staticmethod
+    def _encode(values, dtype):
+        """Коды значений в порядке первого появления; NaN и прочие не-строки получают -1"""
+        if isinstance(values, tuple):
+            return ProgramTable._recode(*values, dtype)
+        lookup: Dict[str, int] = {}
+        codes = [lookup.setdefault(value, len(lookup)) if isinstance(value, str) else -1 for value in values]
+        return np.array(codes, dtype=dtype), [sys.intern(value) for value in lookup]
+
+    @staticmethod
+    def _recode(codes: np.ndarray, words: List[str], dtype):
+        """Перекодирует коды в общий список строк words так же, как _encode - сами строки"""
+        present = codes >= 0
+        keys, first, inverse = np.unique(codes[present], return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty(len(keys), dtype=np.int64)
+        rank[order] = np.arange(len(keys))
+        recoded = np.full(len(codes), -1, dtype=dtype)
+        recoded[present] = rank[inverse]
+        return recoded, [sys.intern(words[key]) for key in keys[order].tolist()]
+
+    def find(self, program_codes: Sequence[int]) -> np.ndarray:
+        """Строки программ с кодами program_codes в том же порядке (-1 - кода нет в каталоге)"""
+        codes = np.asarray(program_codes, dtype=np.int64)
+        if not len(self):
+            return np.full(codes.shape, -1, dtype=np.int32)
+        positions = np.minimum(np.searchsorted(self.sorted_codes, codes), len(self) - 1)
+        return np.where(self.sorted_codes[positions] == codes, self.code_rows[positions], -1).astype(np.int32)
+
+    def university_programs(self, university_code: int) -> np.ndarray:
+        """Строки программ университета (в порядке базы)"""
+        i = int(np.searchsorted(self.university_keys, university_code))
+        if i == len(self.university_keys) or self.university_keys[i] != university_code:
+            return np.empty(0, dtype=np.int32)
+        return self.university_rows[self.university_offsets[i]:self.university_offsets[i + 1]]
+
+    def value(self, column: str, row: int):
+        """Значение строковой колонки (NaN для пустого, как в исходном CSV)"""
+        code = self.codes[column][row]
+        return self.values[column][code] if code >= 0 else float('nan')
+
+    def count(self, column: str, value: str) -> int:
+        """Число программ с заданным значением строковой колонки"""
+        values = self.values[column]
+        return int(np.count_nonzero(self.codes[column] == values.index(value))) if value in values else 0
+
+
+class SlotNames:
+    """
+    Матрица названий экзаменов по слотам (программы × слоты) в виде кодов
+
+    Индексируется как массив NumPy: names[row, j] - строка (None для пустого
+    слота), names[rows] - массив object.
+    """
+
+    def __init__(self, codes: np.ndarray, values: List[str]):
+        self.codes = codes
+        self.lookup = np.array(list(values) + [None], dtype=object)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def __getitem__(self, key):
+        return self.lookup[self.codes[key]]
+
+
+class Fragments:
+    """
+    Набор байтовых строк в одном массиве uint8 со смещениями
+
+    fragments[i] - i-я строка (bytes). Оба массива числовые, поэтому в снимке
+    они, как и остальные колонки, общие для воркеров.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def encode(cls, parts: Iterable[bytes], block_size: int = 8192) -> 'Fragments':
+        """
+        Склеивает строки parts в один массив
+
+        parts может быть генератором: строки склеиваются блоками по block_size,
+        и в памяти сразу не бывает всех строк по отдельности.
+        """
+        parts = iter(parts)
+        lengths: List[int] = []
+        blocks: List[bytes] = []
+        for block in iter(lambda: list(itertools.islice(parts, block_size)), []):
+            lengths.extend(len(part) for part in block)
+            blocks.append(b''.join(block))
+
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        blob = np.empty(offsets[-1], dtype=np.uint8)
+        position = 0
+        for block in blocks:
+            blob[position:position + len(block)] = np.frombuffer(block, dtype=np.uint8)
+            position += len(block)
+        return cls(offsets, blob)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
@@ -4,10 +4,23 @@
 ОБНОВЛЕНО: использует официальную методику расчета баллов (სკალირებული ქულა)
 """
 
-import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
-import re
+import base64
+import hashlib
+import itertools
+import json
+import math
+import sys
+import time
+from functools import reduce
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from categories import CategoryMatcher
+from exam_subjects import ExamSubjectRegistry
+from metrics import REGISTRY
+from program_table import Fragments, Program, ProgramTable
+from result_cache import ResultCache
+import snapshot
 
 
 class UniversityRecommendationSystem:
@@ -15,112 +28,283 @@ class UniversityRecommendationSystem:
     Система рекомендаций программ обучения с официальной методикой расчета
     """
     
-    def __init__(self, database_path: str):
+    # Колонки, по которым строится bitmap-индекс фильтров
+    FILTER_COLUMNS = ('city', 'uni_type', 'category', 'teaching_language')
+    
+    # Сколько последних рассчитанных запросов хранить для постраничной выдачи
+    SCORED_CACHE_SIZE = 128
+    SCORED_CACHE_BYTES = 32 * 1024 * 1024
+    
+    # Меньше строк score_matrix() считает без группировки по формулам: np.unique дороже выигрыша
+    MIN_GROUPED_ROWS = 1024
+    
+    # Текст шанса поступления для каждого chance_level
+    CHANCE_LABELS = {
+        'failed': "არ აკმაყოფილებს მინიმუმს",
+        'very_high': "ძალიან მაღალი",
+        'high': "მაღალი",
+        'medium': "საშუალო",
+        'low': "დაბალი",
+        'very_low': "ძალიან დაბალი"
+    }
+    
+    # Минимальная совместимость (%) для каждого chance_level, от высшего к низшему
+    CHANCE_THRESHOLDS = {
+        'very_high': 90.0,
+        'high': 75.0,
+        'medium': 60.0,
+        'low': 45.0,
+        'very_low': 0.0
+    }
+    
+    # Подготовленные данные, которые сохраняются в бинарный снимок (snapshot.py):
+    # числовые массивы (и внутри объектов) открываются через mmap и общие для воркеров
+    SNAPSHOT_ATTRIBUTES = (
+        'mandatory_ids', 'mandatory_coefs', 'mandatory_mins', 'mandatory_priorities',
+        'elective_ids', 'elective_coefs', 'elective_mins', 'elective_priorities', 'elective_places',
+        'programs', 'subjects', 'mandatory_names', 'elective_names',
+        'filter_index', '_all_rows_bitmap', '_empty_bitmap', 'fragments', 'search_index',
+        'ingestion_report', 'formula_of', 'formula_rows'
+    )
+    
+    # Статические поля выдачи: ключ ответа → атрибут Program (None - cost_display, вычисляется)
+    STATIC_FIELDS = (
+        ('program_code', 'program_code'), ('program_name', 'program_name'),
+        ('university_code', 'university_code'), ('city', 'city'), ('uni_type', 'uni_type'),
+        ('tuition', 'annual_tuition'), ('cost_display', None), ('places', 'total_places'),
+        ('teaching_language', 'teaching_language'), ('credits', 'credits'),
+        ('accreditation', 'accreditation_status'), ('special_note', 'special_note')
+    )
+    
+    # Строк программ в одном блоке сборки фрагментов (_build_fragments)
+    FRAGMENT_BLOCK_ROWS = 8192
+    
+    # Кодировщик JSON выдачи: компактный, UTF-8 без \u-экранирования грузинского текста
+    JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    
+    def __init__(self, database_path: str, snapshot_dir: str = None, categorizer: CategoryMatcher = None):
         """
         Инициализация системы
         
         Args:
             database_path: Путь к CSV файлу с программами
+            snapshot_dir: Каталог бинарных снимков подготовленных данных; если задан,
+                CSV разбирается только когда снимка для его содержимого еще нет
+            categorizer: Правила категоризации (по умолчанию встроенные); один и тот же
+                объект можно передавать при каждой перезагрузке базы
         """
-        self.df = pd.read_csv(database_path)
-        self.prepare_data()
+        started = time.perf_counter()
+        self.database_path = database_path
+        self.categorizer = categorizer or CategoryMatcher()
+        
+        # Версия данных - начало хэша содержимого CSV и правил категорий
+        # (хэшируем те же байты, что разбираем)
+        with open(database_path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw)
+        digest.update(self.categorizer.fingerprint().encode())
+        content_hash = digest.hexdigest()
+        self.data_version = content_hash[:12]
+        
+        self._scored_cache = ResultCache(max_entries=self.SCORED_CACHE_SIZE, max_bytes=self.SCORED_CACHE_BYTES)
+        self._scored_cache.set_version(self.data_version)
+        
+        # Проходные баллы симуляции (admission_sim.py) - подключаются set_cutoffs()
+        self.cutoffs = None
+        
+        # Сериализованные поля шанса для каждого chance_level (для _render_results)
+        self._chance_json = {
+            level: self.JSON_ENCODER.encode({'admission_chance': label, 'chance_level': level})[1:-1]
+            for level, label in self.CHANCE_LABELS.items()
+        }
+        
+        if not snapshot_dir:
+            self.prepare_data(raw)
+            source = 'CSV'
+        elif snapshot.load_snapshot(self, database_path, snapshot_dir, content_hash):
+            source = 'снимок'
+        else:
+            # Снимок готовит один процесс, остальные ждут и открывают готовый
+            with snapshot.build_lock(database_path, snapshot_dir):
+                if snapshot.load_snapshot(self, database_path, snapshot_dir, content_hash):
+                    source = 'снимок'
+                else:
+                    self.prepare_data(raw)
+                    source = 'CSV'
+                    # Переходим на массивы опубликованного снимка, чтобы и этот
+                    # процесс делил их страницы с остальными
+                    if snapshot.save_snapshot(self, database_path, snapshot_dir, content_hash):
+                        snapshot.load_snapshot(self, database_path, snapshot_dir, content_hash)
+        
+        self._print_summary()
+        print(f"✓ Время загрузки: {time.perf_counter() - started:.3f} с ({source}), версия {self.data_version}")
     
-    def prepare_data(self):
+    def prepare_data(self, raw: bytes):
         """
-        Подготовка данных - очистка и нормализация
+        Подготовка данных из содержимого CSV - очистка, нормализация, компиляция слотов
+        
+        Разбор CSV (ingestion.py) - единственный шаг, которому нужен pandas, поэтому
+        он импортируется здесь: воркер, стартующий со снимка, pandas не загружает.
         """
-        # Определяем тип университета (государственный/частный)
-        self.df['uni_type'] = self.df['annual_tuition'].apply(
-            lambda x: 'სახელმწიფო' if x == 2250.0 else 'კერძო'
-        )
+        from ingestion import prepare_catalog
         
-        # Очищаем названия программ
-        self.df['program_name_clean'] = self.df['program_name'].str.strip()
-        
-        # Определяем категорию программы
-        self.df['category'] = self.df.apply(self._categorize_program, axis=1)
-        
-        # Определяем город университета
-        self.df['city'] = self.df['university_code'].apply(self._get_city)
-        
-        print(f"✓ Загружено программ: {len(self.df)}")
-        print(f"✓ Университетов: {self.df['university_code'].nunique()}")
-        print(f"✓ Государственные программы: {len(self.df[self.df['uni_type'] == 'სახელმწიფო'])}")
-        print(f"✓ Частные программы: {len(self.df[self.df['uni_type'] == 'კერძო'])}")
-    
-    def _categorize_program(self, row) -> str:
-        """Определяет категорию программы по названию"""
-        name = row['program_name'].lower()
-        uni_code = row['university_code']
-        
-        # Специальная обработка для теологических университетов
-        theological_universities = [4, 88, 173, 174, 175, 177, 184, 194]
-        if uni_code in theological_universities:
-            return 'საღვთისმეტყველო'
-        
-        categories = {
-            'საღვთისმეტყველო': ['თეოლოგ', 'ღვთისმეტყველ', 'საღმრთო', 'საეკლესიო', 'სასულიერო', 'ქრისტიანული ხელოვნებ'],
-            'მედიცინა და ფარმაცია': ['მედიცინა', 'სტომატოლოგ', 'ფარმაცია', 'ექთანი', 'სამეანო', 'რეაბილიტაცი'],
-            'IT და კომპიუტერული მეცნიერებები': ['კომპიუტერ', 'ინფორმაცი'],
-            'ბიზნესი და ეკონომიკა': ['ბიზნეს', 'ეკონომიკ', 'მენეჯმენტ', 'ფინანს', 'ტურიზმ', 'მარკეტინგ'],
-            'სამართალი': ['სამართალ', 'იურისპრუდენცი'],
-            'ხელოვნება და დიზაინი': ['ხელოვნება', 'დიზაინ', 'არქიტექტურ', 'ხატვა', 'გრაფიკ', 'რესტავრაცი'],
-            'მუსიკა და თეატრი': ['მუსიკ', 'თეატრ', 'კინო', 'მსახიობ', 'ბალეტ', 'ქორეოგრაფი'],
-            'ინჟინერია': ['ინჟინერ', 'მშენებლობ', 'ენერგეტიკ', 'ტრანსპორტ'],
-            'ენები და ფილოლოგია': ['ფილოლოგ', 'ქართული ენა', 'ინგლისური', 'გერმანული'],
-            'საბუნებისმეტყველო მეცნიერებები': ['მათემატიკ', 'ფიზიკ', 'ქიმი', 'ბიოლოგ', 'გეოგრაფ', 'ეკოლოგ'],
-            'სოციალური მეცნიერებები': ['ფსიქოლოგ', 'პოლიტიკ', 'სოციოლოგ', 'ისტორი', 'ფილოსოფი', 'ანთროპოლოგ'],
-            'სასოფლო-სამეურნეო': ['აგრონომ', 'ვეტერინარ', 'სატყეო', 'ლანდშაფტ'],
-            'განათლება': ['მასწავლებელ', 'განათლება', 'პედაგოგ']
-        }
+        for name, value in prepare_catalog(raw, self.categorizer).items():
+            setattr(self, name, value)
         
-        for category, keywords in categories.items():
-            for keyword in keywords:
-                if keyword in name:
-                    return category
-        
-        return 'სხვა'
-    
-    def _get_city(self, uni_code: int) -> str:
-        """Определяет город университета по коду"""
-        city_map = {
-            # Тбилиси
-            1: 'თბილისი', 2: 'თბილისი', 3: 'თბილისი', 4: 'თბილისი',
-            5: 'თბილისი', 6: 'თბილისი', 10: 'თბილისი', 12: 'თბილისი',
-            33: 'თბილისი', 36: 'თბილისი', 40: 'თბილისი', 52: 'თბილისი',
-            64: 'თბილისი', 85: 'თბილისი', 88: 'თბილისი', 98: 'თბილისი',
-            115: 'თბილისი', 120: 'თბილისი', 121: 'თბილისი', 122: 'თბილისი',
-            129: 'თბილისი', 131: 'თბილისი', 143: 'თბილისი', 145: 'თბილისი',
-            152: 'თბილისი', 153: 'თბილისი', 154: 'თბილისი', 171: 'თბილისი',
-            172: 'თბილისი', 175: 'თბილისი', 177: 'თბილისი',
-            181: 'თბილისი', 183: 'თბილისი', 186: 'თბილისი', 195: 'თბილისი',
-            198: 'თბილისი', 199: 'თბილისი', 201: 'თბილისი', 202: 'თბილისი',
-            203: 'თბილისი', 204: 'თბილისი', 206: 'თბილისი',
-            # Кутаиси
-            9: 'ქუთაისი', 19: 'ქუთაისი', 174: 'ქუთაისი', 197: 'ქუთაისი',
-            # Телави
-            71: 'თელავი',
-            # Зугдиди
-            97: 'ზუგდიდი',
-            # Батуми
-            53: 'ბათუმი', 114: 'ბათუმი', 130: 'ბათუმი', 140: 'ბათუმი',
-            184: 'ბათუმი', 192: 'ბათუმი', 205: 'ბათუმი',
-            # Гори
-            133: 'გორი', 155: 'გორი',
-            # Ахалцихе
-            14: 'ახალციხე', 194: 'ახალციხე',
-            # სოფ. ხიჭაური
-            142: 'სოფ. ხიჭაური',
-            # სოფ. გრემი (Греми)
-            173: 'სოფ. გრემი'
-        }
-        return city_map.get(uni_code, 'თბილისი')
+        # Строим bitmap-индекс по значениям фильтров
+        self._build_filter_index()
+        
+        # Группируем программы с одинаковой формулой балла
+        self._build_formulas()
+        
+        # Статические поля выдачи сериализуем один раз
+        self._build_fragments()
+    
+    def set_cutoffs(self, cutoffs):
+        """
+        Подключает проходные баллы симуляции: в выдаче появляются
+        admission_probability и estimated_cutoff
+        
+        Args:
+            cutoffs: admission_sim.AdmissionCutoffs для этой версии данных или None
+            
+        Raises:
+            ValueError: если проходные баллы посчитаны для другой версии данных
+        """
+        if cutoffs is not None and cutoffs.data_version != self.data_version:
+            raise ValueError(f"Проходные баллы посчитаны для версии данных {cutoffs.data_version}, "
+                             f"текущая {self.data_version}")
+        self.cutoffs = cutoffs
+    
+    def memory_bytes(self) -> int:
+        """
+        Оценка объема подготовленных данных (SNAPSHOT_ATTRIBUTES) в байтах
+        
+        Массивы считаются по nbytes (в том числе отображенные из снимка),
+        строки и контейнеры - по sys.getsizeof; общие объекты - один раз.
+        """
+        seen = set()
+        pending = [getattr(self, name) for name in self.SNAPSHOT_ATTRIBUTES]
+        total = 0
+        while pending:
+            obj = pending.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            if isinstance(obj, np.ndarray):
+                total += obj.nbytes
+                if obj.dtype.hasobject:
+                    pending.extend(obj.ravel().tolist())
+                continue
+            total += sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                pending.extend(obj.keys())
+                pending.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                pending.extend(obj)
+            elif hasattr(obj, '__dict__'):
+                pending.extend(vars(obj).values())
+            elif hasattr(type(obj), '__slots__'):
+                pending.extend(getattr(obj, slot) for slot in type(obj).__slots__ if hasattr(obj, slot))
+        return total
+    
+    def _print_summary(self):
+        """Печатает сводку по загруженной базе"""
+        print(f"✓ Загружено программ: {len(self.programs)}")
+        print(f"✓ Университетов: {len(np.unique(self.programs.university_code))}")
+        print(f"✓ Государственные программы: {self.programs.count('uni_type', 'სახელმწიფო')}")
+        print(f"✓ Частные программы: {self.programs.count('uni_type', 'კერძო')}")
+        
+        report = self.ingestion_report
+        if report['fixes']:
+            fixes = ', '.join(f"{kind}: {count}" for kind, count in report['fixes'].items())
+            print(f"✓ Исправлено при разборе CSV ({report['rows_read']} строк) - {fixes}")
+        for entry in report['quarantined']:
+            print(f"⚠ Строка {entry['line']} CSV отложена (program_code {entry['program_code']}): {entry['reason']}")
+    
+    def _build_filter_index(self):
+        """
+        Строит bitmap-индекс: колонка фильтра → значение → упакованная битовая маска строк
+        
+        Фильтрация сводится к AND/OR над готовыми масками без копирования данных.
+        """
+        n = len(self.programs)
+        self.filter_index: Dict[str, Dict[str, np.ndarray]] = {}
+        
+        for column in self.FILTER_COLUMNS:
+            codes, values = self.programs.codes[column], self.programs.values[column]
+            self.filter_index[column] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(values)
+            }
+        
+        self._all_rows_bitmap = np.packbits(np.ones(n, dtype=bool))
+        self._empty_bitmap = np.packbits(np.zeros(n, dtype=bool))
+    
+    def _build_formulas(self):
+        """
+        Группирует программы по формуле конкурсного балла
+        
+        Формула - предметы, коэффициенты и пороги обязательных и выборочных слотов
+        (места на балл не влияют). Сравнение побайтное: у программ с одной формулой
+        балл, совместимость, шанс и лучший выборочный слот совпадают для любого
+        абитуриента. formula_rows - первая строка каждой формулы (в порядке базы),
+        formula_of - номер формулы каждой строки.
+        """
+        signature = np.ascontiguousarray(np.concatenate([
+            self.mandatory_ids.astype(np.float64), self.mandatory_coefs, self.mandatory_mins,
+            self.elective_ids.astype(np.float64), self.elective_coefs, self.elective_mins
+        ], axis=1, dtype=np.float64))
+        keys = signature.view(np.dtype((np.void, signature.itemsize * signature.shape[1]))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        
+        # Номера формул по первому появлению в базе
+        order = np.argsort(first, kind='stable')
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        self.formula_rows = first[order].astype(np.int32)
+        self.formula_of = rank[inverse.ravel()]
+    
+    def filter_rows(self,
+                    city=None,
+                    uni_type=None,
+                    category=None,
+                    teaching_language=None,
+                    query: str = None) -> np.ndarray:
+        """
+        Фильтрация программ по bitmap-индексу
+        
+        Каждый фильтр - строка, список строк (любое из значений) или None (без фильтра).
+        query - поиск по названию программы, квалификации и университету (search_index.py):
+        остаются программы, содержащие все слова запроса (запрос без слов не находит ничего).
+        
+        Returns:
+            Отсортированный массив позиций программ в self.programs
+        """
+        bitmap = self._all_rows_bitmap
+        
+        for column, value in zip(self.FILTER_COLUMNS, (city, uni_type, category, teaching_language)):
+            if not value:
+                continue
+            values = [value] if isinstance(value, str) else value
+            index = self.filter_index[column]
+            column_bitmap = reduce(np.bitwise_or, (index.get(v, self._empty_bitmap) for v in values))
+            bitmap = bitmap & column_bitmap
+        
+        if query:
+            with REGISTRY.stage('search'):
+                matched = self.search_index.search(query)
+            mask = np.zeros(len(self.programs), dtype=bool)
+            mask[matched] = True
+            bitmap = bitmap & np.packbits(mask)
+        
+        return np.flatnonzero(np.unpackbits(bitmap, count=len(self.programs)))
     
     def filter_programs(self, 
                        city: str = None,
                        uni_type: str = None,
                        category: str = None,
-                       teaching_language: str = None) -> pd.DataFrame:
+                       teaching_language: str = None) -> List[Program]:
         """
         Фильтрация программ по критериям
         
@@ -131,23 +315,22 @@ class UniversityRecommendationSystem:
             teaching_language: Язык обучения
             
         Returns:
-            Отфильтрованный DataFrame
+            Список отфильтрованных программ
         """
-        filtered = self.df.copy()
-        
-        if city:
-            filtered = filtered[filtered['city'] == city]
-        
-        if uni_type:
-            filtered = filtered[filtered['uni_type'] == uni_type]
-        
-        if category:
-            filtered = filtered[filtered['category'] == category]
-        
-        if teaching_language:
-            filtered = filtered[filtered['teaching_language'] == teaching_language]
+        return [self.programs[row] for row in self.filter_rows(city, uni_type, category, teaching_language)]
+    
+    def autocomplete(self, query: str, limit: int = 10) -> Dict:
+        """
+        Подсказки поиска по названию для автодополнения
         
-        return filtered
+        Returns:
+            dict с suggestions (названия программ и университеты, см. SearchIndex.suggest)
+            и programs_found - числом программ, подходящих под запрос
+        """
+        with REGISTRY.stage('search'):
+            matched = self.search_index.search(query)
+            suggestions = self.search_index.suggest(query, limit)
+        return {'suggestions': suggestions, 'programs_found': len(matched)}
     
     def get_required_exams(self, 
                           city: str = None,
@@ -158,35 +341,44 @@ class UniversityRecommendationSystem:
         Получает список обязательных и выборочных экзаменов для отфильтрованных программ
         
         Returns:
-            Dictionary с mandatory и elective экзаменами
+            Dictionary с mandatory и elective экзаменами и числом программ programs_found
         """
-        filtered = self.filter_programs(city, uni_type, category, teaching_language)
+        rows = self.filter_rows(city, uni_type, category, teaching_language)
         
-        if len(filtered) == 0:
-            return {'mandatory': [], 'elective': []}
+        if len(rows) == 0:
+            return {'mandatory': [], 'elective': [], 'programs_found': 0}
         
         mandatory_exams = set()
         elective_exams = set()
         
-        # Собираем обязательные экзамены
-        for i in range(1, 5):
-            col = f'mandatory_exam_{i}'
-            exams = filtered[col].dropna().unique()
-            for exam in exams:
-                if str(exam).strip() and not str(exam).isdigit():
-                    mandatory_exams.add(str(exam).strip())
-        
-        # Собираем выборочные экзамены
-        for i in range(1, 7):
-            col = f'elective_exam_{i}_name'
-            exams = filtered[col].dropna().unique()
-            for exam in exams:
-                if str(exam).strip() and not str(exam).isdigit():
-                    elective_exams.add(str(exam).strip())
+        # Собираем обязательные и выборочные экзамены по скомпилированным слотам
+        for names, exams in ((self.mandatory_names, mandatory_exams), (self.elective_names, elective_exams)):
+            for exam in set(names[rows].ravel()):
+                if exam:
+                    exams.add(exam)
         
         return {
             'mandatory': sorted(list(mandatory_exams)),
-            'elective': sorted(list(elective_exams))
+            'elective': sorted(list(elective_exams)),
+            'programs_found': len(rows)
+        }
+    
+    def build_exam_catalog(self,
+                           cities: List[str],
+                           uni_types: List[str],
+                           categories: List[str],
+                           teaching_languages: List[str]) -> Dict[Tuple, Dict]:
+        """
+        Предрасчет get_required_exams() для всех комбинаций значений фильтров
+        
+        None в списке значений означает "без фильтра" по этому измерению.
+        
+        Returns:
+            dict: (city, uni_type, category, teaching_language) → результат get_required_exams()
+        """
+        return {
+            key: self.get_required_exams(*key)
+            for key in itertools.product(cities, uni_types, categories, teaching_languages)
         }
     
     def _convert_to_scaled_score(self, raw_percentage: float) -> float:
@@ -217,18 +409,131 @@ class UniversityRecommendationSystem:
             # Симулирует официальную шкалу где среднее=150, диапазон=100-200
             return 100.0 + raw_percentage
     
-    def _parse_percentage(self, value) -> float:
-        """Извлекает процент из строки"""
-        if pd.isna(value):
-            return 0.0
+    @staticmethod
+    def _round_like_python(values: np.ndarray, ndigits: int) -> np.ndarray:
+        """
+        Векторный аналог встроенного round()
+        
+        np.round расходится с round() на половинных значениях (250.025 и т.п.),
+        поэтому такие элементы досчитываются встроенным round().
+        """
+        factor = 10.0 ** ndigits
+        scaled = values * factor
+        rounded = np.rint(scaled)
+        # Расстояние до ближайшего целого (на месте, без лишних временных массивов)
+        scaled -= rounded
+        np.abs(scaled, out=scaled)
+        ambiguous = np.flatnonzero(scaled > 0.5 - 1e-6)
+        rounded /= factor
+        for i in ambiguous:
+            rounded[i] = round(float(values[i]), ndigits)
+        return rounded
+    
+    def score_programs(self, rows: np.ndarray, exam_scores: Dict[str, float]) -> Dict[str, np.ndarray]:
+        """
+        Векторный расчет конкурсного балла для набора программ
+        
+        Повторяет calculate_score() для всех строк rows за несколько операций
+        над массивами и возвращает те же величины без округления compatibility.
         
-        value_str = str(value)
-        numbers = re.findall(r'\d+', value_str)
-        if numbers:
-            return float(numbers[0])
-        return 0.0
+        Args:
+            rows: Позиции программ в self.programs
+            exam_scores: dict вида {exam_name: score_percentage}
+            
+        Returns:
+            dict массивов: competitive_score, compatibility, chance_level,
+            failed (маска проваленных минимумов по слотам), best_elective
+        """
+        scored = self.score_matrix(rows, self.subjects.score_vector(exam_scores)[np.newaxis, :])
+        return {key: value[0] for key, value in scored.items()}
     
-    def calculate_score(self, program, exam_scores: Dict[str, float]) -> Dict:
+    def score_matrix(self, rows: np.ndarray, scores: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Расчет конкурсных баллов сразу для многих абитуриентов (абитуриенты × программы)
+        
+        Каждая формула балла (formula_of) считается один раз - по первой программе
+        с этой формулой - и результат раздается всем строкам rows с ней. Если rows
+        не меньше числа формул, считаются сразу все формулы; иначе меньше
+        MIN_GROUPED_ROWS строк считаются без группировки.
+        
+        Args:
+            rows: Позиции программ в self.programs
+            scores: Матрица баллов (абитуриенты × subject id), строки из subjects.score_vector()
+            
+        Returns:
+            dict массивов той же структуры, что и score_programs(), с первой осью по абитуриентам
+        """
+        formulas = self.formula_of[rows]
+        if len(rows) >= len(self.formula_rows):
+            targets, index = self.formula_rows, formulas
+        elif len(rows) >= self.MIN_GROUPED_ROWS:
+            unique, index = np.unique(formulas, return_inverse=True)
+            targets = self.formula_rows[unique]
+        else:
+            return self._score_rows(rows, scores)
+        scored = self._score_rows(targets, scores)
+        return {key: value[:, index] for key, value in scored.items()}
+    
+    def _score_rows(self, rows: np.ndarray, scores: np.ndarray) -> Dict[str, np.ndarray]:
+        """Расчет score_matrix() для каждой строки rows отдельно (без группировки по формулам)"""
+        n_students = scores.shape[0]
+        
+        mandatory_ids = self.mandatory_ids[rows]
+        mandatory_coefs = self.mandatory_coefs[rows]
+        mandatory_present = mandatory_ids >= 0
+        mandatory_raw = scores[:, mandatory_ids]
+        mandatory_contrib = (np.clip(mandatory_raw, 0.0, 100.0) + 100.0) * mandatory_coefs
+        
+        # Суммируем по слотам в том же порядке, что и calculate_score()
+        competitive_score = np.zeros((n_students, len(rows)), dtype=np.float64)
+        total_coefficients = np.zeros(len(rows), dtype=np.float64)
+        for j in range(mandatory_ids.shape[1]):
+            competitive_score += np.where(mandatory_present[:, j], mandatory_contrib[:, :, j], 0.0)
+            total_coefficients += np.where(mandatory_present[:, j], mandatory_coefs[:, j], 0.0)
+        total_coefficients = np.broadcast_to(total_coefficients, competitive_score.shape).copy()
+        
+        failed = mandatory_present & (mandatory_raw < self.mandatory_mins[rows])
+        
+        # Выборочные: лучший по округленному вкладу среди прошедших минимум
+        elective_ids = self.elective_ids[rows]
+        elective_coefs = self.elective_coefs[rows]
+        elective_raw = scores[:, elective_ids]
+        eligible = (elective_ids >= 0) & (elective_raw >= self.elective_mins[rows])
+        elective_contrib = self._round_like_python(
+            ((np.clip(elective_raw, 0.0, 100.0) + 100.0) * elective_coefs).ravel(), 2
+        ).reshape(elective_raw.shape)
+        elective_contrib = np.where(eligible, elective_contrib, -np.inf)
+        best_elective = np.argmax(elective_contrib, axis=-1)
+        has_elective = eligible.any(axis=-1)
+        best_contrib = np.take_along_axis(elective_contrib, best_elective[..., np.newaxis], axis=-1)[..., 0]
+        best_coef = np.broadcast_to(elective_coefs, elective_raw.shape)
+        best_coef = np.take_along_axis(best_coef, best_elective[..., np.newaxis], axis=-1)[..., 0]
+        competitive_score += np.where(has_elective, best_contrib, 0.0)
+        total_coefficients += np.where(has_elective, best_coef, 0.0)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            compatibility = np.where(
+                total_coefficients > 0,
+                (competitive_score / (200.0 * total_coefficients)) * 100.0,
+                0.0
+            )
+        
+        levels = list(self.CHANCE_THRESHOLDS)[:-1]
+        chance_level = np.select(
+            [failed.any(axis=-1)] + [compatibility >= self.CHANCE_THRESHOLDS[level] for level in levels],
+            ['failed'] + levels,
+            default='very_low'
+        )
+        
+        return {
+            'competitive_score': self._round_like_python(competitive_score.ravel(), 2).reshape(competitive_score.shape),
+            'compatibility': compatibility,
+            'chance_level': chance_level,
+            'failed': failed,
+            'best_elective': np.where(has_elective, best_elective, -1)
+        }
+    
+    def calculate_score(self, row: int, exam_scores: Dict[str, float]) -> Dict:
         """
         Рассчитывает конкурсный балл по ОФИЦИАЛЬНОЙ грузинской методике
         
@@ -243,8 +548,9 @@ class UniversityRecommendationSystem:
         4. Проверяем минимальные пороги
         
         Args:
-            program: DataFrame row с информацией о программе
-            exam_scores: dict вида {exam_name: score_percentage}
+            row: Позиция программы в self.programs
+            exam_scores: dict вида {exam_name: score_percentage}, названия сводятся
+                к предметам через реестр self.subjects
             
         Returns:
             dict с compatibility, competitive_score и admission_chance
@@ -253,20 +559,19 @@ class UniversityRecommendationSystem:
         total_coefficients = 0.0
         failed_minimums = []
         scored_exams = []
+        resolved_scores = self.subjects.resolve_scores(exam_scores)
         
-        # Обрабатываем обязательные экзамены
-        for i in range(1, 5):
-            exam_col = f'mandatory_exam_{i}'
-            coef_col = f'mandatory_exam_{i}_coef'
-            min_col = f'mandatory_exam_{i}_min'
+        # Обрабатываем обязательные экзамены (скомпилированные слоты программы)
+        for j in range(self.mandatory_ids.shape[1]):
+            subject_id = int(self.mandatory_ids[row, j])
             
-            if pd.notna(program[exam_col]):
-                exam_name = str(program[exam_col]).strip()
-                coefficient = float(program[coef_col]) if pd.notna(program[coef_col]) else 1.0
-                minimum = self._parse_percentage(program[min_col]) if pd.notna(program[min_col]) else 0.0
+            if subject_id >= 0:
+                exam_name = self.mandatory_names[row, j]
+                coefficient = float(self.mandatory_coefs[row, j])
+                minimum = float(self.mandatory_mins[row, j])
                 
                 # Получаем сырой балл (0-100%)
-                raw_score = exam_scores.get(exam_name, 0.0)
+                raw_score = resolved_scores.get(subject_id, 0.0)
                 
                 # Проверяем минимальный порог (на сыром балле)
                 if raw_score < minimum:
@@ -290,17 +595,15 @@ class UniversityRecommendationSystem:
         
         # Обрабатываем выборочные экзамены - выбираем лучший
         elective_candidates = []
-        for i in range(1, 7):
-            exam_col = f'elective_exam_{i}_name'
-            coef_col = f'elective_exam_{i}_coef'
-            min_col = f'elective_exam_{i}_min'
+        for j in range(self.elective_ids.shape[1]):
+            subject_id = int(self.elective_ids[row, j])
             
-            if pd.notna(program[exam_col]):
-                exam_name = str(program[exam_col]).strip()
-                coefficient = float(program[coef_col]) if pd.notna(program[coef_col]) else 1.0
-                minimum = self._parse_percentage(program[min_col]) if pd.notna(program[min_col]) else 0.0
+            if subject_id >= 0:
+                exam_name = self.elective_names[row, j]
+                coefficient = float(self.elective_coefs[row, j])
+                minimum = float(self.elective_mins[row, j])
                 
-                raw_score = exam_scores.get(exam_name, 0.0)
+                raw_score = resolved_scores.get(subject_id, 0.0)
                 
                 # Учитываем только если проходит минимум
                 if raw_score >= minimum:
@@ -360,13 +663,278 @@ class UniversityRecommendationSystem:
             'scored_exams': scored_exams
         }
     
+    def rows_for_codes(self, program_codes: List[int]) -> np.ndarray:
+        """Позиции программ с заданными кодами (в порядке базы)"""
+        rows = self.programs.find(program_codes)
+        return np.unique(rows[rows >= 0])
+    
+    def compare_programs(self,
+                         exam_scores: Dict[str, float],
+                         program_codes: List[int] = None,
+                         university_codes: List[int] = None,
+                         max_programs: int = None) -> Dict:
+        """
+        Сравнение конкретных программ для абитуриента
+        
+        Программы находятся по индексам кодов таблицы, и считаются только они:
+        стоимость зависит от числа программ, а не от размера каталога.
+        
+        Args:
+            exam_scores: dict вида {exam_name: score_percentage}
+            program_codes: Коды программ (в порядке сравнения)
+            university_codes: Коды университетов: добавляются все их программы
+            max_programs: Наибольшее число программ (None - без ограничения)
+            
+        Returns:
+            dict: programs - поля выдачи recommend_programs() и scored_exams
+            (как в calculate_score()) для каждой найденной программы в порядке
+            запроса, без повторов; not_found - коды программ, которых нет в каталоге
+            
+        Raises:
+            ValueError: если найдено больше max_programs программ (проверяется до расчета)
+        """
+        program_codes = list(program_codes or [])
+        found = self.programs.find(program_codes)
+        rows = np.concatenate([found[found >= 0]] + [
+            self.programs.university_programs(code) for code in university_codes or []
+        ])
+        _, first = np.unique(rows, return_index=True)
+        rows = rows[np.sort(first)]
+        if max_programs is not None and len(rows) > max_programs:
+            raise ValueError(f"Программ для сравнения {len(rows)}, допустимо {max_programs}")
+        
+        with REGISTRY.stage('score'):
+            scored = self.score_programs(rows, exam_scores)
+        with REGISTRY.stage('build'):
+            programs = self._build_results(rows, scored, exam_scores, range(len(rows)))
+            resolved_scores = self.subjects.resolve_scores(exam_scores)
+            for k, program in enumerate(programs):
+                program['scored_exams'] = self._scored_exams(int(rows[k]), int(scored['best_elective'][k]),
+                                                             resolved_scores)
+        
+        return {
+            'programs': programs,
+            'not_found': [code for code, row in zip(program_codes, found.tolist()) if row < 0]
+        }
+    
+    def _scored_exams(self, row: int, best_elective: int, resolved_scores: Dict[int, float]) -> List[Dict]:
+        """Вклад экзаменов в конкурсный балл программы: обязательные слоты и лучший выборочный"""
+        slots = [(self.mandatory_ids, self.mandatory_names, self.mandatory_coefs, j)
+                 for j in range(self.mandatory_ids.shape[1]) if self.mandatory_ids[row, j] >= 0]
+        if best_elective >= 0:
+            slots.append((self.elective_ids, self.elective_names, self.elective_coefs, best_elective))
+        
+        scored_exams = []
+        for ids, names, coefs, j in slots:
+            raw_score = resolved_scores.get(int(ids[row, j]), 0.0)
+            scaled_score = self._convert_to_scaled_score(raw_score)
+            coefficient = float(coefs[row, j])
+            scored_exams.append({
+                'name': names[row, j],
+                'raw': raw_score,
+                'scaled': round(scaled_score, 2),
+                'coefficient': coefficient,
+                'contribution': round(scaled_score * coefficient, 2)
+            })
+        return scored_exams
+    
+    def what_do_i_need(self,
+                       city: str,
+                       uni_type: str,
+                       category: str,
+                       teaching_language: str,
+                       exam_scores: Dict[str, float],
+                       target_compatibility: float,
+                       program_codes: List[int] = None,
+                       top_n: int = 20) -> List[Dict]:
+        """
+        Какие баллы нужны для программ: заданных кодами или top_n лучших по фильтрам
+        
+        Returns:
+            Результат required_scores() для выбранных программ
+        """
+        with REGISTRY.stage('filter'):
+            rows = self.filter_rows(city, uni_type, category, teaching_language)
+        
+        if program_codes:
+            rows = np.intersect1d(rows, self.rows_for_codes(program_codes))
+        elif len(rows) > 0:
+            scored = self.score_programs(rows, exam_scores)
+            order, _ = self._select_top(rows, scored['competitive_score'], top_n)
+            rows = rows[order]
+        
+        with REGISTRY.stage('solve'):
+            return self.required_scores(rows, exam_scores, target_compatibility)
+    
+    def required_scores(self,
+                        rows: np.ndarray,
+                        exam_scores: Dict[str, float],
+                        target_compatibility: float,
+                        chunk_size: int = 256) -> List[Dict]:
+        """
+        Обратная задача: какие сырые баллы нужны, чтобы пройти на программы
+        
+        Для каждой программы считается:
+        - minimums: какие обязательные экзамены не проходят порог и сколько нужно
+          (ровно значение порога);
+        - options: для каждого предмета программы - минимальный сырой балл (целый
+          или текущий), который при пройденных порогах и прочих баллах без
+          изменений дает совместимость не ниже target_compatibility; варианты
+          упорядочены по требуемой прибавке.
+        
+        Расчет повторяет формулу calculate_score(), включая выбор лучшего
+        выборочного экзамена. Из-за этого выбора совместимость не всегда растет
+        с баллом (более "тяжелый" выборочный экзамен может стать лучшим и снизить
+        процент), поэтому перебираются все целые баллы 0-100 сразу для всех
+        программ блока и всех их предметов, а не ищется граница бинарным поиском.
+        
+        Args:
+            rows: Позиции программ в self.programs
+            exam_scores: Баллы абитуриента {exam_name: score_percentage}
+            target_compatibility: Целевая совместимость в процентах
+            chunk_size: Сколько программ считать за раз (ограничивает память)
+            
+        Returns:
+            Список dict в порядке rows: program_code, program_name, university_code,
+            текущие compatibility/competitive_score/chance_level, minimums, reached
+            (цель достигнута после прохождения порогов), options
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        if len(rows) == 0:
+            return []
+        
+        scores = self.subjects.score_vector(exam_scores)
+        scored = self.score_programs(rows, exam_scores)
+        results = []
+        
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            required, slot_ids, slot_names, reached_now = self._solve_chunk(
+                chunk, scores, target_compatibility
+            )
+            
+            for i, row in enumerate(chunk):
+                k = start + i
+                program = self.programs[row]
+                
+                minimums = []
+                for j in np.flatnonzero(scored['failed'][k]):
+                    minimums.append({
+                        'exam': self.mandatory_names[row, j],
+                        'subject': self.subjects.names[self.mandatory_ids[row, j]],
+                        'current': float(np.clip(scores[self.mandatory_ids[row, j]], 0.0, 100.0)),
+                        'required': float(self.mandatory_mins[row, j])
+                    })
+                
+                options = []
+                if not reached_now[i]:
+                    for u in np.flatnonzero(~np.isnan(required[i])):
+                        options.append({
+                            'exam': slot_names[i, u],
+                            'subject': self.subjects.names[slot_ids[i, u]],
+                            'current': float(np.clip(scores[slot_ids[i, u]], 0.0, 100.0)),
+                            'required': float(required[i, u])
+                        })
+                    options.sort(key=lambda option: option['required'] - option['current'])
+                
+                results.append({
+                    'program_code': program.program_code,
+                    'program_name': program.program_name,
+                    'university_code': program.university_code,
+                    'competitive_score': float(scored['competitive_score'][k]),
+                    'compatibility': round(float(scored['compatibility'][k]), 1),
+                    'chance_level': str(scored['chance_level'][k]),
+                    'minimums': minimums,
+                    'reached': bool(reached_now[i]),
+                    'options': options
+                })
+        
+        return results
+    
+    def _solve_chunk(self, rows: np.ndarray, scores: np.ndarray, target_compatibility: float):
+        """
+        Перебор целых баллов 0-100 по каждому предмету блока программ
+        
+        Считаются только пары (программа, предмет), где предмет есть в программе
+        (обычно около четверти из программы × 10 слотов). Оси массивов: пары (N) ×
+        выборочный слот k (6) × значение балла g (101).
+        
+        Returns:
+            required (P×10, NaN - цель этим предметом недостижима, слот пуст или предмет
+            повторяется), slot_ids, slot_names, reached_now (цель достигнута уже после
+            прохождения порогов)
+        """
+        mandatory_ids = self.mandatory_ids[rows]
+        elective_ids = self.elective_ids[rows]
+        n_mandatory = mandatory_ids.shape[1]
+        
+        slot_ids = np.concatenate([mandatory_ids, elective_ids], axis=1)
+        slot_names = np.concatenate([self.mandatory_names[rows], self.elective_names[rows]], axis=1)
+        required = np.full(slot_ids.shape, np.nan)
+        
+        # Балл каждого предмета после подъема до порогов обязательных экзаменов
+        raw = np.clip(scores[slot_ids], 0.0, 100.0)
+        same_mandatory = (slot_ids[:, :, np.newaxis] == mandatory_ids[:, np.newaxis, :]) & (mandatory_ids >= 0)[:, np.newaxis, :]
+        threshold = np.max(np.where(same_mandatory, self.mandatory_mins[rows][:, np.newaxis, :], 0.0), axis=-1)
+        cleared = np.where(slot_ids >= 0, np.maximum(raw, np.minimum(threshold, 100.0)), 0.0)
+        
+        # Пары-кандидаты: каждый предмет программы один раз
+        n_slots = slot_ids.shape[1]
+        earlier = np.tril(np.ones((n_slots, n_slots), dtype=bool), k=-1)
+        repeated = ((slot_ids[:, :, np.newaxis] == slot_ids[:, np.newaxis, :]) & earlier).any(axis=-1)
+        pair_program, pair_slot = np.nonzero((slot_ids >= 0) & ~repeated)
+        
+        # Значения балла: g = 0..100, но не ниже текущего (после порогов)
+        x = np.maximum(cleared[pair_program, pair_slot][:, np.newaxis], np.arange(101, dtype=np.float64))
+        
+        # Обязательная часть: суммируем по слотам в том же порядке, что и calculate_score()
+        mandatory_coefs = self.mandatory_coefs[rows][pair_program]
+        mandatory_present = mandatory_ids[pair_program] >= 0
+        mandatory_cleared = cleared[pair_program, :n_mandatory]
+        same = same_mandatory[pair_program, pair_slot]
+        competitive_score = np.zeros(x.shape, dtype=np.float64)
+        total_coefficients = np.zeros(len(pair_program), dtype=np.float64)
+        for j in range(n_mandatory):
+            mandatory_raw = np.where(same[:, j, np.newaxis], x, mandatory_cleared[:, j, np.newaxis])
+            contribution = (mandatory_raw + 100.0) * mandatory_coefs[:, j, np.newaxis]
+            competitive_score += np.where(mandatory_present[:, j, np.newaxis], contribution, 0.0)
+            total_coefficients += np.where(mandatory_present[:, j], mandatory_coefs[:, j], 0.0)
+        
+        # Выборочная часть: лучший по округленному вкладу среди прошедших минимум
+        pair_elective_ids = elective_ids[pair_program]
+        same_elective = (pair_elective_ids == slot_ids[pair_program, pair_slot][:, np.newaxis]) & (pair_elective_ids >= 0)
+        elective_raw = np.where(same_elective[:, :, np.newaxis], x[:, np.newaxis, :],
+                                cleared[pair_program, n_mandatory:][:, :, np.newaxis])
+        eligible = (pair_elective_ids >= 0)[:, :, np.newaxis] & (elective_raw >= self.elective_mins[rows][pair_program][:, :, np.newaxis])
+        coefs = np.broadcast_to(self.elective_coefs[rows][pair_program][:, :, np.newaxis], elective_raw.shape)
+        contrib = self._round_like_python(((elective_raw + 100.0) * coefs).ravel(), 2).reshape(elective_raw.shape)
+        contrib = np.where(eligible, contrib, -np.inf)
+        best = np.argmax(contrib, axis=1)[:, np.newaxis, :]
+        has_elective = eligible.any(axis=1)
+        competitive_score += np.where(has_elective, np.take_along_axis(contrib, best, axis=1)[:, 0, :], 0.0)
+        coefficients = total_coefficients[:, np.newaxis] + np.where(
+            has_elective, np.take_along_axis(coefs, best, axis=1)[:, 0, :], 0.0
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            compatibility = np.where(coefficients > 0, (competitive_score / (200.0 * coefficients)) * 100.0, 0.0)
+        reached = compatibility >= target_compatibility
+        
+        first = np.argmax(reached, axis=-1)
+        required[pair_program, pair_slot] = np.where(
+            reached.any(axis=-1), np.take_along_axis(x, first[:, np.newaxis], axis=-1)[:, 0], np.nan
+        )
+        reached_now = np.zeros(len(rows), dtype=bool)
+        reached_now[pair_program[reached[:, 0]]] = True
+        return required, slot_ids, slot_names, reached_now
+    
     def recommend_programs(self,
                           city: str,
                           uni_type: str,
                           category: str,
                           teaching_language: str,
                           exam_scores: Dict[str, float],
-                          top_n: int = 20) -> List[Dict]:
+                          top_n: int = 20,
+                          query: str = None) -> List[Dict]:
         """
         Главная функция рекомендации программ
         
@@ -377,51 +945,333 @@ class UniversityRecommendationSystem:
             teaching_language: Язык обучения
             exam_scores: Баллы по экзаменам {exam_name: score_0_to_100}
             top_n: Количество рекомендаций
+            query: Поиск по названию (только программы, подходящие под запрос)
             
         Returns:
             Список рекомендованных программ с оценками
         """
+        page = self.recommend_page(city, uni_type, category, teaching_language, exam_scores, top_n, query=query)
+        return page['recommendations']
+    
+    def recommend_page(self,
+                       city: str,
+                       uni_type: str,
+                       category: str,
+                       teaching_language: str,
+                       exam_scores: Dict[str, float],
+                       top_n: int = 20,
+                       cursor: str = None,
+                       as_json: bool = False,
+                       query: str = None) -> Dict:
+        """
+        Страница рекомендаций с курсором для "следующих N"
+        
+        Курсор хранит версию данных, конкурсный балл и позицию последней выданной
+        программы, поэтому следующая страница продолжает тот же порядок. Рассчитанные баллы
+        последних запросов кэшируются, и переход по страницам не пересчитывает каталог.
+        
+        Args:
+            cursor: next_cursor предыдущей страницы или None для первой
+            as_json: Вернуть recommendations готовым JSON-массивом (bytes) из
+                заранее сериализованных фрагментов программ
+            query: Поиск по названию (только программы, подходящие под запрос)
+            
+        Returns:
+            dict с recommendations, total_found и next_cursor (None, если программ больше нет)
+            
+        Raises:
+            ValueError: если курсор поврежден или выдан для другой версии данных
+        """
+        after = self._decode_cursor(cursor) if cursor else None
+        
         # Фильтруем программы
-        filtered = self.filter_programs(city, uni_type, category, teaching_language)
+        with REGISTRY.stage('filter'):
+            rows = self.filter_rows(city, uni_type, category, teaching_language, query)
+        REGISTRY.inc('programs_filtered', len(rows))
         
-        if len(filtered) == 0:
-            return []
+        if len(rows) == 0:
+            return {'recommendations': b'[]' if as_json else [], 'total_found': 0, 'next_cursor': None}
         
-        # Рассчитываем баллы для каждой программы
-        results = []
+        # Рассчитываем баллы сразу для всех программ (или берем из кэша страниц)
+        key = (city, uni_type, category, teaching_language, query, self.subjects.score_vector(exam_scores).tobytes())
+        key = tuple(tuple(value) if isinstance(value, list) else value for value in key)
+        scored = self._scored_cache.get(self.data_version, key)
+        if scored is None:
+            with REGISTRY.stage('score'):
+                scored = self.score_programs(rows, exam_scores)
+            REGISTRY.inc('programs_scored', len(rows))
+            self._scored_cache.put(self.data_version, key, scored)
+        else:
+            REGISTRY.inc('scored_cache_hits')
+        
+        with REGISTRY.stage('select'):
+            order, has_more = self._select_top(rows, scored['competitive_score'], top_n, after)
+        with REGISTRY.stage('build'):
+            build = self._render_results if as_json else self._build_results
+            recommendations = build(rows, scored, exam_scores, order)
+        
+        # Пустая страница при has_more возможна, только если баллы не сравнимы (NaN)
+        next_cursor = None
+        if has_more and len(order) > 0:
+            last = order[-1]
+            next_cursor = self._encode_cursor(scored['competitive_score'][last], rows[last])
+        
+        return {'recommendations': recommendations, 'total_found': len(order), 'next_cursor': next_cursor}
+    
+    def _encode_cursor(self, competitive_score: float, row: int) -> str:
+        """Курсор страницы: версия данных, балл и позиция последней программы"""
+        raw = f"{self.data_version}:{float(competitive_score)!r}:{int(row)}".encode()
+        return base64.urlsafe_b64encode(raw).decode()
+    
+    def _decode_cursor(self, cursor: str) -> Tuple[float, int]:
+        """Разбирает курсор страницы"""
+        if not isinstance(cursor, str):
+            raise ValueError(f"Некорректный курсор: {cursor!r}")
+        try:
+            version, score, row = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+            after = float(score), int(row)
+        except (ValueError, UnicodeError) as e:
+            raise ValueError(f"Некорректный курсор: {cursor}") from e
+        if version != self.data_version:
+            raise ValueError(f"Курсор выдан для версии данных {version}, текущая {self.data_version}")
+        return after
+    
+    @staticmethod
+    def _select_top(rows: np.ndarray,
+                    scores: np.ndarray,
+                    top_n: int,
+                    after: Tuple[float, int] = None) -> Tuple[np.ndarray, bool]:
+        """
+        Частичный выбор top_n программ по конкурсному баллу без полной сортировки
+        
+        Порядок тот же, что у стабильной сортировки по убыванию балла: при
+        равенстве выше программа, стоящая раньше в базе.
+        
+        Args:
+            rows: Позиции программ в self.programs
+            scores: Конкурсные баллы для rows
+            top_n: Размер страницы
+            after: (балл, позиция) последней программы предыдущей страницы
+            
+        Returns:
+            (индексы в rows в порядке выдачи, есть ли программы после страницы)
+        """
+        if after is None:
+            candidates = np.arange(len(rows))
+        else:
+            after_score, after_row = after
+            candidates = np.flatnonzero(
+                (scores < after_score) | ((scores == after_score) & (rows > after_row))
+            )
+        
+        has_more = len(candidates) > top_n
+        keys = scores[candidates]
+        if has_more:
+            # Порог - top_n-й по величине балл; все равные ему тоже кандидаты
+            threshold = np.partition(keys, len(keys) - top_n)[len(keys) - top_n]
+            candidates = candidates[keys >= threshold]
+            keys = scores[candidates]
+        
+        order = candidates[np.argsort(-keys, kind='stable')]
+        return order[:top_n], has_more
+    
+    def recommend_programs_batch(self,
+                                 city,
+                                 uni_type,
+                                 category,
+                                 teaching_language,
+                                 exam_scores_list: List[Dict[str, float]],
+                                 top_n: int = 20,
+                                 chunk_size: int = 256,
+                                 as_json: bool = False) -> Iterator[List[Dict]]:
+        """
+        Рекомендации для группы абитуриентов с одинаковыми фильтрами
+        
+        Фильтрация выполняется один раз на группу, баллы считаются матрицей
+        по chunk_size абитуриентов, поэтому память ограничена размером блока.
+        
+        Yields:
+            Список рекомендаций для каждого абитуриента в порядке exam_scores_list
+            (с as_json - пара (JSON-массив bytes, число рекомендаций))
+        """
+        build = self._render_results if as_json else self._build_results
+        
+        with REGISTRY.stage('filter'):
+            rows = self.filter_rows(city, uni_type, category, teaching_language)
+        REGISTRY.inc('programs_filtered', len(rows))
         
-        for idx, program in filtered.iterrows():
-            score_data = self.calculate_score(program, exam_scores)
+        for start in range(0, len(exam_scores_list), chunk_size):
+            chunk = exam_scores_list[start:start + chunk_size]
             
-            # Получаем стоимость (бесплатно для государственных в 2026)
-            if program['uni_type'] == 'სახელმწიფო':
-                cost_display = "უფასო"
-            else:
-                cost_display = f"{int(program['annual_tuition'])} ლარი"
+            if len(rows) == 0:
+                for _ in chunk:
+                    yield (b'[]', 0) if as_json else []
+                continue
             
-            result = {
-                'program_code': int(program['program_code']),
-                'program_name': program['program_name'],
-                'university_code': int(program['university_code']),
-                'city': program['city'],
-                'uni_type': program['uni_type'],
-                'tuition': float(program['annual_tuition']),
-                'cost_display': cost_display,
-                'places': int(program['total_places']) if pd.notna(program['total_places']) else 0,
-                'teaching_language': program['teaching_language'],
-                'credits': int(program['credits']) if pd.notna(program['credits']) else 240,
-                'compatibility': score_data['compatibility'],
-                'competitive_score': score_data['competitive_score'],
-                'admission_chance': score_data['admission_chance'],
-                'chance_level': score_data['chance_level'],
-                'failed_minimums': score_data['failed_minimums'],
-                'accreditation': program.get('accreditation_status', ''),
-                'special_note': program.get('special_note', '')
-            }
+            with REGISTRY.stage('score_batch'):
+                scores = np.stack([self.subjects.score_vector(exam_scores) for exam_scores in chunk])
+                scored = self.score_matrix(rows, scores)
+            REGISTRY.inc('programs_scored', len(rows) * len(chunk))
             
-            results.append(result)
+            for i, exam_scores in enumerate(chunk):
+                student_scored = {key: value[i] for key, value in scored.items()}
+                with REGISTRY.stage('select'):
+                    order, _ = self._select_top(rows, student_scored['competitive_score'], top_n)
+                with REGISTRY.stage('build'):
+                    results = build(rows, student_scored, exam_scores, order)
+                yield (results, len(order)) if as_json else results
+    
+    @staticmethod
+    def _cost_display(uni_type: str, annual_tuition: float) -> Optional[str]:
+        """Стоимость для выдачи (бесплатно для государственных в 2026; None, если не указана)"""
+        if uni_type == 'სახელმწიფო':
+            return "უფასო"
+        if math.isnan(annual_tuition):
+            return None
+        return f"{int(annual_tuition)} ლარი"
+    
+    def _static_fields(self, program: Program) -> Dict:
+        """Поля выдачи, не зависящие от баллов абитуриента"""
+        return {
+            key: self._cost_display(program.uni_type, program.annual_tuition) if column is None
+            else getattr(program, column)
+            for key, column in self.STATIC_FIELDS
+        }
+    
+    def _build_fragments(self):
+        """
+        Готовые JSON-фрагменты статических полей каждой программы
+        
+        Фрагмент - начало объекта выдачи без закрывающей скобки: '{"program_code":...,'.
+        Ответ собирается склейкой фрагмента с полями абитуриента (_render_results),
+        поэтому стоимость сериализации не растет с числом статических полей.
+        Фрагменты собираются по колонкам: каждое уникальное строковое значение
+        сериализуется один раз.
+        """
+        programs = self.programs
+        encode = self.JSON_ENCODER.encode
+        uni_types = programs.values['uni_type'] + [float('nan')]
+        prefixes = [encode(key) + ':' for key, _ in self.STATIC_FIELDS]
+        lookups = {
+            column: np.array([prefix + encode(value) for value in programs.values[column]] + [prefix + 'NaN'],
+                             dtype=object)
+            for prefix, (_, column) in zip(prefixes, self.STATIC_FIELDS) if column in programs.codes
+        }
+        
+        # Колонки собираются блоками строк: списки значений всех программ сразу не нужны
+        def parts() -> Iterator[bytes]:
+            for start in range(0, len(programs), self.FRAGMENT_BLOCK_ROWS):
+                block = slice(start, start + self.FRAGMENT_BLOCK_ROWS)
+                columns = []
+                for prefix, (_, column) in zip(prefixes, self.STATIC_FIELDS):
+                    if column is None:
+                        costs = [
+                            self._cost_display(uni_types[code], tuition)
+                            for code, tuition in zip(programs.codes['uni_type'][block].tolist(),
+                                                     programs.annual_tuition[block].tolist())
+                        ]
+                        encoded = {cost: prefix + encode(cost) for cost in set(costs)}
+                        values = [encoded[cost] for cost in costs]
+                    elif column in lookups:
+                        values = lookups[column][programs.codes[column][block]].tolist()
+                    elif getattr(programs, column).dtype.kind == 'i':
+                        # Целые числа повторяются: каждое сериализуется один раз
+                        numbers, inverse = np.unique(getattr(programs, column)[block], return_inverse=True)
+                        encoded = np.array([prefix + str(number) for number in numbers.tolist()], dtype=object)
+                        values = encoded[inverse].tolist()
+                    else:
+                        values = [prefix + self._json_number(value) for value in getattr(programs, column)[block].tolist()]
+                    columns.append(values)
+                for fields in zip(*columns):
+                    yield ('{' + ','.join(fields) + ',').encode()
+        
+        self.fragments = Fragments.encode(parts())
+    
+    def _failed_minimums(self, row: int, failed: np.ndarray, resolved_scores: Dict[int, float]) -> List[str]:
+        """Тексты о непройденных минимумах обязательных экзаменов программы"""
+        failed_minimums = []
+        for j in np.flatnonzero(failed):
+            exam_name = self.mandatory_names[row, j]
+            raw_score = resolved_scores.get(int(self.mandatory_ids[row, j]), 0.0)
+            minimum = float(self.mandatory_mins[row, j])
+            failed_minimums.append(f"{exam_name} ({raw_score}% < {minimum}%)")
+        return failed_minimums
+    
+    def _student_fields(self,
+                        row: int,
+                        k: int,
+                        scored: Dict[str, np.ndarray],
+                        resolved_scores: Dict[int, float]) -> Dict:
+        """Поля выдачи, зависящие от баллов абитуриента (k - индекс программы в scored)"""
+        chance_level = str(scored['chance_level'][k])
+        fields = {
+            'compatibility': round(float(scored['compatibility'][k]), 1),
+            'competitive_score': float(scored['competitive_score'][k]),
+            'admission_chance': self.CHANCE_LABELS[chance_level],
+            'chance_level': chance_level,
+            'failed_minimums': self._failed_minimums(row, scored['failed'][k], resolved_scores)
+        }
+        
+        # Реалистичный шанс по местам и проходным баллам симуляции
+        if self.cutoffs is not None:
+            fields['admission_probability'], fields['estimated_cutoff'] = self.cutoffs.estimate(
+                row, int(scored['best_elective'][k]), fields['competitive_score'], chance_level == 'failed'
+            )
+        
+        return fields
+    
+    def _build_results(self,
+                       rows: np.ndarray,
+                       scored: Dict[str, np.ndarray],
+                       exam_scores: Dict[str, float],
+                       order: np.ndarray) -> List[Dict]:
+        """Собирает выдачу только для отобранных программ (индексы order в rows)"""
+        resolved_scores = self.subjects.resolve_scores(exam_scores)
+        return [
+            {**self._static_fields(self.programs[rows[k]]),
+             **self._student_fields(int(rows[k]), k, scored, resolved_scores)}
+            for k in order
+        ]
+    
+    def _json_number(self, value: float) -> str:
+        """Число в JSON так же, как его пишет json (NaN/Infinity для нечисловых)"""
+        return repr(value) if math.isfinite(value) else self.JSON_ENCODER.encode(value)
+    
+    def _render_results(self,
+                        rows: np.ndarray,
+                        scored: Dict[str, np.ndarray],
+                        exam_scores: Dict[str, float],
+                        order: np.ndarray) -> bytes:
+        """
+        То же, что _build_results(), но сразу JSON-массивом (bytes)
         
-        # Сортируем по конкурсному баллу (DESC)
-        results.sort(key=lambda x: x['competitive_score'], reverse=True)
+        Каждый объект - готовый фрагмент программы и поля абитуриента, которые
+        пишутся по фиксированной схеме _student_fields(): кодировщик JSON
+        вызывается только для текстов о минимумах и оценок по проходным баллам.
+        """
+        resolved_scores = self.subjects.resolve_scores(exam_scores)
+        encode = self.JSON_ENCODER.encode
+        compatibility = scored['compatibility'][order].tolist()
+        competitive_score = scored['competitive_score'][order].tolist()
+        chance_level = scored['chance_level'][order].tolist()
+        has_failed = scored['failed'][order].any(axis=1).tolist()
         
-        return results[:top_n]
+        parts = []
+        for i, k in enumerate(order):
+            row = int(rows[k])
+            failed_minimums = '[]'
+            if has_failed[i]:
+                failed_minimums = encode(self._failed_minimums(row, scored['failed'][k], resolved_scores))
+            student = (f'"compatibility":{self._json_number(round(compatibility[i], 1))},'
+                       f'"competitive_score":{self._json_number(competitive_score[i])},'
+                       f'{self._chance_json[chance_level[i]]},'
+                       f'"failed_minimums":{failed_minimums}')
+            
+            if self.cutoffs is not None:
+                estimate = self.cutoffs.estimate(
+                    row, int(scored['best_elective'][k]), competitive_score[i], chance_level[i] == 'failed'
+                )
+                student += f',"admission_probability":{encode(estimate[0])},"estimated_cutoff":{encode(estimate[1])}'
+            
+            parts.append(self.fragments[row] + student.encode() + b'}')
+        return b'[' + b','.join(parts) + b']'
@@ -0,0 +1,230 @@
+"""
+Кэш результатов рекомендаций
+LRU в памяти воркера с ограничением по числу записей и объему, опционально
+с общим для всех воркеров хранилищем на локальном диске (SQLite)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class SharedResultStore:
+    """
+    Общее для воркеров хранилище готовых ответов в файле SQLite
+
+    Ключи - строки, значения - байты. При превышении max_entries удаляются
+    записи, которые дольше всех не использовались.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, version TEXT, value BLOB, used REAL)'
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Отдельное соединение на поток и процесс
+
+        Соединение, открытое до fork (gunicorn --preload), в воркере не используется:
+        SQLite не разрешает делить соединение между процессами.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            connection = self._connection()
+            row = connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                connection.execute('UPDATE results SET used = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def put(self, key: str, version: str, value: bytes):
+        try:
+            connection = self._connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO results (key, version, value, used) VALUES (?, ?, ?, ?)',
+                (key, version, value, time.time())
+            )
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                connection.execute(
+                    'DELETE FROM results WHERE key IN ('
+                    'SELECT key FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+        except sqlite3.Error:
+            pass
+
+    def purge(self, version: str):
+        """Удаляет записи версии данных version"""
+        try:
+            self._connection().execute('DELETE FROM results WHERE version = ?', (version,))
+        except sqlite3.Error:
+            pass
+
+    def purge_except(self, version: str):
+        """Удаляет записи всех версий данных, кроме version"""
+        try:
+            self._connection().execute('DELETE FROM results WHERE version != ?', (version,))
+        except sqlite3.Error:
+            pass
+
+
+class ResultCache:
+    """
+    LRU-кэш с ограничением по числу записей и суммарному размеру значений
+
+    Записи привязаны к текущей версии данных (set_version). При смене версии
+    записи прежней удаляются, в том числе из общего хранилища, а запросы,
+    которые еще дорабатывают на старой версии, кэш не используют.
+
+    Если процесс обслуживает несколько каталогов, актуальных версий несколько
+    (add_version/drop_version): записи всех версий делят общий лимит, и
+    вытесняются давно не использованные независимо от каталога.
+    """
+
+    def __init__(self,
+                 max_entries: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 shared: SharedResultStore = None):
+        """
+        Args:
+            max_entries: Максимальное число записей
+            max_bytes: Максимальный суммарный размер значений в байтах
+            shared: Общее хранилище для всех воркеров (только для значений-байтов)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.versions = set()
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(value) -> int:
+        """Размер значения: длина байтов или сумма nbytes массивов в dict"""
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if isinstance(value, dict):
+            return sum(getattr(item, 'nbytes', 64) for item in value.values())
+        return 64
+
+    def set_version(self, version: str):
+        """Переключает кэш на новую версию данных и сбрасывает записи прежней"""
+        with self._lock:
+            if self.versions == {version}:
+                return
+            self.evictions += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self.versions = {version}
+        if self.shared is not None:
+            self.shared.purge_except(version)
+
+    def add_version(self, version: str, replaces: Optional[str] = None):
+        """Добавляет актуальную версию данных (каталога); версия replaces при этом сбрасывается"""
+        with self._lock:
+            self.versions = self.versions | {version}
+        if replaces is not None and replaces != version:
+            self.drop_version(replaces)
+
+    def drop_version(self, version: str):
+        """Сбрасывает записи версии данных (перезагруженного или вытесненного каталога)"""
+        with self._lock:
+            if version not in self.versions:
+                return
+            self.versions = self.versions - {version}
+            for entry in [entry for entry in self._entries if entry[0] == version]:
+                self._bytes -= self._size(self._entries.pop(entry))
+                self.evictions += 1
+        if self.shared is not None:
+            self.shared.purge(version)
+
+    def get(self, version: str, key: Hashable):
+        """Возвращает значение или None"""
+        if version not in self.versions:
+            return None
+
+        with self._lock:
+            value = self._entries.get((version, key))
+            if value is not None:
+                self._entries.move_to_end((version, key))
+                self.hits += 1
+                return value
+
+        if self.shared is not None:
+            value = self.shared.get(self._shared_key(version, key))
+            if value is not None:
+                self.shared_hits += 1
+                self._store(version, key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, version: str, key: Hashable, value):
+        """Сохраняет значение, вытесняя давно не использованные записи"""
+        if not self._store(version, key, value):
+            return
+        if self.shared is not None and isinstance(value, (bytes, bytearray)):
+            self.shared.put(self._shared_key(version, key), version, bytes(value))
+
+    def _store(self, version: str, key: Hashable, value) -> bool:
+        size = self._size(value)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if version not in self.versions:
+                return False
+            previous = self._entries.pop((version, key), None)
+            if previous is not None:
+                self._bytes -= self._size(previous)
+            self._entries[version, key] = value
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+                self.evictions += 1
+        return True
+
+    @staticmethod
+    def _shared_key(version: str, key: Hashable) -> str:
+        return f"{version}:{key!r}"
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики кэша"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,263 @@
+"""
+Поиск программ по названию и автодополнение
+Индекс слов названий программ, квалификаций и университетов строится один раз при
+загрузке базы; запрос сводится к поиску по словарю и объединению готовых списков строк
+"""
+
+import bisect
+import re
+import unicodedata
+from functools import reduce
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Окончания падежей и множественного числа, которые отбрасываются у слов запроса:
+# "ბიზნესი" ищет "ბიზნეს...", "მედიცინა" - "მედიცინ..." (как ключевые слова категорий)
+GEORGIAN_ENDINGS = ('ებისა', 'ების', 'ებით', 'ებში', 'ებს', 'ები',
+                    'ისა', 'ის', 'ით', 'ად', 'ში', 'ზე', 'თან', 'მა', 'ს', 'ი', 'ა', 'ე', 'ო')
+
+# Минимальная длина основы после отбрасывания окончания
+MIN_STEM = 4
+
+# Длина n-грамм словаря для поиска внутри слов (сложные слова: "სამართალმცოდნეობა")
+GRAM = 3
+
+# Ограничения запроса
+MAX_QUERY_LENGTH = 100
+MAX_QUERY_TOKENS = 8
+
+# Виды подсказок
+PROGRAM, UNIVERSITY = 0, 1
+KINDS = ('program', 'university')
+
+_TOKEN = re.compile(r'\w+')
+
+
+def normalize(text: str) -> str:
+    """
+    Приводит текст к виду словаря индекса
+
+    NFC, нижний регистр (в том числе Мтаврули → Мхедрули: "ᲡᲐᲛᲐᲠᲗᲐᲚᲘ" → "სამართალი")
+    """
+    return unicodedata.normalize('NFC', str(text)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова текста (буквы и цифры любых алфавитов), в нижнем регистре"""
+    return _TOKEN.findall(normalize(text))
+
+
+def stem(token: str) -> str:
+    """Основа слова запроса: без падежного окончания, если остается не меньше MIN_STEM букв"""
+    for ending in GEORGIAN_ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM:
+            return token[:-len(ending)]
+    return token
+
+
+def _grams(word: str) -> List[str]:
+    return [word[i:i + GRAM] for i in range(len(word) - GRAM + 1)]
+
+
+def _csr(arrays: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Массивы int32 в виде (offsets, values): i-й массив - values[offsets[i]:offsets[i + 1]]"""
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in arrays], out=offsets[1:])
+    values = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int32)
+    return offsets, values.astype(np.int32, copy=False)
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс слов с n-граммами словаря
+
+    Документ - строка программы: ее название, квалификация и название
+    университета. Слово запроса совпадает со словом словаря, если содержит его
+    основу (stem); поиск по словарю идет через n-граммы, а короткие слова
+    ищутся как префиксы по отсортированному словарю. Строки программ для
+    каждого слова и слова/строки подсказок хранятся массивами (offsets, values),
+    поэтому в снимке они общие для воркеров.
+
+    Подсказки - уникальные названия программ и университеты каталога.
+    """
+
+    def __init__(self,
+                 program_names: Sequence,
+                 qualifications: Sequence,
+                 university_codes: Sequence[int],
+                 universities: Dict[int, Dict]):
+        """
+        Args:
+            program_names, qualifications, university_codes: Колонки каталога (пустые значения - NaN)
+            universities: Справочник universities_info.UNIVERSITIES (name, name_short)
+        """
+        university_codes = [int(code) for code in university_codes]
+        self.n_rows = len(university_codes)
+
+        # Слова каждого университета из справочника
+        university_text = {
+            code: ' '.join(str(info.get(key, '')) for key in ('name', 'name_short'))
+            for code, info in universities.items()
+        }
+
+        # Названия и квалификации в каталоге повторяются: строки группируются по
+        # одинаковым документам, и каждый текст разбирается один раз
+        program_names = [name if isinstance(name, str) else None for name in program_names]
+        qualifications = [value if isinstance(value, str) else None for value in qualifications]
+        documents: Dict[Tuple[Optional[str], Optional[str], int], List[int]] = {}
+        for row, document in enumerate(zip(program_names, qualifications, university_codes)):
+            documents.setdefault(document, []).append(row)
+
+        token_cache: Dict[Optional[str], frozenset] = {None: frozenset()}
+
+        def words_of(text: Optional[str]) -> frozenset:
+            words = token_cache.get(text)
+            if words is None:
+                words = token_cache[text] = frozenset(tokenize(text))
+            return words
+
+        postings: Dict[str, List[np.ndarray]] = {}
+        phrase_rows: Dict[Tuple[int, object], List[np.ndarray]] = {}
+        phrase_texts: Dict[Tuple[int, object], str] = {}
+        for (name, qualification, code), rows in documents.items():
+            rows = np.array(rows, dtype=np.int32)
+            for word in words_of(name) | words_of(qualification) | words_of(university_text.get(code)):
+                postings.setdefault(word, []).append(rows)
+
+            # Подсказки: названия программ (все строки с этим названием) и университеты каталога
+            if words_of(name):
+                key = PROGRAM, name.strip()
+                phrase_texts[key] = name.strip()
+                phrase_rows.setdefault(key, []).append(rows)
+            if words_of(university_text.get(code)):
+                key = UNIVERSITY, code
+                phrase_texts[key] = universities[code]['name']
+                phrase_rows.setdefault(key, []).append(rows)
+
+        self.words: List[str] = sorted(postings)
+        word_ids = {word: i for i, word in enumerate(self.words)}
+        self.word_offsets, self.word_rows = _csr([np.sort(np.concatenate(postings[word])) for word in self.words])
+
+        grams: Dict[str, List[int]] = {}
+        for i, word in enumerate(self.words):
+            for gram in set(_grams(word)):
+                grams.setdefault(gram, []).append(i)
+        self.gram_ids: Dict[str, int] = {gram: i for i, gram in enumerate(grams)}
+        self.gram_offsets, self.gram_words = _csr([np.array(words, dtype=np.int32) for words in grams.values()])
+
+        keys = list(phrase_rows)
+        self.phrase_texts: List[str] = [phrase_texts[key] for key in keys]
+        self.phrase_kinds = np.array([kind for kind, _ in keys], dtype=np.int8)
+        self.phrase_codes = np.array([value if kind == UNIVERSITY else -1 for kind, value in keys], dtype=np.int32)
+        self.phrase_offsets, self.phrase_rows = _csr([np.sort(np.concatenate(phrase_rows[key])) for key in keys])
+        self.phrase_word_offsets, self.phrase_words = _csr([
+            np.array(sorted(word_ids[word] for word in words_of(university_text[value] if kind == UNIVERSITY else value)),
+                     dtype=np.int32)
+            for kind, value in keys
+        ])
+
+    def _match_words(self, token: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Слова словаря, подходящие к слову запроса
+
+        Returns:
+            (id слов, качество совпадения): 3 - слово начинается со слова запроса,
+            2 - с его основы, 1 - основа внутри слова
+        """
+        base = stem(token)
+        if len(base) < GRAM:
+            start = bisect.bisect_left(self.words, base)
+            end = bisect.bisect_left(self.words, base + '\U0010ffff')
+            candidates = range(start, end)
+        else:
+            lists = []
+            for gram in set(_grams(base)):
+                gram_id = self.gram_ids.get(gram)
+                if gram_id is None:
+                    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8)
+                lists.append(self.gram_words[self.gram_offsets[gram_id]:self.gram_offsets[gram_id + 1]])
+            lists.sort(key=len)
+            candidates = reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), lists).tolist()
+
+        ids, quality = [], []
+        for i in candidates:
+            word = self.words[i]
+            if word.startswith(token):
+                level = 3
+            elif word.startswith(base):
+                level = 2
+            elif base in word:
+                level = 1
+            else:
+                continue
+            ids.append(i)
+            quality.append(level)
+        return np.array(ids, dtype=np.int64), np.array(quality, dtype=np.int8)
+
+    @staticmethod
+    def query_tokens(query: str) -> List[str]:
+        """Слова запроса с учетом ограничений длины"""
+        return tokenize(query[:MAX_QUERY_LENGTH])[:MAX_QUERY_TOKENS]
+
+    def search(self, query: str) -> Optional[np.ndarray]:
+        """
+        Строки программ, содержащие все слова запроса
+
+        Returns:
+            Отсортированный массив строк; запрос без слов (только пробелы и знаки
+            препинания) не находит ничего, как и в suggest()
+        """
+        tokens = self.query_tokens(query)
+        if not tokens:
+            return np.empty(0, dtype=np.int64)
+
+        matched = None
+        for token in tokens:
+            ids, _ = self._match_words(token)
+            mask = np.zeros(self.n_rows, dtype=bool)
+            for i in ids.tolist():
+                mask[self.word_rows[self.word_offsets[i]:self.word_offsets[i + 1]]] = True
+            matched = mask if matched is None else matched & mask
+        return np.flatnonzero(matched)
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Подсказки автодополнения: названия программ и университеты, в словах которых
+        есть все слова запроса
+
+        Порядок: качество совпадения слов (начало слова выше совпадения внутри),
+        затем число программ, затем более короткое название.
+        """
+        tokens = self.query_tokens(query)
+        if not tokens or not len(self.phrase_texts):
+            return []
+
+        starts = self.phrase_word_offsets[:-1]
+        total = np.zeros(len(self.phrase_texts), dtype=np.int64)
+        matched = np.ones(len(self.phrase_texts), dtype=bool)
+        for token in tokens:
+            ids, quality = self._match_words(token)
+            word_quality = np.zeros(len(self.words), dtype=np.int8)
+            word_quality[ids] = quality
+            # Лучшее совпадение слова запроса среди слов каждой фразы (0 - нет совпадения)
+            phrase_quality = np.maximum.reduceat(word_quality[self.phrase_words], starts)
+            total += phrase_quality
+            matched &= phrase_quality > 0
+
+        candidates = np.flatnonzero(matched)
+        counts = np.diff(self.phrase_offsets)
+        lengths = np.array([len(self.phrase_texts[i]) for i in candidates.tolist()], dtype=np.int64)
+        order = candidates[np.lexsort((lengths, -counts[candidates], -total[candidates]))][:limit]
+
+        suggestions = []
+        for i in order.tolist():
+            suggestion = {
+                'type': KINDS[self.phrase_kinds[i]],
+                'text': self.phrase_texts[i],
+                'programs': int(counts[i])
+            }
+            if self.phrase_kinds[i] == UNIVERSITY:
+                suggestion['university_code'] = int(self.phrase_codes[i])
+            suggestions.append(suggestion)
+        return suggestions
@@ -0,0 +1,181 @@
+"""
+Бинарный снимок подготовленной базы программ
+Ускоряет старт воркеров: CSV разбирается и готовится только при его изменении,
+а числовые массивы всех воркеров - это страницы одного файла в page cache
+"""
+
+import contextlib
+import hashlib
+import mmap
+import os
+import pickle
+import re
+import shutil
+import tempfile
+from typing import Iterator, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: без блокировки, снимок может собрать несколько процессов
+    fcntl = None
+
+# Увеличивайте при изменении набора или формата подготовленных данных
+SNAPSHOT_VERSION = 10
+
+# Выравнивание массивов в arrays.bin (байт)
+ARRAY_ALIGNMENT = 64
+
+
+class _ArrayPickler(pickle.Pickler):
+    """Pickler, выносящий числовые массивы NumPy (на любой глубине объектов) в отдельный файл"""
+
+    def __init__(self, file, arrays_file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays_file = arrays_file
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, np.ndarray) or obj.dtype.hasobject:
+            return None
+        data = np.ascontiguousarray(obj)
+        offset = -self.arrays_file.tell() % ARRAY_ALIGNMENT
+        self.arrays_file.write(b'\0' * offset)
+        offset = self.arrays_file.tell()
+        self.arrays_file.write(data.tobytes())
+        return offset, data.dtype.str, data.shape
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    """Восстанавливает вынесенные массивы как представления (только чтение) общего mmap"""
+
+    def __init__(self, file, buffer):
+        super().__init__(file)
+        self.buffer = buffer
+
+    def persistent_load(self, pid):
+        offset, dtype, shape = pid
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        if count == 0:
+            array = np.empty(shape, dtype=dtype)
+            array.flags.writeable = False
+            return array
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_path(database_path: str, snapshot_dir: str, content_hash: str = None) -> str:
+    """Каталог снимка: имя CSV + хэш содержимого + версия формата"""
+    content_hash = content_hash or file_hash(database_path)
+    name = os.path.splitext(os.path.basename(database_path))[0]
+    return os.path.join(snapshot_dir, f"{name}-{content_hash[:16]}-v{SNAPSHOT_VERSION}")
+
+
+@contextlib.contextmanager
+def build_lock(database_path: str, snapshot_dir: str) -> Iterator[None]:
+    """
+    Межпроцессная блокировка сборки снимка этого CSV
+
+    Когда CSV меняется, его замечают все воркеры сразу; под блокировкой данные
+    готовит один, а остальные дожидаются и открывают уже опубликованный снимок.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    name = os.path.splitext(os.path.basename(database_path))[0]
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        lock_file = open(os.path.join(snapshot_dir, f'.{name}.lock'), 'wb')
+    except OSError:
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_snapshot(engine, database_path: str, snapshot_dir: str, content_hash: str = None) -> bool:
+    """
+    Загружает снимок в engine, если он есть для текущего содержимого CSV
+
+    Атрибуты engine.SNAPSHOT_ATTRIBUTES восстанавливаются из pickle, а все числовые
+    массивы внутри них - представления одного mmap файла arrays.bin без копирования:
+    воркеры делят эти страницы, и новый воркер почти не добавляет памяти данных.
+    Снимок не меняется после публикации, поэтому массивы только для чтения.
+
+    Returns:
+        True, если снимок найден и загружен
+    """
+    path = snapshot_path(database_path, snapshot_dir, content_hash)
+    if not os.path.isdir(path):
+        return False
+
+    try:
+        with open(os.path.join(path, 'arrays.bin'), 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        with open(os.path.join(path, 'objects.pkl'), 'rb') as f:
+            attributes = _ArrayUnpickler(f, buffer).load()
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError) as e:
+        print(f"⚠ Снимок {path} поврежден, готовим данные из CSV: {e}")
+        return False
+
+    if set(attributes) != set(engine.SNAPSHOT_ATTRIBUTES):
+        return False
+
+    for name, value in attributes.items():
+        setattr(engine, name, value)
+    return True
+
+
+def save_snapshot(engine, database_path: str, snapshot_dir: str, content_hash: str = None) -> Optional[str]:
+    """
+    Сохраняет подготовленные данные engine в снимок и удаляет устаревшие снимки этого CSV
+
+    Снимок пишется во временный каталог и переименовывается целиком, поэтому
+    параллельно стартующие воркеры никогда не видят его наполовину записанным.
+    Файлы прежней версии удаляются, но воркеры, которые их уже открыли, продолжают
+    работать: отображение в память живет до закрытия, а новая версия - другой каталог.
+
+    Returns:
+        Путь к снимку или None, если записать не удалось
+    """
+    path = snapshot_path(database_path, snapshot_dir, content_hash)
+    tmp_path = None
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=snapshot_dir, prefix='.tmp-')
+        with open(os.path.join(tmp_path, 'arrays.bin'), 'wb') as arrays_file, \
+                open(os.path.join(tmp_path, 'objects.pkl'), 'wb') as f:
+            _ArrayPickler(f, arrays_file).dump({name: getattr(engine, name) for name in engine.SNAPSHOT_ATTRIBUTES})
+        os.rename(tmp_path, path)
+    except OSError as e:
+        if tmp_path:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        if os.path.isdir(path):
+            # Другой воркер успел записать тот же снимок
+            return path
+        print(f"⚠ Не удалось сохранить снимок в {snapshot_dir}: {e}")
+        return None
+
+    # Удаляем снимки прежних версий этого CSV
+    name = re.escape(os.path.splitext(os.path.basename(database_path))[0])
+    pattern = re.compile(rf'{name}-[0-9a-f]{{16}}-v\d+')
+    for entry in os.listdir(snapshot_dir):
+        stale = os.path.join(snapshot_dir, entry)
+        if pattern.fullmatch(entry) and stale != path:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    return path
@@ -0,0 +1,33 @@
+"""
+Общие фикстуры тестов: приложение на базе из репозитория, без снимков и
+фоновой перезагрузки
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('DATABASE_PATH', os.path.join(ROOT, 'programs_database.csv'))
+os.environ['SNAPSHOT_DIR'] = ''
+os.environ['RELOAD_INTERVAL'] = '0'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def engine():
+    from recommendation_system import UniversityRecommendationSystem
+    return UniversityRecommendationSystem(os.environ['DATABASE_PATH'])
@@ -0,0 +1,26 @@
+"""Модель симуляции считает баллы так же, как движок, включая округление"""
+
+import numpy as np
+
+from admission_sim import AdmissionModel
+from recommendation_system import UniversityRecommendationSystem
+
+
+def test_round_like_python_on_ties():
+    values = np.array([250.025, 0.125, 2.675, 1.005, 101.5, -0.125, 452.415, 7.0])
+    expected = [round(float(value), 2) for value in values]
+    assert UniversityRecommendationSystem._round_like_python(values.copy(), 2).tolist() == expected
+
+
+def test_model_scores_match_score_matrix(engine):
+    model = AdmissionModel(engine)
+    rng = np.random.default_rng(7)
+    scores = model.sample_applicants(512, rng)
+    # Дробные баллы, как в запросах (sample_applicants дает целые)
+    scores = np.where(scores > 0, scores + rng.integers(0, 100, scores.shape) / 100.0, 0.0)
+
+    competitive_score, compatibility, eligible, best_elective = model.score(scores)
+    expected = engine.score_matrix(np.arange(len(engine.programs)), scores)
+    np.testing.assert_array_equal(competitive_score.T, expected['competitive_score'])
+    np.testing.assert_array_equal(best_elective.T, expected['best_elective'])
+    np.testing.assert_allclose(compatibility.T, expected['compatibility'])
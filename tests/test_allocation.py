@@ -0,0 +1,107 @@
+"""Распределение мест: сравнение с простым отложенным согласием и проверка устойчивости"""
+
+import heapq
+
+import numpy as np
+import pytest
+
+from admission_sim import TRACKS, seat_places
+from allocation import allocate, score_applications, synthetic_preferences
+from program_table import MAX_PRIORITY
+
+
+@pytest.fixture(scope='module')
+def market(engine):
+    scores, preferences = synthetic_preferences(engine, 20000, seed=3)
+    return scores, preferences, allocate(engine, scores, preferences)
+
+
+def application_table(engine, scores, preferences):
+    """Конкурс и ключ сравнения (меньше - лучше) каждого допустимого заявления"""
+    places, elective_tracks = seat_places(engine)
+    applicant, choice = np.nonzero(preferences >= 0)
+    program = preferences[applicant, choice].astype(np.int64)
+    competitive_score, eligible, best_elective, tiebreak = score_applications(engine, scores, applicant, program)
+    pool = program * TRACKS + np.where(elective_tracks[program], best_elective + 1, 0)
+    applications = {}
+    for i in np.flatnonzero(eligible & (places.ravel()[pool] > 0)):
+        key = (-competitive_score[i],) + tuple(-tiebreak[i, level] for level in range(MAX_PRIORITY)) + (applicant[i],)
+        applications.setdefault(int(applicant[i]), []).append((int(choice[i]), int(pool[i]), key))
+    return places.ravel(), applications
+
+
+def deferred_acceptance(capacity, applications):
+    """Отложенное согласие по одному предложению за шаг: {абитуриент: (выбор, конкурс)}"""
+    held = {}
+    next_choice = dict.fromkeys(applications, 0)
+    free = list(applications)
+    while free:
+        a = free.pop()
+        if next_choice[a] == len(applications[a]):
+            continue
+        choice, pool, key = applications[a][next_choice[a]]
+        next_choice[a] += 1
+        queue = held.setdefault(pool, [])
+        # Куча по худшему: (-ключ) наибольший у худшего удерживаемого
+        heapq.heappush(queue, (tuple(-k for k in key), a, choice))
+        if len(queue) > capacity[pool]:
+            _, rejected, _ = heapq.heappop(queue)
+            free.append(rejected)
+    return {a: (choice, pool) for pool, queue in held.items() for _, a, choice in queue}
+
+
+def test_matches_reference_deferred_acceptance(engine, market):
+    scores, preferences, allocation = market
+    capacity, applications = application_table(engine, scores, preferences)
+    expected = deferred_acceptance(capacity, applications)
+
+    assert allocation.rounds > 1
+    admitted = np.flatnonzero(allocation.program >= 0)
+    assert {int(a) for a in admitted} == set(expected)
+    for a in admitted:
+        choice, pool = expected[int(a)]
+        assert allocation.choice[a] == choice
+        assert allocation.program[a] * TRACKS + allocation.track[a] == pool
+
+
+def test_capacity_and_cutoffs(engine, market):
+    scores, preferences, allocation = market
+    places, _ = seat_places(engine)
+    assert (allocation.admitted <= places).all()
+    assert (allocation.admitted[places == 0] == 0).all()
+
+    admitted = allocation.program >= 0
+    pools = allocation.program[admitted] * TRACKS + allocation.track[admitted]
+    np.testing.assert_array_equal(np.bincount(pools, minlength=places.size), allocation.admitted.ravel())
+
+    full = (places > 0) & (allocation.admitted >= places)
+    assert np.isfinite(allocation.cutoffs[full]).all()
+    for pool in np.flatnonzero(full.ravel())[:50]:
+        members = admitted.copy()
+        members[admitted] = pools == pool
+        assert allocation.cutoffs.ravel()[pool] == allocation.score[members].min()
+    assert np.isneginf(allocation.cutoffs[(places > 0) & ~full]).all()
+    assert np.isnan(allocation.cutoffs[places == 0]).all()
+
+
+def test_stable(engine, market):
+    scores, preferences, allocation = market
+    capacity, applications = application_table(engine, scores, preferences)
+    admitted = np.flatnonzero(allocation.program >= 0)
+
+    # Худший удерживаемый ключ каждого заполненного конкурса
+    keys = {a: {pool: key for _, pool, key in entries} for a, entries in applications.items()}
+    worst = {}
+    for a in admitted:
+        pool = int(allocation.program[a] * TRACKS + allocation.track[a])
+        worst[pool] = max(worst.get(pool, keys[int(a)][pool]), keys[int(a)][pool])
+    count = np.bincount([int(allocation.program[a] * TRACKS + allocation.track[a]) for a in admitted],
+                        minlength=len(capacity))
+
+    # Нет пары (абитуриент, конкурс выше его зачисления), которая предпочла бы друг друга
+    for a, entries in applications.items():
+        assigned = allocation.choice[a] if allocation.choice[a] >= 0 else len(preferences[a])
+        for choice, pool, key in entries:
+            if choice >= assigned:
+                break
+            assert count[pool] >= capacity[pool] and key > worst[pool]
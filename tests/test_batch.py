@@ -0,0 +1,96 @@
+"""/recommendations/batch: ошибки отдельных абитуриентов, поток блоками, ограничение нагрузки"""
+
+import json
+
+import app as app_module
+from concurrency import AdmissionControl
+
+STUDENT = {
+    'exam_scores': {'ქართული ენა და ლიტერატურა': 70, 'ინგლისური': 60, 'მათემატიკა': 80},
+    'foreign_language': 'ინგლისური'
+}
+
+
+def test_slot_released_before_body_is_read(client, monkeypatch):
+    admission = AdmissionControl(1, 0, 0)
+    monkeypatch.setattr(app_module, 'admission', admission)
+
+    # Ответ еще не прочитан и не закрыт, а место уже свободно
+    response = client.post('/recommendations/batch?top_n=3', data=json.dumps([STUDENT] * 3), buffered=False)
+    assert response.status_code == 200
+    assert admission.stats()['active'] == 0
+    assert client.post('/recommendations/batch', data=json.dumps([STUDENT])).status_code == 200
+
+    lines = [json.loads(line) for line in b''.join(response.response).splitlines()]
+    assert [line['index'] for line in lines] == [0, 1, 2]
+    assert all(line['success'] and len(line['recommendations']) == 3 for line in lines)
+    response.close()
+
+
+def test_busy_batch_is_shed(client, monkeypatch):
+    admission = AdmissionControl(1, 0, 0)
+    monkeypatch.setattr(app_module, 'admission', admission)
+    admission.acquire()
+    try:
+        response = client.post('/recommendations/batch', data=json.dumps([STUDENT]))
+    finally:
+        admission.release()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(app_module.BUSY_RETRY_AFTER)
+    assert admission.stats()['shed'] == 1
+
+
+def batch_lines(response):
+    return [json.loads(line) for line in response.get_data().splitlines()]
+
+
+def test_invalid_students_get_error_lines(client):
+    students = [
+        STUDENT,
+        {**STUDENT, 'exam_scores': {**STUDENT['exam_scores'], 'მათემატიკა': 'x'}},
+        {**STUDENT, 'exam_scores': {**STUDENT['exam_scores'], 'მათემატიკა': None}},
+        {**STUDENT, 'city': 3},
+        {**STUDENT, 'exam_scores': [70]},
+        'student',
+        {**STUDENT, 'id': 'last'},
+    ]
+    body = json.dumps(students)[:-1] + ', {"exam_scores": {"მათემატიკა": NaN}}]'
+    response = client.post('/recommendations/batch?top_n=1', data=body)
+    assert response.status_code == 200
+    lines = batch_lines(response)
+    assert [line['index'] for line in lines] == list(range(8))
+    assert [line['success'] for line in lines] == [True, False, False, False, False, False, True, False]
+    assert lines[6]['id'] == 'last'
+
+
+def test_invalid_ndjson_line(client):
+    body = '\n'.join([json.dumps(STUDENT), '{broken', '', json.dumps(STUDENT)])
+    lines = batch_lines(client.post('/recommendations/batch?top_n=1', data=body))
+    assert [(line['index'], line['success']) for line in lines] == [(0, True), (1, False), (2, True)]
+
+
+def test_large_batch_streamed_in_chunks(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'BATCH_CHUNK_SIZE', 100)
+    body = '\n'.join([json.dumps(STUDENT)] * 2500)
+    lines = batch_lines(client.post('/recommendations/batch?top_n=1', data=body))
+    assert [line['index'] for line in lines] == list(range(2500))
+    assert all(line['success'] for line in lines)
+
+
+def test_slot_taken_per_chunk(client, monkeypatch):
+    admission = AdmissionControl(1, 0, 0)
+    monkeypatch.setattr(app_module, 'admission', admission)
+    monkeypatch.setattr(app_module, 'BATCH_CHUNK_SIZE', 2)
+
+    # Первый блок посчитан до ответа; пока место занято, следующие блоки получают отказ
+    response = client.post('/recommendations/batch?top_n=1', data=json.dumps([STUDENT] * 5), buffered=False)
+    assert response.status_code == 200
+    admission.acquire()
+    try:
+        lines = [json.loads(line) for line in b''.join(response.response).splitlines()]
+    finally:
+        admission.release()
+        response.close()
+    assert [line['success'] for line in lines] == [True, True, False, False, False]
+    assert lines[2]['message'] == app_module.BUSY_MESSAGE
+    assert admission.stats()['active'] == 0
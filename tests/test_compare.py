@@ -0,0 +1,35 @@
+"""/compare: ограничение числа программ до расчета"""
+
+import collections
+
+import app as app_module
+
+EXAM_SCORES = {
+    'exam_scores': {'ქართული ენა და ლიტერატურა': 70, 'ინგლისური': 60, 'მათემატიკა': 80},
+    'foreign_language': 'ინგლისური'
+}
+
+
+def largest_universities(engine, n):
+    counts = collections.Counter(engine.programs.university_code.tolist())
+    return [(code, count) for code, count in counts.most_common(n)]
+
+
+def test_too_many_programs_rejected_before_scoring(client, monkeypatch):
+    engine = app_module.catalogs.get().engine
+    universities = largest_universities(engine, 3)
+    assert sum(count for _, count in universities) > app_module.MAX_TOP_N
+
+    def score_programs(*args, **kwargs):
+        raise AssertionError('программы не должны считаться')
+
+    monkeypatch.setattr(engine, 'score_programs', score_programs)
+    response = client.post('/compare', json={**EXAM_SCORES, 'university_codes': [code for code, _ in universities]})
+    assert response.status_code == 400
+
+
+def test_university_programs_compared(client):
+    (code, count), = largest_universities(app_module.catalogs.get().engine, 1)
+    response = client.post('/compare', json={**EXAM_SCORES, 'university_codes': [code]})
+    assert response.status_code == 200
+    assert len(response.get_json()['programs']) == count
@@ -0,0 +1,58 @@
+"""Объединение одинаковых вычислений"""
+
+import threading
+
+import pytest
+
+from concurrency import Overloaded, SingleFlight
+
+
+def test_follower_gives_up_when_leader_blocks():
+    flight = SingleFlight(timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def blocked():
+        started.set()
+        release.wait(5)
+        return 'leader'
+
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', blocked)))
+    leader.start()
+    assert started.wait(5)
+
+    # Ведущий завис: ожидающий не висит вместе с ним, а получает отказ
+    with pytest.raises(Overloaded):
+        flight.do('key', lambda: 'follower')
+    assert flight.stats()['timeouts'] == 1
+
+    release.set()
+    leader.join(5)
+    assert results == [('leader', False)]
+    assert flight.stats()['in_flight'] == 0
+    assert flight.do('key', lambda: 'again') == ('again', False)
+
+
+def test_follower_shares_leader_result():
+    flight = SingleFlight(timeout=5)
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', compute)))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do('key', lambda: 'other')))
+    follower.start()
+    for _ in range(5000):
+        if flight.stats()['coalesced']:
+            break
+        threading.Event().wait(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert sorted(results) == [('value', False), ('value', True)]
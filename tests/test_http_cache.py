@@ -0,0 +1,27 @@
+"""Заголовки готовых ответов: Content-Type, ETag, сжатие"""
+
+import pytest
+
+
+@pytest.mark.parametrize('encoding', [None, 'gzip', 'br'])
+def test_index_content_type(client, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    response = client.get('/', headers=headers)
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'text/html; charset=utf-8'
+
+
+def test_exam_catalog_content_type(client):
+    response = client.get('/get_required_exams')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/json'
+
+    response = client.post('/get_required_exams', json={})
+    assert response.headers['Content-Type'] == 'application/json'
+
+
+@pytest.mark.parametrize('accept, encoding', [('br, gzip', 'br'), ('gzip', 'gzip'), ('identity', None)])
+def test_index_encoding(client, accept, encoding):
+    response = client.get('/', headers={'Accept-Encoding': accept})
+    assert response.headers.get('Content-Encoding') == encoding
+    assert response.headers['Vary'] == 'Accept-Encoding'
@@ -0,0 +1,98 @@
+"""Разбор CSV: текст вместо языка обучения в колонке teaching_language"""
+
+import csv
+import io
+import os
+
+import pytest
+
+import ingestion
+from categories import CategoryMatcher
+from ingestion import (LEGACY_SCHEMA, SCHEMA, IngestionReport, apply_schema, prepare_catalog, read_catalog,
+                       reconcile_legacy, reject_invalid_rows)
+
+DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'programs_database.csv')
+
+# Программы, у которых в teaching_language записано примечание, а язык - только в устаревшей колонке language
+MISPLACED_LANGUAGE = 28
+
+
+@pytest.fixture(scope='module')
+def raw():
+    with open(DATABASE, 'rb') as f:
+        return f.read()
+
+
+def prepare(raw):
+    prepared = prepare_catalog(raw, CategoryMatcher())
+    return prepared['programs'], prepared['ingestion_report']
+
+
+def test_language_taken_from_legacy_column(raw):
+    programs, report = prepare(raw)
+    assert report['fixes']['текст вместо языка обучения'] == MISPLACED_LANGUAGE
+    assert report['fixes']['язык обучения из language вместо текста'] == MISPLACED_LANGUAGE
+    assert not any(item['reason'] == 'текст вместо языка обучения' for item in report['quarantined'])
+
+    # У всех программ есть язык, а текст из колонки языка стал примечанием
+    assert all(isinstance(programs[row].teaching_language, str) for row in range(len(programs)))
+    row = programs.find([1550101])[0]
+    assert programs[row].teaching_language == 'ქართული ენა'
+    assert programs[row].special_note.startswith('შესარჩევი ტური')
+
+
+def catalog_rows(*rows):
+    """
+    Строки каталога в устаревшей схеме по разбору read_catalog → apply_schema →
+    reconcile_legacy → reject_invalid_rows
+
+    Returns:
+        ({program_code: {колонка: текст или NaN}}, отчет)
+    """
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=list(SCHEMA) + list(LEGACY_SCHEMA))
+    writer.writeheader()
+    for i, values in enumerate(rows):
+        writer.writerow({'program_code': str(i + 1), 'university_code': '1',
+                         'program_name': 'ბიზნესის ადმინისტრირება', **values})
+    report = IngestionReport()
+    header, grid, vocabulary = read_catalog(text.getvalue().encode())
+    columns = reject_invalid_rows(reconcile_legacy(apply_schema(header, grid, vocabulary, report), report), report)
+    texts = {column: vocabulary.decode(columns[column]).tolist() for column in ('teaching_language', 'special_note')}
+    return {code: {column: values[i] for column, values in texts.items()}
+            for i, code in enumerate(columns['program_code'].tolist())}, report
+
+
+def test_misplaced_language_rows():
+    note = 'სავალდებულოა შემოქმედებითი ტურის გავლა'
+    programs, report = catalog_rows(
+        {'teaching_language': note, 'language': 'ინგლისური ენა'},
+        {'teaching_language': note},
+        {'teaching_language': note, 'language': 'ქართული', 'special_note': 'სხვა შენიშვნა'},
+        {'teaching_language': 'ქართული ენა'}
+    )
+
+    # Язык - из устаревшей колонки, примечание - из колонки языка (если примечание свободно)
+    assert programs[1]['teaching_language'] == 'ინგლისური ენა'
+    assert programs[1]['special_note'] == note
+    assert programs[3]['teaching_language'] == 'ქართული ენა'
+    assert programs[3]['special_note'] == 'სხვა შენიშვნა'
+    assert programs[4]['teaching_language'] == 'ქართული ენა'
+
+    # Строка без языка не попадает в выдачу без него, а откладывается
+    assert 2 not in programs
+    assert report.quarantined == [{'line': 3, 'program_code': 2, 'reason': 'текст вместо языка обучения'}]
+    assert report.fixes['текст вместо языка обучения'] == 3
+    assert report.fixes['язык обучения из language вместо текста'] == 2
+    assert report.fixes['текст вместо языка обучения отброшен: примечание заполнено'] == 1
+
+
+def test_catalog_read_in_chunks(monkeypatch):
+    # Части CSV кодируются в один словарь: значения на границе частей не теряются
+    rows = [{'teaching_language': language} for language in ('ქართული', 'ინგლისური ენა', 'ქართული ენა') * 3]
+    expected, _ = catalog_rows(*rows)
+    monkeypatch.setattr(ingestion, 'READ_CHUNK_ROWS', 2)
+    programs, report = catalog_rows(*rows)
+    assert programs == expected
+    assert [programs[code]['teaching_language'] for code in (1, 2, 3)] == ['ქართული ენა', 'ინგლისური ენა', 'ქართული ენა']
+    assert report.fixes['сокращенное название языка'] == 3
@@ -0,0 +1,82 @@
+"""Частичный выбор top-N и страницы по курсору против полной стабильной сортировки"""
+
+import numpy as np
+import pytest
+
+from recommendation_system import UniversityRecommendationSystem
+
+EXAM_SCORES = {'ქართული ენა და ლიტერატურა': 70, 'უცხოური ენა': 60, 'მათემატიკა': 80}
+
+
+def walk_pages(rows, scores, top_n):
+    """Все страницы _select_top подряд, курсор - балл и позиция последней программы"""
+    pages, after = [], None
+    while True:
+        order, has_more = UniversityRecommendationSystem._select_top(rows, scores, top_n, after)
+        pages.append(order)
+        if not has_more:
+            return pages
+        after = scores[order[-1]], rows[order[-1]]
+
+
+@pytest.mark.parametrize('top_n', [1, 3, 20, 100, 1000])
+def test_select_top_matches_stable_sort(top_n):
+    rng = np.random.default_rng(top_n)
+    rows = np.sort(rng.choice(5000, size=700, replace=False))
+    # Мало различных баллов - много равенств, в том числе на границах страниц
+    scores = rng.integers(0, 40, size=len(rows)).astype(np.float64) * 2.5
+    expected = np.argsort(-scores, kind='stable')
+
+    order, has_more = UniversityRecommendationSystem._select_top(rows, scores, top_n)
+    np.testing.assert_array_equal(order, expected[:top_n])
+    assert has_more == (len(rows) > top_n)
+
+    pages = walk_pages(rows, scores, top_n)
+    assert all(len(page) == top_n for page in pages[:-1])
+    np.testing.assert_array_equal(np.concatenate(pages), expected)
+
+
+def test_recommend_page_cursor_walk(engine):
+    full = engine.recommend_page(None, None, None, None, EXAM_SCORES, top_n=len(engine.programs))
+    codes, cursor = [], None
+    while True:
+        page = engine.recommend_page(None, None, None, None, EXAM_SCORES, top_n=7, cursor=cursor)
+        codes += [program['program_code'] for program in page['recommendations']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert codes == [program['program_code'] for program in full['recommendations']]
+    scores = [program['competitive_score'] for program in full['recommendations']]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_nan_scores_give_empty_page(engine):
+    page = engine.recommend_page(None, None, None, None, {**EXAM_SCORES, 'მათემატიკა': float('nan')}, top_n=5)
+    assert page['next_cursor'] is None
+
+
+@pytest.mark.parametrize('cursor', [123, 'not-a-cursor', '', None])
+def test_decode_cursor_rejects_garbage(engine, cursor):
+    with pytest.raises(ValueError):
+        engine._decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('fields', [
+    {'cursor': 123},
+    {'cursor': ['a']},
+    {'cursor': 'not-a-cursor'},
+    {'top_n': [5]},
+    {'exam_scores': {**EXAM_SCORES, 'მათემატიკა': None}},
+    {'exam_scores': {**EXAM_SCORES, 'მათემატიკა': '80'}},
+])
+def test_invalid_page_request(client, fields):
+    data = {'exam_scores': EXAM_SCORES, 'foreign_language': 'უცხოური ენა', **fields}
+    assert client.post('/get_recommendations', json=data).status_code == 400
+
+
+@pytest.mark.parametrize('value', ['NaN', 'Infinity'])
+def test_non_finite_score_rejected(client, value):
+    body = ('{"exam_scores": {"ქართული ენა და ლიტერატურა": 70, "უცხოური ენა": 60, "მათემატიკა": %s},'
+            ' "foreign_language": "უცხოური ენა"}' % value)
+    response = client.post('/get_recommendations', data=body, content_type='application/json')
+    assert response.status_code == 400
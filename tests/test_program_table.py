@@ -0,0 +1,124 @@
+"""ProgramTable: колонки без pandas, поиск по кодам, значения строк"""
+
+import math
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from program_table import Fragments, ProgramTable, SlotNames
+
+NAN = float('nan')
+
+
+def small_table():
+    return ProgramTable({
+        'program_code': [30, 10, 20, 40],
+        'university_code': [2, 1, 2, 3],
+        'annual_tuition': [2250.0, NAN, 0.0, 5000.0],
+        'total_places': [50.0, NAN, 10.0, 0.0],
+        'credits': [NAN, 180.0, 240.0, 300.0],
+        'city': ['თბილისი', 'ბათუმი', 'თბილისი', NAN],
+        'uni_type': ['სახელმწიფო', 'კერძო', 'სახელმწიფო', 'კერძო'],
+        'category': ['ბიზნესი', 'მედიცინა', 'ბიზნესი', 'სამართალი'],
+        'teaching_language': ['ქართული ენა', 'ინგლისური ენა', 'ქართული ენა', 'ქართული ენა'],
+        'program_name': ['ბიზნესის ადმინისტრირება', 'მედიცინა', 'ეკონომიკა', 'სამართალი'],
+        'accreditation_status': ['აკრედიტებული', NAN, 'აკრედიტებული', NAN],
+        'special_note': [NAN, NAN, 'შენიშვნა', NAN],
+    })
+
+
+def small_table_columns():
+    return ('program_code', 'university_code', 'annual_tuition', 'total_places', 'credits', 'city',
+            'uni_type', 'category', 'teaching_language', 'program_name', 'accreditation_status',
+            'special_note')
+
+
+def test_find_codes():
+    table = small_table()
+    np.testing.assert_array_equal(table.find([20, 30, 10, 40]), [2, 0, 1, 3])
+    np.testing.assert_array_equal(table.find([5, 25, 50]), [-1, -1, -1])
+    assert table.find([]).shape == (0,)
+
+
+def test_find_in_empty_table():
+    table = ProgramTable({column: [] for column in small_table_columns()})
+    np.testing.assert_array_equal(table.find([1, 2]), [-1, -1])
+    assert len(table.university_programs(1)) == 0
+
+
+def test_university_programs_in_catalog_order():
+    table = small_table()
+    np.testing.assert_array_equal(table.university_programs(2), [0, 2])
+    np.testing.assert_array_equal(table.university_programs(3), [3])
+    assert len(table.university_programs(4)) == 0
+    assert len(table.university_programs(0)) == 0
+
+
+def test_values_and_defaults():
+    table = small_table()
+    assert table.value('city', 1) == 'ბათუმი'
+    assert math.isnan(table.value('city', 3))
+    assert table.count('uni_type', 'სახელმწიფო') == 2
+    assert table.count('category', 'არქიტექტურა') == 0
+    # Пустые места - 0, пустые кредиты - 240
+    np.testing.assert_array_equal(table.total_places, [50, 0, 10, 0])
+    np.testing.assert_array_equal(table.credits, [240, 180, 240, 300])
+
+    program = table[2]
+    assert (program.program_code, program.university_code, program.program_name) == (20, 2, 'ეკონომიკა')
+    assert program.special_note == 'შენიშვნა'
+    assert math.isnan(table[0].special_note)
+
+
+def test_encoded_columns_match_values():
+    # Колонка кодами в общий список строк кодируется так же, как колонка строк
+    words = ['სამართალი', 'შენიშვნა', 'ეკონომიკა', 'ბიზნესის ადმინისტრირება', 'მედიცინა']
+    columns = {column: [getattr(program, column) for program in small_table()] for column in small_table_columns()}
+    columns['special_note'] = (np.array([-1, -1, 1, -1]), words)
+    columns['program_name'] = (np.array([3, 4, 2, 0]), words)
+    table, expected = ProgramTable(columns), small_table()
+    for column in ('special_note', 'program_name'):
+        np.testing.assert_array_equal(table.codes[column], expected.codes[column])
+        assert table.values[column] == expected.values[column]
+
+
+def test_table_matches_catalog(engine):
+    programs = engine.programs
+    rows = programs.find(programs.program_code)
+    np.testing.assert_array_equal(rows, np.arange(len(programs)))
+    for code in np.unique(programs.university_code):
+        np.testing.assert_array_equal(programs.university_programs(code),
+                                      np.flatnonzero(programs.university_code == code))
+
+
+def test_slot_names_and_fragments():
+    names = SlotNames(np.array([[0, -1], [1, 0]], dtype=np.int16), ['მათემატიკა', 'ისტორია'])
+    assert names.shape == (2, 2)
+    assert names[0, 0] == 'მათემატიკა' and names[0, 1] is None
+    assert list(names[1]) == ['ისტორია', 'მათემატიკა']
+
+    fragments = Fragments.encode([b'{"a":1}', b'', 'ქ'.encode()])
+    assert len(fragments) == 3
+    assert [fragments[i] for i in range(3)] == [b'{"a":1}', b'', 'ქ'.encode()]
+
+    # Генератор строк склеивается блоками
+    parts = [str(i).encode() * (i % 3) for i in range(10)]
+    fragments = Fragments.encode(iter(parts), block_size=4)
+    assert [fragments[i] for i in range(10)] == parts
+
+
+def test_snapshot_worker_does_not_import_pandas(tmp_path):
+    # Первый процесс готовит снимок из CSV, второй поднимает движок из снимка
+    code = (
+        'import sys; from recommendation_system import UniversityRecommendationSystem as U; '
+        'e = U(sys.argv[1], sys.argv[2]); '
+        'e.recommend_page(None, None, None, None, {"მათემატიკა": 80}); '
+        'print("pandas" in sys.modules)'
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    args = [sys.executable, '-c', code, os.environ['DATABASE_PATH'], str(tmp_path)]
+    subprocess.run(args, cwd=root, check=True, capture_output=True)
+    result = subprocess.run(args, cwd=root, check=True, capture_output=True, text=True)
+    assert result.stdout.splitlines()[-1] == 'False'
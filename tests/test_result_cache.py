@@ -0,0 +1,87 @@
+"""ResultCache: вытеснение, версии данных, общее хранилище и кэш ответов приложения"""
+
+import app as app_module
+from result_cache import ResultCache, SharedResultStore
+
+# Баллы, которых нет в других тестах: ответ еще не в кэше приложения
+EXAM_SCORES = {
+    'exam_scores': {'ქართული ენა და ლიტერატურა': 71, 'ინგლისური': 61, 'მათემატიკა': 81},
+    'foreign_language': 'ინგლისური'
+}
+
+
+def new_cache(**kwargs):
+    cache = ResultCache(**kwargs)
+    cache.set_version('v1')
+    return cache
+
+
+def test_lru_by_entries():
+    cache = new_cache(max_entries=2)
+    cache.put('v1', 'a', b'1')
+    cache.put('v1', 'b', b'2')
+    assert cache.get('v1', 'a') == b'1'
+    cache.put('v1', 'c', b'3')
+    assert cache.get('v1', 'b') is None
+    assert cache.get('v1', 'a') == b'1' and cache.get('v1', 'c') == b'3'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_by_bytes():
+    cache = new_cache(max_bytes=10)
+    cache.put('v1', 'a', b'x' * 6)
+    cache.put('v1', 'b', b'x' * 6)
+    assert cache.get('v1', 'a') is None
+    cache.put('v1', 'huge', b'x' * 11)
+    assert cache.get('v1', 'huge') is None
+    assert cache.stats()['bytes'] == 6
+
+
+def test_set_version_invalidates():
+    cache = new_cache()
+    cache.put('v1', 'a', b'1')
+    cache.set_version('v2')
+    assert cache.get('v1', 'a') is None
+    assert cache.stats()['entries'] == 0
+    # Запрос, дорабатывающий на старой версии, в кэш не пишет
+    cache.put('v1', 'a', b'1')
+    assert cache.stats()['entries'] == 0
+
+
+def test_versions_of_several_catalogs():
+    cache = new_cache()
+    cache.add_version('other')
+    cache.put('v1', 'a', b'1')
+    cache.put('other', 'a', b'2')
+    assert cache.get('v1', 'a') == b'1' and cache.get('other', 'a') == b'2'
+
+    # Перезагрузка каталога сбрасывает только его записи
+    cache.add_version('other-2', replaces='other')
+    assert cache.get('other', 'a') is None
+    assert cache.get('v1', 'a') == b'1'
+
+    cache.drop_version('v1')
+    assert cache.get('v1', 'a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_shared_store_between_workers(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    first = new_cache(shared=SharedResultStore(path))
+    second = new_cache(shared=SharedResultStore(path))
+    first.put('v1', ('key', 1), b'body')
+    assert second.get('v1', ('key', 1)) == b'body'
+    assert second.stats()['shared_hits'] == 1
+
+    first.drop_version('v1')
+    third = new_cache(shared=SharedResultStore(path))
+    assert third.get('v1', ('key', 1)) is None
+
+
+def test_equivalent_requests_share_cached_response(client):
+    before = app_module.recommendation_cache.stats()['hits']
+    first = client.post('/get_recommendations', json={**EXAM_SCORES, 'city': ['ბათუმი', 'თბილისი']})
+    second = client.post('/get_recommendations', json={**EXAM_SCORES, 'city': ['თბილისი', 'ბათუმი', 'თბილისი']})
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert app_module.recommendation_cache.stats()['hits'] == before + 1
@@ -0,0 +1,43 @@
+"""Векторный расчет баллов против построчного calculate_score()"""
+
+import numpy as np
+import pytest
+
+
+def random_students(engine, n, seed=0):
+    """Абитуриенты со случайными баллами по случайному набору предметов базы"""
+    rng = np.random.default_rng(seed)
+    students = []
+    for _ in range(n):
+        subjects = rng.choice(engine.subjects.names, size=rng.integers(2, 7), replace=False)
+        # Половинные баллы дают вклады вида x.xx5, где расходятся np.round и round()
+        students.append({name: float(rng.integers(0, 201)) / 2 for name in subjects})
+    return students
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_score_programs_matches_calculate_score(engine, seed):
+    rows = np.arange(len(engine.programs))
+    for exam_scores in random_students(engine, 10, seed):
+        scored = engine.score_programs(rows, exam_scores)
+        for row in rows:
+            expected = engine.calculate_score(int(row), exam_scores)
+            assert scored['competitive_score'][row] == expected['competitive_score']
+            assert round(float(scored['compatibility'][row]), 1) == expected['compatibility']
+            assert scored['chance_level'][row] == expected['chance_level']
+            assert scored['failed'][row].any() == bool(expected['failed_minimums'])
+
+
+def test_score_matrix_grouping_matches_rows(engine, monkeypatch):
+    students = random_students(engine, 20, seed=42)
+    scores = np.stack([engine.subjects.score_vector(exam_scores) for exam_scores in students])
+    rows = np.arange(len(engine.programs))
+    expected = engine._score_rows(rows, scores)
+
+    # rows покрывает все формулы, subset - группировка по np.unique
+    subset = rows[::3]
+    monkeypatch.setattr(engine, 'MIN_GROUPED_ROWS', 1)
+    for target in (rows, subset):
+        scored = engine.score_matrix(target, scores)
+        for key, value in scored.items():
+            np.testing.assert_array_equal(value, expected[key][:, target], err_msg=key)
@@ -0,0 +1,93 @@
+"""Поиск по названиям: совпадения слов, основы, подсказки и запросы без слов"""
+
+import numpy as np
+import pytest
+
+from search_index import GRAM, SearchIndex, stem, tokenize
+from universities_info import UNIVERSITIES
+
+NAN = float('nan')
+
+UNIVERSITIES_SMALL = {
+    1: {'name': 'თბილისის სახელმწიფო უნივერსიტეტი', 'name_short': 'თსუ'},
+    2: {'name': 'ილიას სახელმწიფო უნივერსიტეტი', 'name_short': 'ისუ'},
+}
+
+
+@pytest.fixture
+def index():
+    return SearchIndex(
+        ['ბიზნესის ადმინისტრირება', 'სამართალმცოდნეობა', 'მედიცინა', NAN, 'ბიზნესის ადმინისტრირება'],
+        [NAN, 'სამართლის ბაკალავრი', NAN, 'ფიზიკის ბაკალავრი', NAN],
+        [1, 1, 2, 2, 2],
+        UNIVERSITIES_SMALL
+    )
+
+
+def test_search_words_and_stems(index):
+    assert index.search('ბიზნესი').tolist() == [0, 4]
+    assert index.search('ადმინისტრ').tolist() == [0, 4]
+    assert index.search('ქიმია').tolist() == []
+    # Основа внутри сложного слова и слово квалификации
+    assert index.search('სამართალი').tolist() == [1]
+    assert index.search('ფიზიკა').tolist() == [3]
+    # Все слова запроса, в том числе слова университета
+    assert index.search('ბიზნეს ილიას').tolist() == [4]
+    assert index.search('ბაკალავრი თსუ').tolist() == [1]
+    # Мтаврули и пунктуация
+    assert index.search('ᲛᲔᲓᲘᲪᲘᲜᲐ!').tolist() == [2]
+
+
+@pytest.mark.parametrize('query', ['', '   ', '!!!', '- , .'])
+def test_query_without_words_matches_nothing(index, query):
+    assert index.search(query).tolist() == []
+    assert index.suggest(query) == []
+
+
+def test_suggestions(index):
+    suggestions = index.suggest('ბიზ')
+    assert suggestions == [{'type': 'program', 'text': 'ბიზნესის ადმინისტრირება', 'programs': 2}]
+
+    suggestions = index.suggest('სახელმწიფო')
+    assert [suggestion['type'] for suggestion in suggestions] == ['university', 'university']
+    assert {suggestion['university_code'] for suggestion in suggestions} == {1, 2}
+    assert len(index.suggest('სახელმწიფო', limit=1)) == 1
+
+
+def reference_search(documents, query):
+    """Построчный поиск: у каждого слова запроса есть слово документа с его основой"""
+    rows = []
+    for row, words in enumerate(documents):
+        for token in tokenize(query):
+            base = stem(token)
+            if not any(word.startswith(base) if len(base) < GRAM else base in word for word in words):
+                break
+        else:
+            rows.append(row)
+    return rows if tokenize(query) else []
+
+
+def test_search_matches_reference_on_catalog(engine):
+    programs = engine.programs
+    names = [programs.value('program_name', row) for row in range(len(programs))]
+    codes = programs.university_code.tolist()
+    index = SearchIndex(names, [NAN] * len(names), codes, UNIVERSITIES)
+    documents = [
+        set(tokenize(name if isinstance(name, str) else ''))
+        | set(tokenize(' '.join(str(UNIVERSITIES.get(code, {}).get(key, '')) for key in ('name', 'name_short'))))
+        for name, code in zip(names, codes)
+    ]
+
+    rng = np.random.default_rng(0)
+    queries = ['', '!!!', 'ბიზნესი', 'მენეჯმენტი თბილისი', 'სამართალი', 'ინჟინერია', 'xyz']
+    for word in rng.choice(index.words, size=60, replace=False):
+        queries += [word, word[:2], word[1:6], word + 'ის']
+    for query in queries:
+        assert index.search(query).tolist() == reference_search(documents, query), query
+
+
+def test_filter_and_autocomplete_agree_on_query_without_words(engine):
+    assert len(engine.filter_rows(query='!!!')) == 0
+    assert engine.autocomplete('!!!') == {'suggestions': [], 'programs_found': 0}
+    found = engine.autocomplete('ბიზნესი')['programs_found']
+    assert found == len(engine.filter_rows(query='ბიზნესი')) > 0
@@ -0,0 +1,68 @@
+"""Движок, загруженный из снимка, отвечает так же, как подготовленный из CSV"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from recommendation_system import UniversityRecommendationSystem
+
+STUDENTS = [
+    {'ქართული ენა და ლიტერატურა': 70, 'უცხოური ენა': 60, 'მათემატიკა': 80},
+    {'ქართული ენა და ლიტერატურა': 95, 'უცხოური ენა': 40, 'ისტორია': 55, 'ბიოლოგია': 72.5},
+    {'ქართული ენა და ლიტერატურა': 20, 'უცხოური ენა': 20, 'ფიზიკა': 100},
+]
+
+FILTERS = [
+    (None, None, None, None),
+    ('თბილისი', None, None, None),
+    (None, 'სახელმწიფო', None, 'ქართული ენა'),
+    (['თბილისი', 'ბათუმი'], None, None, None),
+]
+
+
+@pytest.fixture(scope='module')
+def snapshot_engine(tmp_path_factory):
+    """Движок, который читает снимок, опубликованный другим движком, и не разбирает CSV"""
+    snapshot_dir = str(tmp_path_factory.mktemp('snapshots'))
+    UniversityRecommendationSystem(os.environ['DATABASE_PATH'], snapshot_dir)
+
+    def prepare_data(self, raw):
+        raise AssertionError('данные должны читаться из снимка')
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(UniversityRecommendationSystem, 'prepare_data', prepare_data)
+        return UniversityRecommendationSystem(os.environ['DATABASE_PATH'], snapshot_dir)
+
+
+def test_snapshot_arrays_match_csv(engine, snapshot_engine):
+    assert snapshot_engine.data_version == engine.data_version
+    for name in engine.SNAPSHOT_ATTRIBUTES:
+        value = getattr(engine, name)
+        if isinstance(value, np.ndarray):
+            loaded = getattr(snapshot_engine, name)
+            assert loaded.dtype == value.dtype, name
+            np.testing.assert_array_equal(loaded, value, err_msg=name)
+            # Массивы снимка - общие страницы mmap только для чтения
+            assert not loaded.flags.writeable, name
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_snapshot_responses_match_csv(engine, snapshot_engine, filters):
+    assert snapshot_engine.get_required_exams(*filters) == engine.get_required_exams(*filters)
+    for exam_scores in STUDENTS:
+        expected = engine.recommend_page(*filters, exam_scores, top_n=30, as_json=True)
+        assert snapshot_engine.recommend_page(*filters, exam_scores, top_n=30, as_json=True) == expected
+        assert (snapshot_engine.what_do_i_need(*filters, exam_scores, 75.0, top_n=5)
+                == engine.what_do_i_need(*filters, exam_scores, 75.0, top_n=5))
+
+
+def test_snapshot_search_and_compare_match_csv(engine, snapshot_engine):
+    for query in ('ბიზნეს', 'მედიცინა', 'თბილისის სახელმწიფო'):
+        assert snapshot_engine.autocomplete(query) == engine.autocomplete(query)
+    codes = [int(code) for code in engine.programs.program_code[:10]]
+    universities = sorted(set(engine.programs.university_code))[:2]
+    # Пустые special_note - NaN, который не равен сам себе: сравниваем JSON ответа
+    assert (json.dumps(snapshot_engine.compare_programs(STUDENTS[0], codes, universities))
+            == json.dumps(engine.compare_programs(STUDENTS[0], codes, universities)))
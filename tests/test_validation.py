@@ -0,0 +1,45 @@
+"""Тела и поля запросов неверного типа - 400, а не ошибка при расчете"""
+
+import pytest
+
+EXAM_SCORES = {
+    'exam_scores': {'ქართული ენა და ლიტერატურა': 70, 'ინგლისური': 60, 'მათემატიკა': 80},
+    'foreign_language': 'ინგლისური'
+}
+
+ENDPOINTS = ['/get_recommendations', '/what_do_i_need', '/get_required_exams']
+
+
+@pytest.mark.parametrize('url', ENDPOINTS + ['/compare'])
+@pytest.mark.parametrize('body', ['null', '[]', '5'])
+def test_body_not_object(client, url, body):
+    response = client.post(url, data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+@pytest.mark.parametrize('url', ENDPOINTS)
+@pytest.mark.parametrize('city', [3, {'a': 1}, ['თბილისი', 2], [['თბილისი']]])
+def test_filter_value_not_string(client, url, city):
+    response = client.post(url, json={**EXAM_SCORES, 'city': city})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('url', ENDPOINTS)
+@pytest.mark.parametrize('city', ['თბილისი', ['თბილისი', 'ბათუმი'], None])
+def test_filter_value_accepted(client, url, city):
+    assert client.post(url, json={**EXAM_SCORES, 'city': city}).status_code == 200
+
+
+@pytest.mark.parametrize('url', ['/compare', '/what_do_i_need'])
+@pytest.mark.parametrize('codes', ['12345', 12345, [True], [1.5], ['abc'], [[1]], {'1': 1}])
+def test_program_codes_not_list_of_codes(client, url, codes):
+    response = client.post(url, json={**EXAM_SCORES, 'program_codes': codes})
+    assert response.status_code == 400
+
+
+def test_program_codes_as_strings(client, engine):
+    codes = engine.programs.program_code[:2].tolist()
+    response = client.post('/compare', json={**EXAM_SCORES, 'program_codes': [str(codes[0]), codes[1]]})
+    assert response.status_code == 200
+    assert [program['program_code'] for program in response.get_json()['programs']] == codes